@@ -4,6 +4,11 @@ import os
 import logging
 import httpx
 import time
+from adapters.http_clients import get_http_client, get_async_http_client, FARMS_SERVICE
+from adapters.resilience import DependencyUnavailableError
+from utils.deadline import DeadlineExceededError
+from utils.cache import ReferenceCache
+from utils.single_flight import SingleFlight
 
 load_dotenv(override=True, encoding="utf-8")
 
@@ -11,48 +16,123 @@ logger = logging.getLogger(__name__)
 
 FARMS_SERVICE_URL = os.getenv("FARMS_SERVICE_URL", "http://localhost:8002")
 
+# Peticiones idénticas concurrentes (p. ej. invitaciones masivas a una misma finca)
+# comparten una sola llamada al servicio de fincas
+_farm_flight = SingleFlight("get-farm-by-id")
+_user_role_farm_flight = SingleFlight("get-user-role-farm")
+
+def _request(method: str, url: str, **kwargs):
+    # Una petición al servicio de fincas con el cliente compartido
+    return getattr(get_http_client(FARMS_SERVICE), method)(url, **kwargs)
+
+async def _request_async(method: str, url: str, **kwargs):
+    return await getattr(get_async_http_client(FARMS_SERVICE), method)(url, **kwargs)
+
+def _parse_user_role_farm(response):
+    response.raise_for_status()
+    data = response.json()
+    if "status" in data and data["status"] == "error":
+        return None
+    return UserRoleFarmResponse(**data)
+
+def _parse_user_role_farm_state(response):
+    response.raise_for_status()
+    data = response.json()
+    if "status" in data and data["status"] == "error":
+        return None
+    return data
+
+def _farm_url(farm_id: int) -> str:
+    url = f"{FARMS_SERVICE_URL}/farms-service/get-farm/{farm_id}"
+    logger.info(f"Consultando finca ID {farm_id} en {url}...")
+    return url
+
+def _parse_farm(url: str, start_time: float, response):
+    duration = time.monotonic() - start_time # Calcular duración
+    logger.info(f"Consulta a {url} finalizada en {duration:.4f} segundos con estado {response.status_code}")
+    response.raise_for_status()
+    data = response.json()
+    # Si la respuesta es un dict con los campos esperados, parsear con el modelo
+    return FarmDetailResponse(**data)
+
+def _farm_lookup_failed(farm_id: int, url: str, start_time: float, e: Exception):
+    duration = time.monotonic() - start_time
+    if isinstance(e, httpx.TimeoutException): # Capturar específicamente Timeout
+        logger.error(f"Timeout ({e}) al consultar finca {farm_id} en {url} después de {duration:.4f} segundos")
+    else:
+        logger.error(f"Error ({type(e).__name__}: {e}) al consultar finca {farm_id} en {url} después de {duration:.4f} segundos")
+    return None
+
+def _get_farm_by_id(farm_id: int):
+    url = _farm_url(farm_id)
+    start_time = time.monotonic() # Registrar tiempo de inicio
+    try:
+        return _parse_farm(url, start_time, _request("get", url))
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
+    except Exception as e:
+        return _farm_lookup_failed(farm_id, url, start_time, e)
+
+async def _get_farm_by_id_async(farm_id: int):
+    url = _farm_url(farm_id)
+    start_time = time.monotonic()
+    try:
+        return _parse_farm(url, start_time, await _request_async("get", url))
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
+    except Exception as e:
+        return _farm_lookup_failed(farm_id, url, start_time, e)
+
 def get_farm_by_id(farm_id: int):
     """
     Solicita la información de una finca al servicio de farms.
+    Las consultas concurrentes de la misma finca comparten una sola petición.
     """
-    url = f"{FARMS_SERVICE_URL}/farms-service/get-farm/{farm_id}"
-    start_time = time.monotonic() # Registrar tiempo de inicio
-    logger.info(f"Consultando finca ID {farm_id} en {url}...")
+    return _farm_flight.do(farm_id, lambda: _get_farm_by_id(farm_id))
+
+async def get_farm_by_id_async(farm_id: int):
+    """
+    Versión asíncrona de `get_farm_by_id`.
+    """
+    return await _farm_flight.ado(farm_id, lambda: _get_farm_by_id_async(farm_id))
+
+def _get_user_role_farm(user_id: int, farm_id: int):
+    url = f"{FARMS_SERVICE_URL}/farms-service/get-user-role-farm/{user_id}/{farm_id}"
     try:
-        with httpx.Client(timeout=60.0) as client:
-            response = client.get(url)
-            duration = time.monotonic() - start_time # Calcular duración
-            logger.info(f"Consulta a {url} finalizada en {duration:.4f} segundos con estado {response.status_code}")
-            response.raise_for_status()
-            data = response.json()
-            # Si la respuesta es un dict con los campos esperados, parsear con el modelo
-            return FarmDetailResponse(**data)
-    except httpx.TimeoutException as e: # Capturar específicamente Timeout
-        duration = time.monotonic() - start_time
-        logger.error(f"Timeout ({e}) al consultar finca {farm_id} en {url} después de {duration:.4f} segundos")
-        return None
+        return _parse_user_role_farm(_request("get", url))
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
     except Exception as e:
-        duration = time.monotonic() - start_time
-        logger.error(f"Error ({type(e).__name__}: {e}) al consultar finca {farm_id} en {url} después de {duration:.4f} segundos")
+        logger.error(f"Error al consultar user_role_farm: {e}")
         return None
 
-def get_user_role_farm(user_id: int, farm_id: int):
-    """
-    Solicita la relación user_role_farm y su estado al servicio de farms.
-    """
+async def _get_user_role_farm_async(user_id: int, farm_id: int):
     url = f"{FARMS_SERVICE_URL}/farms-service/get-user-role-farm/{user_id}/{farm_id}"
     try:
-        with httpx.Client() as client:
-            response = client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            if "status" in data and data["status"] == "error":
-                return None
-            return UserRoleFarmResponse(**data)
+        return _parse_user_role_farm(await _request_async("get", url))
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
     except Exception as e:
         logger.error(f"Error al consultar user_role_farm: {e}")
         return None
 
+def get_user_role_farm(user_id: int, farm_id: int):
+    """
+    Solicita la relación user_role_farm y su estado al servicio de farms.
+    Las consultas concurrentes idénticas comparten una sola petición.
+    """
+    return _user_role_farm_flight.do((user_id, farm_id), lambda: _get_user_role_farm(user_id, farm_id))
+
+async def get_user_role_farm_async(user_id: int, farm_id: int):
+    """
+    Versión asíncrona de `get_user_role_farm`.
+    """
+    return await _user_role_farm_flight.ado((user_id, farm_id), lambda: _get_user_role_farm_async(user_id, farm_id))
+
+def _create_user_role_farm_failed(e: Exception):
+    logger.error(f"Error al crear user_role_farm: {e}")
+    return {"status": "error", "message": f"Error al crear user_role_farm: {str(e)}"}
+
 def create_user_role_farm(user_role_id: int, farm_id: int, user_role_farm_state_id: int):
     """
     Crea la relación UserRoleFarm en el servicio de fincas.
@@ -64,27 +144,69 @@ def create_user_role_farm(user_role_id: int, farm_id: int, user_role_farm_state_
         "user_role_farm_state_id": user_role_farm_state_id
     }
     try:
-        with httpx.Client() as client:
-            response = client.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
+        response = _request("post", url, json=payload)
+        response.raise_for_status()
+        return response.json()
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
     except Exception as e:
-        logger.error(f"Error al crear user_role_farm: {e}")
-        return {"status": "error", "message": f"Error al crear user_role_farm: {str(e)}"}
+        return _create_user_role_farm_failed(e)
+
+async def create_user_role_farm_async(user_role_id: int, farm_id: int, user_role_farm_state_id: int):
+    """
+    Versión asíncrona de `create_user_role_farm`.
+    """
+    url = f"{FARMS_SERVICE_URL}/farms-service/create-user-role-farm"
+    payload = {
+        "user_role_id": user_role_id,
+        "farm_id": farm_id,
+        "user_role_farm_state_id": user_role_farm_state_id
+    }
+    try:
+        response = await _request_async("post", url, json=payload)
+        response.raise_for_status()
+        return response.json()
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
+    except Exception as e:
+        return _create_user_role_farm_failed(e)
+
+def _fetch_user_role_farm_state(state_name: str):
+    url = f"{FARMS_SERVICE_URL}/farms-service/get-user-role-farm-state/{state_name}"
+    return _parse_user_role_farm_state(_request("get", url))
+
+async def _fetch_user_role_farm_state_async(state_name: str):
+    url = f"{FARMS_SERVICE_URL}/farms-service/get-user-role-farm-state/{state_name}"
+    return _parse_user_role_farm_state(await _request_async("get", url))
+
+# Los estados de UserRoleFarm casi nunca cambian: se cachean por nombre
+_user_role_farm_states_cache = ReferenceCache(
+    "user-role-farm-states",
+    loader=_fetch_user_role_farm_state,
+    async_loader=_fetch_user_role_farm_state_async,
+)
 
 def get_user_role_farm_state_by_name(state_name: str):
     """
     Consulta el estado de UserRoleFarm por nombre en el servicio de fincas.
+    El resultado se sirve desde la caché de referencia.
+    """
+    try:
+        return _user_role_farm_states_cache.get(state_name)
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
+    except Exception as e:
+        logger.error(f"Error al consultar user_role_farm_state: {e}")
+        return None
+
+async def get_user_role_farm_state_by_name_async(state_name: str):
+    """
+    Versión asíncrona de `get_user_role_farm_state_by_name`.
     """
-    url = f"{FARMS_SERVICE_URL}/farms-service/get-user-role-farm-state/{state_name}"
     try:
-        with httpx.Client() as client:
-            response = client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            if "status" in data and data["status"] == "error":
-                return None
-            return data
+        return await _user_role_farm_states_cache.aget(state_name)
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
     except Exception as e:
         logger.error(f"Error al consultar user_role_farm_state: {e}")
         return None
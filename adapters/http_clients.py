@@ -0,0 +1,280 @@
+from dotenv import load_dotenv
+import os
+import logging
+import threading
+import httpx
+from adapters.resilience import (
+    CircuitBreaker,
+    Bulkhead,
+    RetryBudget,
+    RetryPolicy,
+    ResilientTransport,
+    AsyncResilientTransport
+)
+
+load_dotenv(override=True, encoding="utf-8")
+
+logger = logging.getLogger(__name__)
+
+# === Servicios remotos con pool propio ===
+FARMS_SERVICE = "farms"
+USERS_SERVICE = "users"
+NOTIFICATIONS_SERVICE = "notifications"
+SERVICES = (FARMS_SERVICE, USERS_SERVICE, NOTIFICATIONS_SERVICE)
+
+# Valores por defecto del pool, ajustables por entorno. Cada servicio puede
+# sobreescribirlos con HTTP_<SERVICIO>_<PARAMETRO>, p. ej. HTTP_FARMS_MAX_CONNECTIONS.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30.0"))
+HTTP_DEFAULT_TIMEOUT = float(os.getenv("HTTP_DEFAULT_TIMEOUT", "5.0"))
+
+# Circuit breaker y bulkhead por servicio (también sobreescribibles por servicio,
+# p. ej. HTTP_FARMS_BULKHEAD_MAX_CONCURRENT)
+HTTP_BREAKER_FAILURE_THRESHOLD = int(os.getenv("HTTP_BREAKER_FAILURE_THRESHOLD", "5"))
+HTTP_BREAKER_RESET_TIMEOUT = float(os.getenv("HTTP_BREAKER_RESET_TIMEOUT", "30.0"))
+HTTP_BULKHEAD_MAX_CONCURRENT = int(os.getenv("HTTP_BULKHEAD_MAX_CONCURRENT", "50"))
+
+# Reintentos de peticiones idempotentes (GET) con backoff exponencial y jitter.
+# El presupuesto permite como máximo RETRY_BUDGET_RATIO reintentos por petición
+# en régimen estable, con ráfagas de hasta RETRY_BUDGET_MAX_TOKENS.
+HTTP_RETRY_MAX_RETRIES = int(os.getenv("HTTP_RETRY_MAX_RETRIES", "2"))
+HTTP_RETRY_BACKOFF_BASE = float(os.getenv("HTTP_RETRY_BACKOFF_BASE", "0.05"))
+HTTP_RETRY_BACKOFF_MAX = float(os.getenv("HTTP_RETRY_BACKOFF_MAX", "1.0"))
+HTTP_RETRY_BUDGET_RATIO = float(os.getenv("HTTP_RETRY_BUDGET_RATIO", "0.1"))
+HTTP_RETRY_BUDGET_MAX_TOKENS = float(os.getenv("HTTP_RETRY_BUDGET_MAX_TOKENS", "10"))
+# Peticiones cubiertas (hedging) para GET en los clientes asíncronos; desactivadas por defecto
+HTTP_HEDGE_ENABLED = os.getenv("HTTP_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+HTTP_HEDGE_DELAY = float(os.getenv("HTTP_HEDGE_DELAY", "0.5"))
+
+_clients: dict[str, httpx.Client] = {}
+_clients_lock = threading.Lock()
+_async_clients: dict[str, httpx.AsyncClient] = {}
+_breakers: dict[str, CircuitBreaker] = {}
+_bulkheads: dict[str, Bulkhead] = {}
+_retry_policies: dict[str, RetryPolicy] = {}
+_resilience_lock = threading.Lock()
+
+
+def _as_bool(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
+
+
+def _service_setting(service: str, name: str, default, cast):
+    """Lee HTTP_<SERVICIO>_<NOMBRE> del entorno, o retorna el valor global por defecto."""
+    value = os.getenv(f"HTTP_{service.upper()}_{name}")
+    return cast(value) if value is not None else default
+
+
+def get_pool_limits(service: str) -> httpx.Limits:
+    """
+    Construye los límites del pool de conexiones para un servicio.
+
+    Args:
+        service (str): Nombre del servicio remoto (farms, users, notifications).
+
+    Returns:
+        httpx.Limits: Límites de conexiones y expiración de keep-alive.
+    """
+    return httpx.Limits(
+        max_connections=_service_setting(service, "MAX_CONNECTIONS", HTTP_MAX_CONNECTIONS, int),
+        max_keepalive_connections=_service_setting(service, "MAX_KEEPALIVE_CONNECTIONS", HTTP_MAX_KEEPALIVE_CONNECTIONS, int),
+        keepalive_expiry=_service_setting(service, "KEEPALIVE_EXPIRY", HTTP_KEEPALIVE_EXPIRY, float),
+    )
+
+
+def get_timeout(service: str) -> float:
+    """
+    Timeout por defecto de las peticiones a un servicio (HTTP_<SERVICIO>_DEFAULT_TIMEOUT).
+
+    Args:
+        service (str): Nombre del servicio remoto (farms, users, notifications).
+
+    Returns:
+        float: Timeout en segundos.
+    """
+    return _service_setting(service, "DEFAULT_TIMEOUT", HTTP_DEFAULT_TIMEOUT, float)
+
+
+def get_circuit_breaker(service: str) -> CircuitBreaker:
+    """
+    Retorna el circuit breaker de un servicio, compartido por sus clientes síncrono y asíncrono.
+
+    Args:
+        service (str): Nombre del servicio remoto.
+
+    Returns:
+        CircuitBreaker: Circuit breaker del servicio.
+    """
+    with _resilience_lock:
+        breaker = _breakers.get(service)
+        if breaker is None:
+            breaker = _breakers[service] = CircuitBreaker(
+                service,
+                failure_threshold=_service_setting(service, "BREAKER_FAILURE_THRESHOLD", HTTP_BREAKER_FAILURE_THRESHOLD, int),
+                reset_timeout=_service_setting(service, "BREAKER_RESET_TIMEOUT", HTTP_BREAKER_RESET_TIMEOUT, float),
+            )
+        return breaker
+
+
+def get_bulkhead(service: str) -> Bulkhead:
+    """
+    Retorna el bulkhead (límite de llamadas concurrentes) de un servicio.
+
+    Args:
+        service (str): Nombre del servicio remoto.
+
+    Returns:
+        Bulkhead: Bulkhead del servicio.
+    """
+    with _resilience_lock:
+        bulkhead = _bulkheads.get(service)
+        if bulkhead is None:
+            bulkhead = _bulkheads[service] = Bulkhead(
+                service,
+                max_concurrent=_service_setting(service, "BULKHEAD_MAX_CONCURRENT", HTTP_BULKHEAD_MAX_CONCURRENT, int),
+            )
+        return bulkhead
+
+
+def get_retry_policy(service: str) -> RetryPolicy:
+    """
+    Retorna la política de reintentos y hedging de un servicio.
+
+    Args:
+        service (str): Nombre del servicio remoto.
+
+    Returns:
+        RetryPolicy: Política compartida por los clientes del servicio.
+    """
+    with _resilience_lock:
+        policy = _retry_policies.get(service)
+        if policy is None:
+            policy = _retry_policies[service] = RetryPolicy(
+                max_retries=_service_setting(service, "RETRY_MAX_RETRIES", HTTP_RETRY_MAX_RETRIES, int),
+                backoff_base=_service_setting(service, "RETRY_BACKOFF_BASE", HTTP_RETRY_BACKOFF_BASE, float),
+                backoff_max=_service_setting(service, "RETRY_BACKOFF_MAX", HTTP_RETRY_BACKOFF_MAX, float),
+                budget=RetryBudget(
+                    ratio=_service_setting(service, "RETRY_BUDGET_RATIO", HTTP_RETRY_BUDGET_RATIO, float),
+                    max_tokens=_service_setting(service, "RETRY_BUDGET_MAX_TOKENS", HTTP_RETRY_BUDGET_MAX_TOKENS, float),
+                ),
+                hedge=_service_setting(service, "HEDGE_ENABLED", HTTP_HEDGE_ENABLED, _as_bool),
+                hedge_delay=_service_setting(service, "HEDGE_DELAY", HTTP_HEDGE_DELAY, float),
+            )
+        return policy
+
+
+def get_dependency_states() -> dict:
+    """
+    Estado del circuit breaker, el bulkhead y los reintentos de cada servicio remoto, para monitoreo.
+
+    Returns:
+        dict: Servicio -> {"circuit_breaker": {...}, "bulkhead": {...}, "retries": {...}}.
+    """
+    return {
+        service: {
+            "circuit_breaker": get_circuit_breaker(service).snapshot(),
+            "bulkhead": get_bulkhead(service).snapshot(),
+            "retries": get_retry_policy(service).snapshot(),
+        }
+        for service in SERVICES
+    }
+
+
+def _build_client(service: str) -> httpx.Client:
+    limits = get_pool_limits(service)
+    logger.info(
+        f"Creando cliente HTTP para '{service}' (max_connections={limits.max_connections}, "
+        f"max_keepalive={limits.max_keepalive_connections}, keepalive_expiry={limits.keepalive_expiry})"
+    )
+    transport = ResilientTransport(
+        httpx.HTTPTransport(limits=limits), get_circuit_breaker(service), get_bulkhead(service), get_retry_policy(service)
+    )
+    return httpx.Client(transport=transport, timeout=get_timeout(service))
+
+
+def _build_async_client(service: str) -> httpx.AsyncClient:
+    limits = get_pool_limits(service)
+    logger.info(
+        f"Creando cliente HTTP asíncrono para '{service}' (max_connections={limits.max_connections}, "
+        f"max_keepalive={limits.max_keepalive_connections}, keepalive_expiry={limits.keepalive_expiry})"
+    )
+    transport = AsyncResilientTransport(
+        httpx.AsyncHTTPTransport(limits=limits), get_circuit_breaker(service), get_bulkhead(service), get_retry_policy(service)
+    )
+    return httpx.AsyncClient(transport=transport, timeout=get_timeout(service))
+
+
+def get_http_client(service: str) -> httpx.Client:
+    """
+    Retorna el cliente HTTP compartido de un servicio, creándolo si aún no existe.
+
+    Normalmente los clientes se crean en el arranque de la aplicación
+    (ver `init_http_clients`); la creación perezosa cubre scripts y pruebas.
+
+    Args:
+        service (str): Nombre del servicio remoto.
+
+    Returns:
+        httpx.Client: Cliente con pool de conexiones reutilizables.
+    """
+    client = _clients.get(service)
+    if client is not None and not client.is_closed:
+        return client
+    with _clients_lock:
+        client = _clients.get(service)
+        if client is None or client.is_closed:
+            client = _build_client(service)
+            _clients[service] = client
+        return client
+
+
+def get_async_http_client(service: str) -> httpx.AsyncClient:
+    """
+    Retorna el cliente HTTP asíncrono compartido de un servicio, creándolo si aún no existe.
+
+    Debe usarse desde el event loop en el que se creó (el del servidor);
+    no requiere lock porque la creación no cede el control al loop.
+
+    Args:
+        service (str): Nombre del servicio remoto.
+
+    Returns:
+        httpx.AsyncClient: Cliente asíncrono con pool de conexiones reutilizables.
+    """
+    client = _async_clients.get(service)
+    if client is None or client.is_closed:
+        client = _build_async_client(service)
+        _async_clients[service] = client
+    return client
+
+
+def init_http_clients():
+    """Crea los clientes HTTP (síncronos y asíncronos) de todos los servicios remotos."""
+    for service in SERVICES:
+        get_http_client(service)
+        get_async_http_client(service)
+
+
+def close_http_clients():
+    """Cierra los clientes HTTP y libera sus conexiones."""
+    with _clients_lock:
+        clients = list(_clients.items())
+        _clients.clear()
+    for service, client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            logger.error(f"Error cerrando el cliente HTTP de '{service}': {e}")
+
+
+async def aclose_http_clients():
+    """Cierra los clientes HTTP asíncronos y libera sus conexiones."""
+    clients = list(_async_clients.items())
+    _async_clients.clear()
+    for service, client in clients:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.error(f"Error cerrando el cliente HTTP asíncrono de '{service}': {e}")
+
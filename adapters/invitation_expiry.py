@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from adapters.notification_client import (
+    BulkNotificationsUnsupportedError,
+    delete_notifications_by_invitation_id_async,
+    delete_notifications_by_invitation_ids_async,
+    notification_fanout_limit
+)
+from adapters.notification_outbox import PENDING
+from models.models import Invitations, NotificationOutbox
+from utils.concurrency import gather_limited
+
+load_dotenv(override=True, encoding="utf-8")
+
+logger = logging.getLogger(__name__)
+
+# Vigencia de una invitación desde su invitation_date; 0 = no vencen y el
+# barrido no arranca. Reenviar una invitación renueva su fecha.
+INVITATION_TTL_DAYS = float(os.getenv("INVITATION_TTL_DAYS", "0"))
+# Cada cuánto barre, cuántas filas borra por transacción, la pausa entre lotes
+# y el máximo de lotes por barrido (para no competir con el tráfico en vivo).
+INVITATION_EXPIRY_INTERVAL = float(os.getenv("INVITATION_EXPIRY_INTERVAL", "300"))
+INVITATION_EXPIRY_BATCH_SIZE = int(os.getenv("INVITATION_EXPIRY_BATCH_SIZE", "500"))
+INVITATION_EXPIRY_BATCH_PAUSE = float(os.getenv("INVITATION_EXPIRY_BATCH_PAUSE", "0.5"))
+INVITATION_EXPIRY_MAX_BATCHES = int(os.getenv("INVITATION_EXPIRY_MAX_BATCHES", "20"))
+# Solo registra cuántas invitaciones vencerían, sin borrar nada
+INVITATION_EXPIRY_DRY_RUN = os.getenv("INVITATION_EXPIRY_DRY_RUN", "false").lower() in ("1", "true", "yes")
+
+_active_sweeper: Optional["InvitationExpirySweeper"] = None
+
+
+def _expired(ttl_days: float, batch_size: int):
+    """Las invitaciones más antiguas que `ttl_days`, según el reloj de la base de datos."""
+    return (
+        select(Invitations.invitation_id)
+        .where(Invitations.invitation_date < func.now() - timedelta(days=ttl_days))
+        .order_by(Invitations.invitation_date)
+        .limit(batch_size)
+    )
+
+
+def expire_batch(db: Session, ttl_days: float, batch_size: int) -> List[int]:
+    """
+    Borra hasta `batch_size` invitaciones vencidas, junto con sus
+    notificaciones del outbox aún sin entregar, y confirma el borrado.
+
+    Las filas bloqueadas por otro barrido o por una respuesta en curso se
+    saltan (SKIP LOCKED): nadie espera al barrido ni el barrido a nadie.
+
+    Returns:
+        list: IDs de las invitaciones borradas.
+    """
+    due = _expired(ttl_days, batch_size).with_for_update(skip_locked=True)
+    stmt = (
+        delete(Invitations)
+        .where(Invitations.invitation_id.in_(due.scalar_subquery()))
+        .returning(Invitations.invitation_id)
+        .execution_options(synchronize_session=False)
+    )
+    invitation_ids = list(db.execute(stmt).scalars().all())
+    if invitation_ids:
+        # En la misma transacción: el despachador no enviará "Has sido invitado" de una invitación borrada
+        db.execute(
+            delete(NotificationOutbox)
+            .where(
+                NotificationOutbox.status == PENDING,
+                NotificationOutbox.payload["invitation_id"].as_integer().in_(invitation_ids)
+            )
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return invitation_ids
+
+
+def find_expired(db: Session, ttl_days: float, batch_size: int) -> List[int]:
+    """
+    Las invitaciones que `expire_batch` borraría, sin bloquearlas (dry-run).
+
+    Returns:
+        list: IDs de hasta `batch_size` invitaciones vencidas.
+    """
+    invitation_ids = db.execute(_expired(ttl_days, batch_size)).scalars().all()
+    db.rollback()
+    return list(invitation_ids)
+
+
+async def delete_expired_notifications(invitation_ids: List[int]) -> int:
+    """
+    Borra las notificaciones de las invitaciones vencidas con una petición
+    masiva; si el servicio no la admite, con una petición por invitación, sin
+    pasar de `notification_fanout_limit()` peticiones a la vez.
+
+    Returns:
+        int: Número de invitaciones cuyas notificaciones no se pudieron borrar.
+    """
+    try:
+        await delete_notifications_by_invitation_ids_async(invitation_ids)
+        return 0
+    except BulkNotificationsUnsupportedError:
+        pass
+    except Exception as e:
+        logger.error(f"Error borrando las notificaciones de {len(invitation_ids)} invitaciones vencidas: {e}")
+        return len(invitation_ids)
+
+    results = await gather_limited(
+        (lambda invitation_id=invitation_id: delete_notifications_by_invitation_id_async(invitation_id)
+         for invitation_id in invitation_ids),
+        notification_fanout_limit()
+    )
+    return sum(isinstance(result, Exception) for result in results)
+
+
+class InvitationExpirySweeper:
+    """
+    Tarea en segundo plano que borra las invitaciones vencidas.
+
+    Cada barrido borra lotes de `batch_size` filas con `expire_batch`, cada uno
+    en su propia transacción corta, con `batch_pause` segundos entre lotes y a
+    lo sumo `max_batches` lotes. Tras cada lote borra las notificaciones de las
+    invitaciones, ya fuera de la transacción. Varias instancias del servicio
+    pueden barrer a la vez.
+
+    Args:
+        session_factory (Callable): Crea sesiones de base de datos (SessionLocal).
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        ttl_days: float = INVITATION_TTL_DAYS,
+        interval: float = INVITATION_EXPIRY_INTERVAL,
+        batch_size: int = INVITATION_EXPIRY_BATCH_SIZE,
+        batch_pause: float = INVITATION_EXPIRY_BATCH_PAUSE,
+        max_batches: int = INVITATION_EXPIRY_MAX_BATCHES,
+        dry_run: bool = INVITATION_EXPIRY_DRY_RUN,
+    ):
+        self._session_factory = session_factory
+        self.ttl_days = ttl_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.max_batches = max_batches
+        self.dry_run = dry_run
+        self._task: Optional[asyncio.Task] = None
+        self.sweeps = 0
+        self.expired = 0
+        self.would_expire = 0
+        self.notification_cleanup_failures = 0
+        self.errors = 0
+        self.last_sweep_seconds: Optional[float] = None
+
+    def _with_session(self, operation):
+        db = self._session_factory()
+        try:
+            return operation(db, self.ttl_days, self.batch_size)
+        finally:
+            db.close()
+
+    async def run_once(self) -> int:
+        """
+        Hace un barrido.
+
+        Returns:
+            int: Invitaciones borradas (o que se borrarían, en dry-run).
+        """
+        start = time.monotonic()
+        total = 0
+        try:
+            if self.dry_run:
+                # Sin borrar, cada lote vería las mismas filas: basta con uno
+                invitation_ids = await run_in_threadpool(self._with_session, find_expired)
+                self.would_expire += len(invitation_ids)
+                if invitation_ids:
+                    logger.info(f"[dry-run] {len(invitation_ids)} invitaciones vencidas se borrarían: {invitation_ids}")
+                return len(invitation_ids)
+
+            for batch in range(self.max_batches):
+                if batch:
+                    await asyncio.sleep(self.batch_pause)
+                invitation_ids = await run_in_threadpool(self._with_session, expire_batch)
+                if not invitation_ids:
+                    break
+                total += len(invitation_ids)
+                self.expired += len(invitation_ids)
+                self.notification_cleanup_failures += await delete_expired_notifications(invitation_ids)
+                if len(invitation_ids) < self.batch_size:
+                    break
+            if total:
+                logger.info(f"{total} invitaciones vencidas borradas")
+            return total
+        finally:
+            self.sweeps += 1
+            self.last_sweep_seconds = round(time.monotonic() - start, 6)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error borrando invitaciones vencidas: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Arranca el barrido en el event loop actual."""
+        global _active_sweeper
+        self._task = asyncio.create_task(self._run())
+        _active_sweeper = self
+
+    async def stop(self):
+        """Detiene el barrido; un lote a medias se confirma o se descarta entero."""
+        global _active_sweeper
+        if _active_sweeper is self:
+            _active_sweeper = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "ttl_days": self.ttl_days,
+            "dry_run": self.dry_run,
+            "sweeps": self.sweeps,
+            "expired": self.expired,
+            "would_expire": self.would_expire,
+            "notification_cleanup_failures": self.notification_cleanup_failures,
+            "errors": self.errors,
+            "last_sweep_seconds": self.last_sweep_seconds,
+        }
+
+
+def get_expiry_stats() -> Dict[str, Any]:
+    """
+    Métricas del barrido de invitaciones vencidas de esta instancia.
+
+    Returns:
+        dict: Contadores del barrido, o {"running": False} si no está activo.
+    """
+    if _active_sweeper is None:
+        return {"running": False, "ttl_days": INVITATION_TTL_DAYS}
+    return _active_sweeper.snapshot()
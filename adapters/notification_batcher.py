@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from adapters.notification_client import (
+    BulkNotificationsUnsupportedError,
+    notification_fanout_limit,
+    send_notification_async,
+    send_notifications_bulk_async
+)
+from utils.concurrency import gather_limited
+
+load_dotenv(override=True, encoding="utf-8")
+
+logger = logging.getLogger(__name__)
+
+# Un lote se envía al juntar NOTIFICATION_BATCH_MAX_SIZE notificaciones o al
+# pasar NOTIFICATION_BATCH_MAX_WAIT segundos desde la primera, lo que ocurra antes.
+NOTIFICATION_BATCH_ENABLED = os.getenv("NOTIFICATION_BATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+NOTIFICATION_BATCH_MAX_SIZE = int(os.getenv("NOTIFICATION_BATCH_MAX_SIZE", "100"))
+NOTIFICATION_BATCH_MAX_WAIT = float(os.getenv("NOTIFICATION_BATCH_MAX_WAIT", "0.05"))
+# Tiempo sin volver a intentar el endpoint masivo después de que el servicio
+# respondiera que no lo expone
+NOTIFICATION_BULK_RETRY_INTERVAL = float(os.getenv("NOTIFICATION_BULK_RETRY_INTERVAL", "300"))
+
+
+class NotificationBatcher:
+    """
+    Agrupa los envíos de notificaciones concurrentes en lotes y envía cada lote
+    con una sola petición a `send_notifications_bulk_async`.
+
+    Si el envío masivo falla, las notificaciones del lote se envían una por una,
+    a lo sumo `notification_fanout_limit()` a la vez para que el bulkhead no
+    las rechace, y cada llamador recibe su propio resultado o error. Si el servicio responde
+    que no expone el endpoint masivo, no se vuelve a intentar durante
+    `bulk_retry_interval` segundos.
+
+    Debe usarse desde un único event loop.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = NOTIFICATION_BATCH_MAX_SIZE,
+        max_wait: float = NOTIFICATION_BATCH_MAX_WAIT,
+        bulk_retry_interval: float = NOTIFICATION_BULK_RETRY_INTERVAL,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.bulk_retry_interval = bulk_retry_interval
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight = set()
+        self._bulk_disabled_until = float("-inf")
+        self.notifications = 0
+        self.batches = 0
+        self.bulk_requests = 0
+        self.single_requests = 0
+
+    async def send(self, **notification) -> Any:
+        """
+        Encola una notificación (mismos argumentos que `send_notification_async`)
+        y espera a que su lote se envíe.
+
+        Returns:
+            Any: Respuesta del servicio para el lote (o para la notificación si
+            se envió sola).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((notification, future))
+        self.notifications += 1
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        task = asyncio.get_running_loop().create_task(self._send_batch(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    def _bulk_available(self) -> bool:
+        return time.monotonic() >= self._bulk_disabled_until
+
+    async def _send_batch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        if len(batch) > 1 and self._bulk_available():
+            try:
+                self.bulk_requests += 1
+                result = await send_notifications_bulk_async([notification for notification, _ in batch])
+            except BulkNotificationsUnsupportedError as e:
+                logger.warning(f"{e}; se enviarán una por una durante {self.bulk_retry_interval:.0f}s")
+                self._bulk_disabled_until = time.monotonic() + self.bulk_retry_interval
+            except Exception as e:
+                logger.warning(f"Falló el envío masivo de {len(batch)} notificaciones, se envían una por una: {e}")
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(result)
+                return
+
+        self.single_requests += len(batch)
+        results = await gather_limited(
+            (lambda notification=notification: send_notification_async(**notification) for notification, _ in batch),
+            notification_fanout_limit()
+        )
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue  # El llamador ya no espera
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def aclose(self):
+        """Envía lo pendiente y espera a los lotes en curso."""
+        self._flush()
+        if self._in_flight:
+            await asyncio.gather(*list(self._in_flight), return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "notifications": self.notifications,
+            "batches": self.batches,
+            "bulk_requests": self.bulk_requests,
+            "single_requests": self.single_requests,
+            "bulk_available": self._bulk_available(),
+        }
@@ -1,7 +1,10 @@
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import os
 import logging
 import httpx
+from adapters.http_clients import get_bulkhead, get_http_client, get_async_http_client, NOTIFICATIONS_SERVICE
+from utils.cache import ReferenceCache
 
 load_dotenv(override=True, encoding="utf-8")
 
@@ -9,94 +12,212 @@ logger = logging.getLogger(__name__)
 
 NOTIFICATIONS_SERVICE_URL = os.getenv("NOTIFICATIONS_SERVICE_URL", "http://localhost:8001")
 
-def get_notification_state_by_name(name):
+# Envíos individuales simultáneos cuando una operación masiva se reparte en
+# llamadas sueltas; 0 = la mitad del bulkhead del servicio de notificaciones,
+# para no ser rechazadas por él ni dejar sin cupo al resto del tráfico.
+NOTIFICATION_FANOUT_CONCURRENCY = int(os.getenv("NOTIFICATION_FANOUT_CONCURRENCY", "0"))
+
+# Respuestas del endpoint masivo que indican que el servicio no lo expone
+BULK_UNSUPPORTED_STATUS_CODES = frozenset({404, 405, 501})
+
+class BulkNotificationsUnsupportedError(Exception):
+    """El servicio de notificaciones no expone el envío masivo."""
+    pass
+
+def notification_fanout_limit() -> int:
+    """Máximo de llamadas sueltas simultáneas al repartir una operación masiva."""
+    if NOTIFICATION_FANOUT_CONCURRENCY > 0:
+        return NOTIFICATION_FANOUT_CONCURRENCY
+    return max(1, get_bulkhead(NOTIFICATIONS_SERVICE).max_concurrent // 2)
+
+def _request(method, path, **kwargs):
+    # Una petición al servicio de notificaciones con el cliente compartido
+    return getattr(get_http_client(NOTIFICATIONS_SERVICE), method)(f"{NOTIFICATIONS_SERVICE_URL}{path}", **kwargs)
+
+async def _request_async(method, path, **kwargs):
+    return await getattr(get_async_http_client(NOTIFICATIONS_SERVICE), method)(
+        f"{NOTIFICATIONS_SERVICE_URL}{path}", **kwargs
+    )
+
+def _index_by_name(resp):
+    resp.raise_for_status()
+    return {item["name"].lower(): item for item in resp.json()}
+
+def _fetch_catalog(path):
+    return _index_by_name(_request("get", path))
+
+async def _fetch_catalog_async(path):
+    return _index_by_name(await _request_async("get", path))
+
+# Catálogos prácticamente estáticos: se cargan una vez como dict nombre (en minúsculas) -> registro
+_notification_states_cache = ReferenceCache(
+    "notification-states",
+    loader=lambda _key: _fetch_catalog("/notification-states"),
+    async_loader=lambda _key: _fetch_catalog_async("/notification-states"),
+)
+_notification_types_cache = ReferenceCache(
+    "notification-types",
+    loader=lambda _key: _fetch_catalog("/notification-types"),
+    async_loader=lambda _key: _fetch_catalog_async("/notification-types"),
+)
+
+def _notification_payload(message, user_id, notification_type_id, invitation_id, notification_state_id,
+                          fcm_token=None, fcm_title=None, fcm_body=None):
+    payload = {
+        "message": message,
+        "user_id": user_id,
+        "notification_type_id": notification_type_id,
+        "invitation_id": invitation_id,
+        "notification_state_id": notification_state_id
+    }
+
+    # Agregar campos opcionales para FCM solo si están presentes
+    if fcm_title:
+        payload["fcm_title"] = fcm_title
+    if fcm_body:
+        payload["fcm_body"] = fcm_body
+    if fcm_token:
+        payload["fcm_token"] = fcm_token
+    return payload
+
+@contextmanager
+def _logged_http_errors(action):
+    # Registra el error con el contexto de la operación y lo vuelve a lanzar
     try:
-        with httpx.Client() as client:
-            resp = client.get(f"{NOTIFICATIONS_SERVICE_URL}/notification-states")
-            resp.raise_for_status()
-            for state in resp.json():
-                if state["name"].lower() == name.lower():
-                    return state
-        return None
+        yield
     except httpx.RequestError as exc:
-        logger.error(f"Request error while getting notification state by name '{name}': {exc}")
+        logger.error(f"Request error while {action}: {exc}")
         raise
     except httpx.HTTPStatusError as exc:
-        logger.error(f"HTTP error while getting notification state by name '{name}': {exc.response.status_code} - {exc.response.text}")
+        logger.error(f"HTTP error while {action}: {exc.response.status_code} - {exc.response.text}")
         raise
 
+def get_notification_state_by_name(name):
+    with _logged_http_errors(f"getting notification state by name '{name}'"):
+        return _notification_states_cache.get().get(name.lower())
+
+async def get_notification_state_by_name_async(name):
+    with _logged_http_errors(f"getting notification state by name '{name}'"):
+        catalog = await _notification_states_cache.aget()
+        return catalog.get(name.lower())
+
 def get_notification_type_by_name(name):
-    try:
-        with httpx.Client() as client:
-            resp = client.get(f"{NOTIFICATIONS_SERVICE_URL}/notification-types")
-            resp.raise_for_status()
-            for t in resp.json():
-                if t["name"].lower() == name.lower():
-                    return t
-        return None
-    except httpx.RequestError as exc:
-        logger.error(f"Request error while getting notification type by name '{name}': {exc}")
-        raise
-    except httpx.HTTPStatusError as exc:
-        logger.error(f"HTTP error while getting notification type by name '{name}': {exc.response.status_code} - {exc.response.text}")
-        raise
+    with _logged_http_errors(f"getting notification type by name '{name}'"):
+        return _notification_types_cache.get().get(name.lower())
+
+async def get_notification_type_by_name_async(name):
+    with _logged_http_errors(f"getting notification type by name '{name}'"):
+        catalog = await _notification_types_cache.aget()
+        return catalog.get(name.lower())
+
+def _json_response(resp):
+    resp.raise_for_status()
+    return resp.json()
 
 def update_notification_state(notification_id, notification_state_id):
     """
     Actualiza el estado de una notificación en el microservicio de notificaciones.
     """
-    try:
-        with httpx.Client() as client:
-            resp = client.patch(
-                f"{NOTIFICATIONS_SERVICE_URL}/notifications/{notification_id}/state",
-                json={"notification_state_id": notification_state_id}
-            )
-            resp.raise_for_status()
-            return resp.json()
-    except httpx.RequestError as exc:
-        logger.error(f"Request error while updating notification state for notification_id={notification_id}: {exc}")
-        raise
-    except httpx.HTTPStatusError as exc:
-        logger.error(f"HTTP error while updating notification state for notification_id={notification_id}: {exc.response.status_code} - {exc.response.text}")
-        raise
+    with _logged_http_errors(f"updating notification state for notification_id={notification_id}"):
+        resp = _request(
+            "patch", f"/notifications/{notification_id}/state",
+            json={"notification_state_id": notification_state_id}
+        )
+        return _json_response(resp)
+
+async def update_notification_state_async(notification_id, notification_state_id):
+    """
+    Versión asíncrona de `update_notification_state`.
+    """
+    with _logged_http_errors(f"updating notification state for notification_id={notification_id}"):
+        resp = await _request_async(
+            "patch", f"/notifications/{notification_id}/state",
+            json={"notification_state_id": notification_state_id}
+        )
+        return _json_response(resp)
 
 def get_notification_id_by_invitation_id(invitation_id):
     """
     Consulta al microservicio de notificaciones para obtener el notification_id asociado a una invitación.
     """
-    # Ajusta el endpoint según tu implementación real
-    try:
-        with httpx.Client() as client:
-            resp = client.get(f"{NOTIFICATIONS_SERVICE_URL}/notifications/by-invitation/{invitation_id}")
-            print(f"Response: {resp.text}")
-            # Verifica si la respuesta es exitosa
-            resp.raise_for_status()
-            data = resp.json()
-            # Suponiendo que retorna {"notification_id": ...}
-            return data.get("notification_id")
-    except httpx.RequestError as exc:
-        logger.error(f"Request error while getting notification_id for invitation_id={invitation_id}: {exc}")
-        raise
-    except httpx.HTTPStatusError as exc:
-        logger.error(f"HTTP error while getting notification_id for invitation_id={invitation_id}: {exc.response.status_code} - {exc.response.text}")
-        raise
+    with _logged_http_errors(f"getting notification_id for invitation_id={invitation_id}"):
+        resp = _request("get", f"/notifications/by-invitation/{invitation_id}")
+        # Retorna {"notification_id": ...}
+        return _json_response(resp).get("notification_id")
+
+async def get_notification_id_by_invitation_id_async(invitation_id):
+    """
+    Versión asíncrona de `get_notification_id_by_invitation_id`.
+    """
+    with _logged_http_errors(f"getting notification_id for invitation_id={invitation_id}"):
+        resp = await _request_async("get", f"/notifications/by-invitation/{invitation_id}")
+        return _json_response(resp).get("notification_id")
+
+def _deleted_notifications(invitation_id: int, resp):
+    data = _json_response(resp)
+    logger.info(f"Successfully called delete notifications for invitation_id: {invitation_id}, response: {data}")
+    return data
 
 def delete_notifications_by_invitation_id(invitation_id: int):
     """
     Llama al microservicio de notificaciones para eliminar todas las notificaciones
     de tipo 'Invitation' asociadas a un invitation_id.
     """
+    with _logged_http_errors(f"deleting notifications for invitation_id={invitation_id}"):
+        resp = _request("delete", f"/notifications/by-invitation/{invitation_id}")
+        return _deleted_notifications(invitation_id, resp)
+
+async def delete_notifications_by_invitation_id_async(invitation_id: int):
+    """
+    Versión asíncrona de `delete_notifications_by_invitation_id`.
+    """
+    with _logged_http_errors(f"deleting notifications for invitation_id={invitation_id}"):
+        resp = await _request_async("delete", f"/notifications/by-invitation/{invitation_id}")
+        return _deleted_notifications(invitation_id, resp)
+
+def _check_bulk_response(resp, action):
+    if resp.status_code in BULK_UNSUPPORTED_STATUS_CODES:
+        raise BulkNotificationsUnsupportedError(
+            f"El servicio de notificaciones no admite {action} masivos ({resp.status_code})"
+        )
+    resp.raise_for_status()
+    return resp.json()
+
+def delete_notifications_by_invitation_ids(invitation_ids):
+    """
+    Elimina en una sola petición las notificaciones de varias invitaciones.
+
+    Args:
+        invitation_ids (list): IDs de las invitaciones.
+
+    Returns:
+        dict: Respuesta del servicio.
+
+    Raises:
+        BulkNotificationsUnsupportedError: Si el servicio no expone el borrado masivo.
+    """
     try:
-        with httpx.Client() as client:
-            resp = client.delete(f"{NOTIFICATIONS_SERVICE_URL}/notifications/by-invitation/{invitation_id}")
-            resp.raise_for_status()
-            logger.info(f"Successfully called delete notifications for invitation_id: {invitation_id}, response: {resp.json()}")
-            return resp.json()
-    except httpx.RequestError as exc:
-        logger.error(f"Request error while deleting notifications for invitation_id={invitation_id}: {exc}")
+        resp = _request("post", "/notifications/by-invitation/bulk-delete", json={"invitation_ids": list(invitation_ids)})
+        return _check_bulk_response(resp, "borrados")
+    except BulkNotificationsUnsupportedError:
         raise
-    except httpx.HTTPStatusError as exc:
-        logger.error(f"HTTP error while deleting notifications for invitation_id={invitation_id}: {exc.response.status_code} - {exc.response.text}")
+    except Exception as e:
+        logger.error(f"Error deleting notifications of {len(invitation_ids)} invitations in bulk: {e}")
+        raise
+
+async def delete_notifications_by_invitation_ids_async(invitation_ids):
+    """
+    Versión asíncrona de `delete_notifications_by_invitation_ids`.
+    """
+    try:
+        resp = await _request_async(
+            "post", "/notifications/by-invitation/bulk-delete", json={"invitation_ids": list(invitation_ids)}
+        )
+        return _check_bulk_response(resp, "borrados")
+    except BulkNotificationsUnsupportedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting notifications of {len(invitation_ids)} invitations in bulk: {e}")
         raise
 
 def send_notification(
@@ -112,27 +233,74 @@ def send_notification(
     """
     Envía una notificación a través del servicio de notificaciones.
     """
-    payload = {
-        "message": message,
-        "user_id": user_id,
-        "notification_type_id": notification_type_id,
-        "invitation_id": invitation_id,
-        "notification_state_id": notification_state_id
-    }
-    
-    # Agregar campos opcionales para FCM solo si están presentes
-    if fcm_title:
-        payload["fcm_title"] = fcm_title
-    if fcm_body:
-        payload["fcm_body"] = fcm_body
-    if fcm_token:
-        payload["fcm_token"] = fcm_token
+    payload = _notification_payload(
+        message, user_id, notification_type_id, invitation_id, notification_state_id,
+        fcm_token=fcm_token, fcm_title=fcm_title, fcm_body=fcm_body
+    )
+    try:
+        return _json_response(_request("post", "/send-notification", json=payload))
+    except Exception as e:
+        logger.error(f"Error sending notification: {e}")
+        raise
 
+async def send_notification_async(
+    message,
+    user_id,
+    notification_type_id,
+    invitation_id,
+    notification_state_id,
+    fcm_token=None,
+    fcm_title=None,
+    fcm_body=None
+):
+    """
+    Versión asíncrona de `send_notification`.
+    """
+    payload = _notification_payload(
+        message, user_id, notification_type_id, invitation_id, notification_state_id,
+        fcm_token=fcm_token, fcm_title=fcm_title, fcm_body=fcm_body
+    )
     try:
-        with httpx.Client() as client:
-            resp = client.post(f"{NOTIFICATIONS_SERVICE_URL}/send-notification", json=payload)
-            resp.raise_for_status()
-            return resp.json()
+        return _json_response(await _request_async("post", "/send-notification", json=payload))
     except Exception as e:
         logger.error(f"Error sending notification: {e}")
         raise
+
+
+def _bulk_payload(notifications):
+    return {"notifications": [_notification_payload(**notification) for notification in notifications]}
+
+def send_notifications_bulk(notifications):
+    """
+    Envía varias notificaciones en una sola petición al servicio de notificaciones.
+
+    Args:
+        notifications (list): Diccionarios con los argumentos de `send_notification`.
+
+    Returns:
+        dict: Respuesta del servicio.
+
+    Raises:
+        BulkNotificationsUnsupportedError: Si el servicio no expone el endpoint masivo.
+    """
+    try:
+        resp = _request("post", "/send-notifications/bulk", json=_bulk_payload(notifications))
+        return _check_bulk_response(resp, "envíos")
+    except BulkNotificationsUnsupportedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error sending {len(notifications)} notifications in bulk: {e}")
+        raise
+
+async def send_notifications_bulk_async(notifications):
+    """
+    Versión asíncrona de `send_notifications_bulk`.
+    """
+    try:
+        resp = await _request_async("post", "/send-notifications/bulk", json=_bulk_payload(notifications))
+        return _check_bulk_response(resp, "envíos")
+    except BulkNotificationsUnsupportedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error sending {len(notifications)} notifications in bulk: {e}")
+        raise
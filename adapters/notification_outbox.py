@@ -0,0 +1,351 @@
+import asyncio
+import logging
+import os
+import random
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from adapters.notification_batcher import NotificationBatcher, NOTIFICATION_BATCH_ENABLED
+from adapters.notification_client import (
+    get_notification_state_by_name_async,
+    get_notification_type_by_name_async,
+    send_notification_async,
+    delete_notifications_by_invitation_id_async
+)
+from models.models import NotificationOutbox
+
+load_dotenv(override=True, encoding="utf-8")
+
+logger = logging.getLogger(__name__)
+
+# Despachador del outbox: si corre en este proceso, cada cuánto revisa la
+# tabla, cuántas filas toma por lote, cuánto tiempo las reserva y cómo
+# reintenta las entregas fallidas. Con NOTIFICATION_OUTBOX_DISPATCHER_IN_PROCESS
+# en false las solicitudes siguen encolando y otra instancia del servicio debe
+# drenar la tabla.
+NOTIFICATION_OUTBOX_DISPATCHER_IN_PROCESS = os.getenv(
+    "NOTIFICATION_OUTBOX_DISPATCHER_IN_PROCESS", "true"
+).lower() in ("1", "true", "yes")
+NOTIFICATION_OUTBOX_POLL_INTERVAL = float(os.getenv("NOTIFICATION_OUTBOX_POLL_INTERVAL", "1.0"))
+NOTIFICATION_OUTBOX_BATCH_SIZE = int(os.getenv("NOTIFICATION_OUTBOX_BATCH_SIZE", "50"))
+NOTIFICATION_OUTBOX_LEASE_SECONDS = float(os.getenv("NOTIFICATION_OUTBOX_LEASE_SECONDS", "60"))
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", "10"))
+NOTIFICATION_OUTBOX_BACKOFF_BASE = float(os.getenv("NOTIFICATION_OUTBOX_BACKOFF_BASE", "2.0"))
+NOTIFICATION_OUTBOX_BACKOFF_MAX = float(os.getenv("NOTIFICATION_OUTBOX_BACKOFF_MAX", "300"))
+
+PENDING = "pending"
+FAILED = "failed"
+
+_active_dispatcher: Optional["OutboxDispatcher"] = None
+
+
+class PermanentDeliveryError(Exception):
+    """La notificación nunca podrá entregarse (p. ej. su tipo no existe); no se reintenta."""
+    pass
+
+
+def enqueue_notification(
+    db: Session,
+    message: str,
+    user_id: int,
+    invitation_id: int,
+    notification_type: str,
+    notification_state: str,
+    fcm_title: Optional[str] = None,
+    fcm_body: Optional[str] = None,
+    replace_existing: bool = False
+) -> NotificationOutbox:
+    """
+    Agrega una notificación al outbox dentro de la transacción de `db`; quien
+    llama hace el commit junto con el cambio de la invitación.
+
+    El tipo y el estado se guardan por nombre y se resuelven al entregar.
+
+    Args:
+        replace_existing (bool): Borrar antes las notificaciones de la
+            invitación, p. ej. al actualizar una invitación existente.
+
+    Returns:
+        NotificationOutbox: La fila agregada a la sesión.
+    """
+    entry = NotificationOutbox(
+        payload={
+            "message": message,
+            "user_id": user_id,
+            "invitation_id": invitation_id,
+            "notification_type": notification_type,
+            "notification_state": notification_state,
+            "fcm_title": fcm_title,
+            "fcm_body": fcm_body,
+            "replace_existing": replace_existing,
+        },
+        status=PENDING,
+        attempts=0,
+    )
+    db.add(entry)
+    return entry
+
+
+def notify_outbox():
+    """Despierta al despachador tras un commit para no esperar al siguiente sondeo."""
+    if _active_dispatcher is not None:
+        _active_dispatcher.wake()
+
+
+def claim_batch(db: Session, batch_size: int, lease_seconds: float) -> List[Any]:
+    """
+    Reserva hasta `batch_size` filas vencidas y confirma la reserva.
+
+    Las filas bloqueadas por otra instancia se saltan (SKIP LOCKED). Cada fila
+    reservada queda oculta `lease_seconds`; si el proceso muere antes de
+    marcarla, vuelve a entregarse al vencer la reserva (at-least-once).
+
+    Returns:
+        list: Filas (outbox_id, payload, attempts) ordenadas por outbox_id.
+    """
+    due = (
+        select(NotificationOutbox.outbox_id)
+        .where(NotificationOutbox.status == PENDING, NotificationOutbox.available_at <= func.now())
+        .order_by(NotificationOutbox.outbox_id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(NotificationOutbox)
+        .where(NotificationOutbox.outbox_id.in_(due.scalar_subquery()))
+        .values(
+            attempts=NotificationOutbox.attempts + 1,
+            available_at=func.now() + timedelta(seconds=lease_seconds),
+        )
+        .returning(NotificationOutbox.outbox_id, NotificationOutbox.payload, NotificationOutbox.attempts)
+        .execution_options(synchronize_session=False)
+    )
+    rows = db.execute(stmt).all()
+    db.commit()
+    return sorted(rows, key=lambda row: row.outbox_id)
+
+
+def complete_batch(db: Session, delivered: List[int], failed: List[Tuple[int, str, Optional[float]]]):
+    """
+    Borra las filas entregadas y reprograma (o descarta) las fallidas.
+
+    Args:
+        delivered (list): IDs entregados.
+        failed (list): Tuplas (outbox_id, error, reintentar_en); reintentar_en
+            None marca la fila como fallida definitivamente.
+    """
+    if delivered:
+        db.execute(
+            delete(NotificationOutbox)
+            .where(NotificationOutbox.outbox_id.in_(delivered))
+            .execution_options(synchronize_session=False)
+        )
+    for outbox_id, error, retry_in in failed:
+        values = {"last_error": error[:1000]}
+        if retry_in is None:
+            values["status"] = FAILED
+        else:
+            values["available_at"] = func.now() + timedelta(seconds=retry_in)
+        db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.outbox_id == outbox_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+
+async def deliver_notification(payload: Dict[str, Any], batcher: Optional[NotificationBatcher] = None):
+    """
+    Entrega una notificación del outbox al servicio de notificaciones.
+
+    Args:
+        batcher (NotificationBatcher, optional): Agrupa el envío con los de
+            otras filas; sin él se envía en una petición propia.
+
+    Raises:
+        PermanentDeliveryError: Si el tipo o el estado no existen.
+        Exception: Cualquier error transitorio del servicio (se reintenta).
+    """
+    notification_type = await get_notification_type_by_name_async(payload["notification_type"])
+    if not notification_type:
+        raise PermanentDeliveryError(f"No se encontró el tipo de notificación '{payload['notification_type']}'")
+
+    notification_state = await get_notification_state_by_name_async(payload["notification_state"])
+    if not notification_state:
+        raise PermanentDeliveryError(f"El estado '{payload['notification_state']}' no fue encontrado para 'Notifications'")
+
+    if payload.get("replace_existing"):
+        # En la misma entrega que el envío: el borrado nunca alcanza a la nueva
+        await delete_notifications_by_invitation_id_async(payload["invitation_id"])
+
+    send = batcher.send if batcher is not None else send_notification_async
+    await send(
+        message=payload["message"],
+        user_id=payload["user_id"],
+        notification_type_id=notification_type["notification_type_id"],
+        invitation_id=payload["invitation_id"],
+        notification_state_id=notification_state["notification_state_id"],
+        fcm_title=payload.get("fcm_title"),
+        fcm_body=payload.get("fcm_body"),
+    )
+
+
+class OutboxDispatcher:
+    """
+    Tarea en segundo plano que vacía el outbox de notificaciones.
+
+    Reserva lotes con `claim_batch` y entrega sus filas a la vez (en orden
+    dentro de cada invitación), de modo que el `NotificationBatcher` las
+    agrupa en pocas peticiones. Luego borra las entregadas o las reprograma
+    con backoff exponencial y jitter. Tras
+    `max_attempts` intentos una fila queda como 'failed' para revisión manual.
+    Varias instancias del servicio pueden correrlo a la vez.
+
+    Args:
+        session_factory (Callable): Crea sesiones de base de datos (SessionLocal).
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = NOTIFICATION_OUTBOX_BATCH_SIZE,
+        poll_interval: float = NOTIFICATION_OUTBOX_POLL_INTERVAL,
+        lease_seconds: float = NOTIFICATION_OUTBOX_LEASE_SECONDS,
+        max_attempts: int = NOTIFICATION_OUTBOX_MAX_ATTEMPTS,
+        backoff_base: float = NOTIFICATION_OUTBOX_BACKOFF_BASE,
+        backoff_max: float = NOTIFICATION_OUTBOX_BACKOFF_MAX,
+    ):
+        self._session_factory = session_factory
+        self.batcher: Optional[NotificationBatcher] = None
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+
+    def backoff(self, attempts: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1))))
+
+    def _claim(self) -> List[Any]:
+        db = self._session_factory()
+        try:
+            return claim_batch(db, self.batch_size, self.lease_seconds)
+        finally:
+            db.close()
+
+    def _complete(self, delivered: List[int], failed: List[Tuple[int, str, Optional[float]]]):
+        db = self._session_factory()
+        try:
+            complete_batch(db, delivered, failed)
+        finally:
+            db.close()
+
+    async def run_once(self) -> int:
+        """
+        Procesa un lote.
+
+        Returns:
+            int: Número de filas reservadas.
+        """
+        rows = await run_in_threadpool(self._claim)
+        if not rows:
+            return 0
+
+        delivered, failed = [], []
+
+        async def deliver_in_order(group):
+            for row in group:
+                try:
+                    await deliver_notification(row.payload, self.batcher)
+                except PermanentDeliveryError as e:
+                    logger.error(f"Notificación {row.outbox_id} del outbox descartada: {e}")
+                    failed.append((row.outbox_id, str(e), None))
+                    self.failed += 1
+                except Exception as e:
+                    if row.attempts >= self.max_attempts:
+                        logger.error(f"Notificación {row.outbox_id} del outbox descartada tras {row.attempts} intentos: {e}")
+                        failed.append((row.outbox_id, str(e), None))
+                        self.failed += 1
+                    else:
+                        retry_in = self.backoff(row.attempts)
+                        logger.warning(f"Error entregando la notificación {row.outbox_id} del outbox (intento {row.attempts}), se reintentará en {retry_in:.1f}s: {e}")
+                        failed.append((row.outbox_id, str(e), retry_in))
+                        self.retried += 1
+                else:
+                    delivered.append(row.outbox_id)
+                    self.delivered += 1
+
+        # Las filas de una misma invitación se entregan en orden (un borrado de
+        # notificaciones anteriores no debe adelantarse a un envío previo)
+        groups: Dict[Any, List[Any]] = {}
+        for row in rows:
+            groups.setdefault(row.payload.get("invitation_id"), []).append(row)
+        await asyncio.gather(*(deliver_in_order(group) for group in groups.values()))
+
+        await run_in_threadpool(self._complete, delivered, failed)
+        return len(rows)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Error procesando el outbox de notificaciones: {e}")
+                claimed = 0
+            if claimed >= self.batch_size:
+                continue  # Probablemente quedan más filas vencidas
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        """Arranca el despachador en el event loop actual."""
+        global _active_dispatcher
+        if NOTIFICATION_BATCH_ENABLED:
+            self.batcher = NotificationBatcher()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        _active_dispatcher = self
+
+    async def stop(self):
+        """
+        Detiene el despachador. Las filas reservadas y no marcadas se vuelven
+        a entregar cuando vence su reserva.
+        """
+        global _active_dispatcher
+        if _active_dispatcher is self:
+            _active_dispatcher = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.batcher is not None:
+            await self.batcher.aclose()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "failed": self.failed,
+            "batching": self.batcher.snapshot() if self.batcher is not None else None,
+        }
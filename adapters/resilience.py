@@ -0,0 +1,494 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+import httpx
+from utils.deadline import DeadlineExceededError, clamp_timeouts, remaining
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class DependencyUnavailableError(httpx.TransportError):
+    """
+    Se lanza sin contactar al servicio remoto cuando su circuit breaker está
+    abierto o su bulkhead está lleno.
+    """
+
+    def __init__(self, service: str, reason: str, request: Optional[httpx.Request] = None):
+        super().__init__(f"Servicio '{service}' no disponible: {reason}", request=request)
+        self.service = service
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por servicio remoto.
+
+    - closed: las llamadas pasan; `failure_threshold` fallos seguidos lo abren.
+    - open: las llamadas fallan de inmediato durante `reset_timeout` segundos.
+    - half_open: se deja pasar una llamada de prueba; si responde bien el
+      circuito se cierra, si falla se vuelve a abrir.
+
+    Cuentan como fallo los errores de transporte (timeouts, conexión) y las
+    respuestas 5xx.
+    """
+
+    def __init__(self, service: str, failure_threshold: int, reset_timeout: float):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self, request: Optional[httpx.Request] = None):
+        """
+        Autoriza una llamada o lanza DependencyUnavailableError si el circuito no la admite.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self.rejected += 1
+        raise DependencyUnavailableError(self.service, "circuit breaker abierto", request=request)
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit breaker de '{self.service}' cerrado tras una llamada exitosa")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Circuit breaker de '{self.service}' abierto tras {self._failures} fallos seguidos")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def record_abandoned(self):
+        """Libera la llamada de prueba si se canceló sin llegar a un resultado."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+            self.rejected = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado actual del circuito para monitoreo."""
+        with self._lock:
+            state = self._current_state()
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)) if state == OPEN else 0.0
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "retry_in_seconds": round(retry_in, 3),
+                "rejected": self.rejected,
+            }
+
+
+class Bulkhead:
+    """
+    Limita las llamadas concurrentes a un servicio remoto. Cuando el límite se
+    alcanza las nuevas llamadas se rechazan de inmediato en lugar de encolarse,
+    de modo que un servicio lento no acapara todos los workers.
+    """
+
+    def __init__(self, service: str, max_concurrent: int):
+        self.service = service
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._active = 0
+        self.rejected = 0
+
+    def acquire(self, request: Optional[httpx.Request] = None):
+        with self._lock:
+            if self._active >= self.max_concurrent:
+                self.rejected += 1
+                raise DependencyUnavailableError(self.service, "demasiadas llamadas concurrentes", request=request)
+            self._active += 1
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"active": self._active, "max_concurrent": self.max_concurrent, "rejected": self.rejected}
+
+
+def _apply_deadline(request: httpx.Request):
+    # Cada llamada usa solo lo que queda del presupuesto de la solicitud
+    timeouts = request.extensions.get("timeout")
+    if timeouts is not None:
+        request.extensions["timeout"] = clamp_timeouts(timeouts)
+    elif remaining() is not None:
+        request.extensions["timeout"] = clamp_timeouts({"connect": None, "read": None, "write": None, "pool": None})
+
+
+def _deadline_spent() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def _record_response(breaker: CircuitBreaker, response: httpx.Response):
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+# Solo se reintentan o duplican peticiones idempotentes
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRYABLE_STATUS_CODES = frozenset({502, 503, 504})
+
+
+class RetryBudget:
+    """
+    Limita los reintentos a una fracción de las peticiones: cada petición
+    deposita `ratio` fichas y cada reintento (o petición cubierta) gasta una.
+    Así, si el servicio cae, los reintentos no multiplican la carga.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+        self.exhausted = 0
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self.exhausted += 1
+            return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"tokens": round(self._tokens, 3), "max_tokens": self.max_tokens, "exhausted": self.exhausted}
+
+
+class LatencyTracker:
+    """Guarda las latencias recientes de un servicio para estimar sus percentiles."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Returns:
+            float: Percentil pedido, o None si aún no hay suficientes muestras.
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class RetryPolicy:
+    """
+    Reintentos con backoff exponencial y jitter completo, limitados por un
+    RetryBudget, y peticiones cubiertas (hedging) opcionales para GET.
+
+    Args:
+        max_retries (int): Reintentos como máximo por petición.
+        backoff_base (float): Espera base (segundos) antes del primer reintento.
+        backoff_max (float): Espera máxima entre reintentos.
+        budget (RetryBudget): Presupuesto de reintentos del servicio.
+        hedge (bool): Si se envía una segunda petición cuando la primera tarda.
+        hedge_delay (float): Espera antes de cubrir mientras no hay suficientes
+            muestras para estimar el p95.
+    """
+
+    def __init__(
+        self,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        budget: RetryBudget,
+        hedge: bool = False,
+        hedge_delay: float = 0.5,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.budget = budget
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.latencies = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def should_retry(self, request: httpx.Request, attempt: int, delay: float) -> bool:
+        if request.method not in IDEMPOTENT_METHODS or attempt >= self.max_retries:
+            return False
+        left = remaining()
+        if left is not None and left <= delay:
+            return False  # El reintento no alcanzaría a completarse dentro del deadline
+        if not self.budget.try_withdraw():
+            return False
+        self.retries += 1
+        return True
+
+    def hedge_after(self, request: httpx.Request) -> Optional[float]:
+        """
+        Returns:
+            float: Segundos tras los cuales cubrir la petición (p95 observado),
+            o None si no corresponde cubrirla.
+        """
+        if not self.hedge or request.method not in IDEMPOTENT_METHODS:
+            return None
+        p95 = self.latencies.percentile(0.95)
+        return self.hedge_delay if p95 is None else p95
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.latencies.percentile(0.95)
+        return {
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedging": self.hedge,
+            "p95_latency_seconds": None if p95 is None else round(p95, 4),
+            "budget": self.budget.snapshot(),
+        }
+
+
+class ResilientTransport(httpx.BaseTransport):
+    """
+    Transporte que aplica el deadline de la solicitud, el circuit breaker, el
+    bulkhead y los reintentos a todas las peticiones de un cliente.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.BaseTransport,
+        breaker: CircuitBreaker,
+        bulkhead: Bulkhead,
+        policy: Optional[RetryPolicy] = None,
+    ):
+        self._transport = transport
+        self._breaker = breaker
+        self._bulkhead = bulkhead
+        self._policy = policy
+
+    def _send_once(self, request: httpx.Request) -> httpx.Response:
+        _apply_deadline(request)
+        self._breaker.before_call(request)
+        try:
+            self._bulkhead.acquire(request)
+        except DependencyUnavailableError:
+            self._breaker.record_abandoned()
+            raise
+        started = time.monotonic()
+        try:
+            response = self._transport.handle_request(request)
+        except httpx.TimeoutException as exc:
+            if _deadline_spent():
+                # Se agotó el presupuesto de la solicitud, no es culpa del servicio
+                self._breaker.record_abandoned()
+                raise DeadlineExceededError(f"El tiempo de la solicitud se agotó llamando a {request.url}") from exc
+            self._breaker.record_failure()
+            raise
+        except httpx.TransportError:
+            self._breaker.record_failure()
+            raise
+        except BaseException:
+            self._breaker.record_abandoned()
+            raise
+        finally:
+            self._bulkhead.release()
+        _record_response(self._breaker, response)
+        if self._policy is not None and response.status_code < 500:
+            self._policy.latencies.record(time.monotonic() - started)
+        return response
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self._policy is None:
+            return self._send_once(request)
+
+        self._policy.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                response = self._send_once(request)
+            except DependencyUnavailableError:
+                raise
+            except httpx.TransportError:
+                delay = self._policy.backoff(attempt)
+                if not self._policy.should_retry(request, attempt, delay):
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    return response
+                delay = self._policy.backoff(attempt)
+                if not self._policy.should_retry(request, attempt, delay):
+                    return response
+                response.close()
+            logger.info(f"Reintentando {request.method} {request.url} en {delay:.3f}s (intento {attempt + 2})")
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncResilientTransport(httpx.AsyncBaseTransport):
+    """
+    Versión asíncrona de `ResilientTransport`. Además cubre los GET lentos:
+    si la primera petición no responde dentro del p95 observado, envía una
+    segunda y usa la que responda primero.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        breaker: CircuitBreaker,
+        bulkhead: Bulkhead,
+        policy: Optional[RetryPolicy] = None,
+    ):
+        self._transport = transport
+        self._breaker = breaker
+        self._bulkhead = bulkhead
+        self._policy = policy
+
+    async def _send_once(self, request: httpx.Request) -> httpx.Response:
+        _apply_deadline(request)
+        self._breaker.before_call(request)
+        try:
+            self._bulkhead.acquire(request)
+        except DependencyUnavailableError:
+            self._breaker.record_abandoned()
+            raise
+        started = time.monotonic()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TimeoutException as exc:
+            if _deadline_spent():
+                # Se agotó el presupuesto de la solicitud, no es culpa del servicio
+                self._breaker.record_abandoned()
+                raise DeadlineExceededError(f"El tiempo de la solicitud se agotó llamando a {request.url}") from exc
+            self._breaker.record_failure()
+            raise
+        except httpx.TransportError:
+            self._breaker.record_failure()
+            raise
+        except BaseException:
+            # Incluye la cancelación de la tarea: no es un fallo del servicio
+            self._breaker.record_abandoned()
+            raise
+        finally:
+            self._bulkhead.release()
+        _record_response(self._breaker, response)
+        if self._policy is not None and response.status_code < 500:
+            self._policy.latencies.record(time.monotonic() - started)
+        return response
+
+    async def _send_hedged(self, request: httpx.Request) -> httpx.Response:
+        hedge_after = self._policy.hedge_after(request)
+        if hedge_after is None:
+            return await self._send_once(request)
+
+        first = asyncio.ensure_future(self._send_once(request))
+        try:
+            done, _ = await asyncio.wait({first}, timeout=hedge_after)
+        except asyncio.CancelledError:
+            first.cancel()
+            raise
+        if done or not self._policy.budget.try_withdraw():
+            return await first
+
+        self._policy.hedges += 1
+        second = asyncio.ensure_future(self._send_once(request))
+        tasks = [first, second]
+        winner = None
+        try:
+            pending = set(tasks)
+            while pending and winner is None:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in tasks if t.done() and not t.cancelled() and t.exception() is None), None)
+            # Si ambas fallaron se propaga el error de la primera
+            return (winner or first).result()
+        finally:
+            losers = [t for t in tasks if t is not winner]
+            for task in losers:
+                task.cancel()
+            for result in await asyncio.gather(*losers, return_exceptions=True):
+                if isinstance(result, httpx.Response):
+                    await result.aclose()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._policy is None:
+            return await self._send_once(request)
+
+        self._policy.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                response = await self._send_hedged(request)
+            except DependencyUnavailableError:
+                raise
+            except httpx.TransportError:
+                delay = self._policy.backoff(attempt)
+                if not self._policy.should_retry(request, attempt, delay):
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    return response
+                delay = self._policy.backoff(attempt)
+                if not self._policy.should_retry(request, attempt, delay):
+                    return response
+                await response.aclose()
+            logger.info(f"Reintentando {request.method} {request.url} en {delay:.3f}s (intento {attempt + 2})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        await self._transport.aclose()
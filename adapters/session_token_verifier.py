@@ -0,0 +1,178 @@
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+from jose import jwt
+from jose.exceptions import JWTError, ExpiredSignatureError
+from pydantic import ValidationError
+from domain.schemas import UserResponse
+from adapters.http_clients import get_http_client, get_async_http_client, USERS_SERVICE
+from utils.cache import ReferenceCache
+import logging
+import os
+import threading
+import time
+
+# Load environment variables
+load_dotenv(override=True, encoding="utf-8")
+
+logger = logging.getLogger(__name__)
+
+USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://localhost:8000")
+
+# Local verification of signed (JWT) session tokens. Disabled by default:
+# every token then goes to the user service as before.
+SESSION_TOKEN_LOCAL_VERIFICATION = os.getenv("SESSION_TOKEN_LOCAL_VERIFICATION", "false").lower() in ("1", "true", "yes")
+SESSION_TOKEN_JWKS_URL = os.getenv("SESSION_TOKEN_JWKS_URL", f"{USER_SERVICE_URL}/users-service/.well-known/jwks.json")
+SESSION_TOKEN_JWKS_REFRESH_INTERVAL = float(os.getenv("SESSION_TOKEN_JWKS_REFRESH_INTERVAL", "300"))
+# Minimum time between forced key set reloads triggered by an unknown `kid`
+SESSION_TOKEN_JWKS_MIN_REFRESH_INTERVAL = float(os.getenv("SESSION_TOKEN_JWKS_MIN_REFRESH_INTERVAL", "30"))
+SESSION_TOKEN_ALGORITHMS = [alg.strip() for alg in os.getenv("SESSION_TOKEN_ALGORITHMS", "RS256").split(",") if alg.strip()]
+SESSION_TOKEN_ISSUER = os.getenv("SESSION_TOKEN_ISSUER") or None
+SESSION_TOKEN_AUDIENCE = os.getenv("SESSION_TOKEN_AUDIENCE") or None
+
+# Returned when a token cannot be decided locally (opaque token, unknown key,
+# missing user claims); the caller must fall back to the remote check.
+UNVERIFIABLE = object()
+
+_forced_refresh_lock = threading.Lock()
+_last_forced_refresh = float("-inf")
+
+
+def _index_keys(response) -> Dict[Optional[str], Dict[str, Any]]:
+    response.raise_for_status()
+    return {key.get("kid"): key for key in response.json().get("keys", [])}
+
+
+def _fetch_jwks(_key=None):
+    return _index_keys(get_http_client(USERS_SERVICE).get(SESSION_TOKEN_JWKS_URL))
+
+
+async def _fetch_jwks_async(_key=None):
+    return _index_keys(await get_async_http_client(USERS_SERVICE).get(SESSION_TOKEN_JWKS_URL))
+
+
+_jwks_cache = ReferenceCache(
+    "session-token-jwks",
+    loader=_fetch_jwks,
+    async_loader=_fetch_jwks_async,
+    ttl=SESSION_TOKEN_JWKS_REFRESH_INTERVAL,
+)
+
+
+def _claim_forced_refresh() -> bool:
+    """Rate-limits key set reloads so random `kid`s cannot hammer the user service."""
+    global _last_forced_refresh
+    with _forced_refresh_lock:
+        now = time.monotonic()
+        if now - _last_forced_refresh < SESSION_TOKEN_JWKS_MIN_REFRESH_INTERVAL:
+            return False
+        _last_forced_refresh = now
+        return True
+
+
+def _token_kid(session_token: str):
+    try:
+        header = jwt.get_unverified_header(session_token)
+    except JWTError:
+        return UNVERIFIABLE  # Opaque (non-JWT) token
+    return header.get("kid")
+
+
+def _select_key(keys: Dict[Optional[str], Dict[str, Any]], kid: Optional[str]):
+    if kid is None and len(keys) == 1:
+        return next(iter(keys.values()))
+    return keys.get(kid)
+
+
+def _decode(session_token: str, key: Dict[str, Any]):
+    try:
+        claims = jwt.decode(
+            session_token,
+            key,
+            algorithms=SESSION_TOKEN_ALGORITHMS,
+            issuer=SESSION_TOKEN_ISSUER,
+            audience=SESSION_TOKEN_AUDIENCE,
+            options={"verify_aud": SESSION_TOKEN_AUDIENCE is not None},
+        )
+    except ExpiredSignatureError:
+        logger.info("Session token expired (verified locally)")
+        return None
+    except JWTError as e:
+        logger.warning(f"Session token rejected by local verification: {e}")
+        return None
+
+    try:
+        return UserResponse(
+            user_id=int(claims.get("user_id", claims.get("sub"))),
+            name=claims["name"],
+            email=claims["email"],
+        )
+    except (KeyError, TypeError, ValueError, ValidationError):
+        # Correctly signed but without the user claims we need
+        return UNVERIFIABLE
+
+
+def verify_session_token_locally(session_token: str):
+    """
+    Verifies a signed session token against the cached key set of the user service.
+
+    Args:
+        session_token (str): Session token to verify
+
+    Returns:
+        UserResponse if the token is valid, None if it is invalid or expired,
+        or UNVERIFIABLE if it must be checked remotely.
+    """
+    if not SESSION_TOKEN_LOCAL_VERIFICATION:
+        return UNVERIFIABLE
+
+    kid = _token_kid(session_token)
+    if kid is UNVERIFIABLE:
+        return UNVERIFIABLE
+
+    try:
+        keys = _jwks_cache.get()
+        if _select_key(keys, kid) is None and _claim_forced_refresh():
+            # Possible key rotation: reload the key set once
+            _jwks_cache.invalidate()
+            keys = _jwks_cache.get()
+    except Exception as e:
+        logger.warning(f"Could not load session token key set: {e}")
+        return UNVERIFIABLE
+
+    key = _select_key(keys, kid)
+    if key is None:
+        return UNVERIFIABLE
+    return _decode(session_token, key)
+
+
+async def verify_session_token_locally_async(session_token: str):
+    """
+    Async counterpart of `verify_session_token_locally`.
+
+    Args:
+        session_token (str): Session token to verify
+
+    Returns:
+        UserResponse if the token is valid, None if it is invalid or expired,
+        or UNVERIFIABLE if it must be checked remotely.
+    """
+    if not SESSION_TOKEN_LOCAL_VERIFICATION:
+        return UNVERIFIABLE
+
+    kid = _token_kid(session_token)
+    if kid is UNVERIFIABLE:
+        return UNVERIFIABLE
+
+    try:
+        keys = await _jwks_cache.aget()
+        if _select_key(keys, kid) is None and _claim_forced_refresh():
+            _jwks_cache.invalidate()
+            keys = await _jwks_cache.aget()
+    except Exception as e:
+        logger.warning(f"Could not load session token key set: {e}")
+        return UNVERIFIABLE
+
+    key = _select_key(keys, kid)
+    if key is None:
+        return UNVERIFIABLE
+    return _decode(session_token, key)
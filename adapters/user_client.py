@@ -1,7 +1,17 @@
-from typing import Optional, Any, Dict, Union
+from typing import Optional, Any, Dict, FrozenSet, Tuple, Union
 from dotenv import load_dotenv
 from domain.schemas import UserResponse
-import httpx
+from adapters.http_clients import get_http_client, get_async_http_client, USERS_SERVICE
+from adapters.resilience import DependencyUnavailableError
+from utils.deadline import DeadlineExceededError
+from adapters.session_token_verifier import (
+    UNVERIFIABLE,
+    verify_session_token_locally,
+    verify_session_token_locally_async
+)
+from utils.cache import ReferenceCache, TTLCache, MISSING
+from utils.single_flight import SingleFlight
+import hashlib
 import logging
 import os
 
@@ -13,72 +23,227 @@ logger = logging.getLogger(__name__)
 USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://localhost:8000")
 DEFAULT_TIMEOUT = 10.0
 
+# Session token verification cache. Valid and invalid tokens live in separate
+# bounded LRUs so a flood of bogus tokens can never evict real sessions.
+SESSION_TOKEN_CACHE_TTL = float(os.getenv("SESSION_TOKEN_CACHE_TTL", "30"))
+SESSION_TOKEN_CACHE_NEGATIVE_TTL = float(os.getenv("SESSION_TOKEN_CACHE_NEGATIVE_TTL", "10"))
+SESSION_TOKEN_CACHE_MAX_SIZE = int(os.getenv("SESSION_TOKEN_CACHE_MAX_SIZE", "10000"))
+
+_valid_session_tokens = TTLCache("valid-session-tokens", SESSION_TOKEN_CACHE_MAX_SIZE, SESSION_TOKEN_CACHE_TTL)
+_invalid_session_tokens = TTLCache("invalid-session-tokens", SESSION_TOKEN_CACHE_MAX_SIZE, SESSION_TOKEN_CACHE_NEGATIVE_TTL)
+
+# Role names and the permissions of a user_role change rarely. Permissions drive
+# authorization decisions: they get a shorter TTL, a bounded LRU (one entry per
+# user_role) and a hard expiry, and are never served stale.
+ROLE_NAME_CACHE_TTL = float(os.getenv("ROLE_NAME_CACHE_TTL", "300"))
+USER_ROLE_PERMISSIONS_CACHE_TTL = float(os.getenv("USER_ROLE_PERMISSIONS_CACHE_TTL", "60"))
+USER_ROLE_PERMISSIONS_CACHE_MAX_SIZE = int(os.getenv("USER_ROLE_PERMISSIONS_CACHE_MAX_SIZE", "10000"))
+
 class UserRoleCreationError(Exception):
     """Custom exception for errors during user role creation."""
     pass
 
+class UserServiceUnavailableError(Exception):
+    """Raised when the user service cannot be reached or fails to answer."""
+    pass
+
+def _request_args(
+    method: str,
+    data: Optional[Dict[str, Any]],
+    params: Optional[Dict[str, Any]],
+    timeout: float
+) -> Tuple[Optional[str], Dict[str, Any]]:
+    # Client method and keyword arguments for one request to the user service
+    if method.upper() == "GET":
+        return "get", {"params": params, "timeout": timeout}
+    if method.upper() == "POST":
+        return "post", {"json": data, "timeout": timeout}
+    logger.error(f"Unsupported HTTP method: {method}")
+    return None, {}
+
 def _make_request(
     endpoint: str,
     method: str = "GET",
     data: Optional[Dict[str, Any]] = None,
     params: Optional[Dict[str, Any]] = None,
-    timeout: float = DEFAULT_TIMEOUT
+    timeout: float = DEFAULT_TIMEOUT,
+    client_errors_as_response: bool = False
 ) -> Optional[Dict[str, Any]]:
     """
     Base function to make HTTP requests to the user service.
-    
+    Uses the shared, pooled client for the user service.
+
     Args:
         endpoint (str): The API endpoint to call (without base URL)
         method (str): HTTP method to use ('GET', 'POST', etc.)
         data (dict, optional): JSON data to send in the request body
         params (dict, optional): Query parameters to include in the request
         timeout (float): Request timeout in seconds
-        
+        client_errors_as_response (bool): Return an error dict for 4xx answers
+            instead of None, so callers can tell a rejection from a failure
+
     Returns:
         dict: Response data as dictionary if successful, None otherwise
     """
     url = f"{USER_SERVICE_URL}{endpoint}"
-    
+    client_method, kwargs = _request_args(method, data, params, timeout)
+    if client_method is None:
+        return None
+
+    try:
+        response = getattr(get_http_client(USERS_SERVICE), client_method)(url, **kwargs)
+        return _parse_response(url, response, client_errors_as_response)
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
+    except Exception as e:
+        logger.error(f"Exception calling {url}: {str(e)}")
+        return None
+
+async def _make_request_async(
+    endpoint: str,
+    method: str = "GET",
+    data: Optional[Dict[str, Any]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+    client_errors_as_response: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Async counterpart of `_make_request`, using the shared async client.
+    Same arguments and return value.
+    """
+    url = f"{USER_SERVICE_URL}{endpoint}"
+    client_method, kwargs = _request_args(method, data, params, timeout)
+    if client_method is None:
+        return None
+
     try:
-        with httpx.Client(timeout=timeout) as client:
-            if method.upper() == "GET":
-                response = client.get(url, params=params)
-            elif method.upper() == "POST":
-                response = client.post(url, json=data)
-            else:
-                logger.error(f"Unsupported HTTP method: {method}")
-                return None
-                
-            if response.status_code in (200, 201):
-                return response.json()
-            else:
-                logger.error(f"Error calling {url}: {response.status_code} - {response.text}")
-                return None
+        response = await getattr(get_async_http_client(USERS_SERVICE), client_method)(url, **kwargs)
+        return _parse_response(url, response, client_errors_as_response)
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
     except Exception as e:
         logger.error(f"Exception calling {url}: {str(e)}")
         return None
 
+def _parse_response(url: str, response, client_errors_as_response: bool = False) -> Optional[Dict[str, Any]]:
+    if response.status_code in (200, 201):
+        return response.json()
+    logger.error(f"Error calling {url}: {response.status_code} - {response.text}")
+    if client_errors_as_response and 400 <= response.status_code < 500:
+        return {"status": "error", "status_code": response.status_code}
+    return None
+
+def _parse_user(response: Optional[Dict[str, Any]]) -> Optional[UserResponse]:
+    if response and response.get("status") == "success" and "user" in response.get("data", {}):
+        # Convertir diccionario a objeto Pydantic
+        return UserResponse(**response["data"]["user"])
+    return None
+
+def _parse_user_role(response: Optional[Dict[str, Any]], user_id: int, role_name: str) -> dict:
+    if response and "user_role_id" in response:
+        return response
+    raise UserRoleCreationError(f"Error creating user_role for user {user_id} with role '{role_name}': {response}")
+
+def _parse_permissions(response: Optional[Dict[str, Any]]) -> Optional[FrozenSet[str]]:
+    if response and "permissions" in response:
+        return frozenset(perm["name"] for perm in response["permissions"])
+    return None
+
+def _parse_role_name(response: Optional[Dict[str, Any]], role_id: int) -> Optional[str]:
+    if response and "role_name" in response:
+        return response["role_name"]
+    logger.error(f"Could not retrieve role name for role_id {role_id}")
+    return None
+
+def _token_key(session_token: str) -> bytes:
+    # Only a digest of the token is ever kept in memory
+    return hashlib.sha256(session_token.encode("utf-8")).digest()
+
+def _cached_session_user(key: bytes):
+    user = _valid_session_tokens.get(key)
+    if user is not MISSING:
+        return user
+    if _invalid_session_tokens.get(key) is not MISSING:
+        return None
+    return MISSING
+
+def _cache_session_verification(key: bytes, response: Optional[Dict[str, Any]]) -> Optional[UserResponse]:
+    user = _parse_user(response)
+    if user is not None:
+        _valid_session_tokens.set(key, user)
+    elif response is not None:
+        # The user service answered and rejected the token: cache the rejection.
+        # Transport errors and 5xx (response is None) are never cached.
+        _invalid_session_tokens.set(key, True)
+    return user
+
+def evict_session_token(session_token: str):
+    """
+    Removes a session token from the verification cache (e.g. after logout),
+    so the next request verifies it again against the user service.
+
+    Args:
+        session_token (str): Session token to evict
+    """
+    key = _token_key(session_token)
+    _valid_session_tokens.pop(key)
+    _invalid_session_tokens.pop(key)
+
 def verify_session_token(session_token: str) -> Optional[Union[Dict[str, Any], UserResponse]]:
     """
     Verifies a session token by making a request to the user service.
     Returns user data if the token is valid, None otherwise.
-    
+
+    Signed tokens are verified locally when SESSION_TOKEN_LOCAL_VERIFICATION
+    is enabled; opaque or unknown tokens go to the user service. Remote
+    results are cached for a short time, keyed by a hash of the token;
+    rejected tokens are cached too (negative caching).
+
     Args:
         session_token (str): Session token to verify
-        
+
     Returns:
         UserResponse: User data object if token is valid, None otherwise
     """
+    user = verify_session_token_locally(session_token)
+    if user is not UNVERIFIABLE:
+        return user
+    key = _token_key(session_token)
+    cached = _cached_session_user(key)
+    if cached is not MISSING:
+        return cached
     response = _make_request(
-        "/users-service/session-token-verification", 
-        method="POST", 
-        data={"session_token": session_token}
+        "/users-service/session-token-verification",
+        method="POST",
+        data={"session_token": session_token},
+        client_errors_as_response=True
     )
-    
-    if response and response.get("status") == "success" and "user" in response.get("data", {}):
-        # Convertir diccionario a objeto Pydantic
-        return UserResponse(**response["data"]["user"])
-    return None
+    return _cache_session_verification(key, response)
+
+async def verify_session_token_async(session_token: str) -> Optional[UserResponse]:
+    """
+    Async counterpart of `verify_session_token`, sharing the same cache.
+
+    Args:
+        session_token (str): Session token to verify
+
+    Returns:
+        UserResponse: User data object if token is valid, None otherwise
+    """
+    user = await verify_session_token_locally_async(session_token)
+    if user is not UNVERIFIABLE:
+        return user
+    key = _token_key(session_token)
+    cached = _cached_session_user(key)
+    if cached is not MISSING:
+        return cached
+    response = await _make_request_async(
+        "/users-service/session-token-verification",
+        method="POST",
+        data={"session_token": session_token},
+        client_errors_as_response=True
+    )
+    return _cache_session_verification(key, response)
 
 def user_verification_by_email(email: str):
     """
@@ -86,9 +251,16 @@ def user_verification_by_email(email: str):
     Retorna el objeto usuario si existe, None si no.
     """
     response = _make_request("/users-service/user-verification-by-email", method="POST", data={"email": email})
-    if response and response.get("status") == "success" and "user" in response.get("data", {}):
-        return UserResponse(**response["data"]["user"])
-    return None
+    return _parse_user(response)
+
+async def user_verification_by_email_async(email: str):
+    """
+    Versión asíncrona de `user_verification_by_email`.
+    """
+    response = await _make_request_async(
+        "/users-service/user-verification-by-email", method="POST", data={"email": email}
+    )
+    return _parse_user(response)
 
 def create_user_role(user_id: int, role_name: str) -> dict:
     """
@@ -105,33 +277,145 @@ def create_user_role(user_id: int, role_name: str) -> dict:
         Exception: If the request fails or response is invalid.
     """
     response = _make_request(
-        "/users-service/user-role",
-        method="POST",
-        data={"user_id": user_id, "role_name": role_name}
+        "/users-service/user-role", method="POST", data={"user_id": user_id, "role_name": role_name}
     )
-    if response and "user_role_id" in response:
-        return response
-    else:
-        raise UserRoleCreationError(f"Error creating user_role for user {user_id} with role '{role_name}': {response}")
+    return _parse_user_role(response, user_id, role_name)
+
+async def create_user_role_async(user_id: int, role_name: str) -> dict:
+    """
+    Async counterpart of `create_user_role`.
+
+    Args:
+        user_id (int): The user ID.
+        role_name (str): The role name to assign.
+
+    Returns:
+        dict: The response data from the user service.
+
+    Raises:
+        UserRoleCreationError: If the request fails or response is invalid.
+    """
+    response = await _make_request_async(
+        "/users-service/user-role", method="POST", data={"user_id": user_id, "role_name": role_name}
+    )
+    return _parse_user_role(response, user_id, role_name)
+
+def _require_response(response: Optional[Dict[str, Any]], endpoint: str) -> Dict[str, Any]:
+    # Transport errors and 5xx must raise: nothing is cached, and the role name
+    # cache keeps serving its last good copy
+    if response is None:
+        raise UserServiceUnavailableError(f"No response from user service for {endpoint}")
+    return response
+
+def _fetch_user_role_permissions(user_role_id: int) -> Optional[FrozenSet[str]]:
+    endpoint = f"/users-service/user-role/{user_role_id}/permissions"
+    return _parse_permissions(_require_response(_make_request(endpoint), endpoint))
+
+async def _fetch_user_role_permissions_async(user_role_id: int) -> Optional[FrozenSet[str]]:
+    endpoint = f"/users-service/user-role/{user_role_id}/permissions"
+    return _parse_permissions(_require_response(await _make_request_async(endpoint), endpoint))
+
+def _fetch_role_name(role_id: int) -> Optional[str]:
+    endpoint = f"/users-service/{role_id}/name"
+    return _parse_role_name(_require_response(_make_request(endpoint), endpoint), role_id)
 
-def get_role_permissions_for_user_role(user_role_id: int) -> list:
+async def _fetch_role_name_async(role_id: int) -> Optional[str]:
+    endpoint = f"/users-service/{role_id}/name"
+    return _parse_role_name(_require_response(await _make_request_async(endpoint), endpoint), role_id)
+
+_user_role_permissions_cache = TTLCache(
+    "user-role-permissions",
+    USER_ROLE_PERMISSIONS_CACHE_MAX_SIZE,
+    USER_ROLE_PERMISSIONS_CACHE_TTL,
+)
+# Concurrent misses for the same user_role share one request
+_user_role_permissions_flight = SingleFlight("user-role-permissions")
+_role_names_cache = ReferenceCache(
+    "role-names",
+    loader=_fetch_role_name,
+    async_loader=_fetch_role_name_async,
+    ttl=ROLE_NAME_CACHE_TTL,
+)
+
+def invalidate_user_role_permissions(user_role_id: Optional[int] = None):
     """
-    Gets the list of permission names for a given user_role_id from the user service.
+    Drops cached permissions for a user_role (or for all of them), e.g. after
+    its role or the role's permissions change.
+
+    Args:
+        user_role_id (int, optional): ID of the UserRole entry; None clears the whole cache
+    """
+    _user_role_permissions_cache.invalidate(user_role_id)
+
+def invalidate_role_name(role_id: Optional[int] = None):
+    """
+    Drops a cached role name (or all of them).
+
+    Args:
+        role_id (int, optional): ID of the Role; None clears the whole cache
+    """
+    _role_names_cache.invalidate(role_id)
+
+def _cache_permissions(user_role_id: int, permissions: Optional[FrozenSet[str]]) -> FrozenSet[str]:
+    if permissions is None:
+        return frozenset()
+    _user_role_permissions_cache.set(user_role_id, permissions)
+    return permissions
+
+def get_role_permissions_for_user_role(user_role_id: int) -> FrozenSet[str]:
+    """
+    Gets the set of permission names for a given user_role_id from the user service.
+    Results are cached in process for USER_ROLE_PERMISSIONS_CACHE_TTL seconds.
+    Fails closed: once an entry expires, a failed reload yields no permissions.
 
     Args:
         user_role_id (int): ID of the UserRole entry
 
     Returns:
-        list: List of permission names (str)
+        frozenset: Permission names (str); empty if they could not be retrieved
     """
-    response = _make_request(f"/users-service/user-role/{user_role_id}/permissions")
-    if response and "permissions" in response:
-        return [perm["name"] for perm in response["permissions"]]
-    return []
+    cached = _user_role_permissions_cache.get(user_role_id)
+    if cached is not MISSING:
+        return cached
+    try:
+        permissions = _user_role_permissions_flight.do(
+            user_role_id, lambda: _fetch_user_role_permissions(user_role_id)
+        )
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
+    except Exception as e:
+        logger.error(f"Could not retrieve permissions for user_role_id {user_role_id}: {e}")
+        return frozenset()
+    return _cache_permissions(user_role_id, permissions)
+
+async def get_role_permissions_for_user_role_async(user_role_id: int) -> FrozenSet[str]:
+    """
+    Async counterpart of `get_role_permissions_for_user_role`, sharing the same cache.
+
+    Args:
+        user_role_id (int): ID of the UserRole entry
+
+    Returns:
+        frozenset: Permission names (str); empty if they could not be retrieved
+    """
+    cached = _user_role_permissions_cache.get(user_role_id)
+    if cached is not MISSING:
+        return cached
+    try:
+        permissions = await _user_role_permissions_flight.ado(
+            user_role_id, lambda: _fetch_user_role_permissions_async(user_role_id)
+        )
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
+    except Exception as e:
+        logger.error(f"Could not retrieve permissions for user_role_id {user_role_id}: {e}")
+        return frozenset()
+    return _cache_permissions(user_role_id, permissions)
 
 def get_role_name_by_id(role_id: int) -> Optional[str]:
     """
     Gets the role name for a given role_id from the user service.
+    Results are served from an in-process cache (ROLE_NAME_CACHE_TTL).
 
     Args:
         role_id (int): ID of the Role
@@ -139,8 +423,28 @@ def get_role_name_by_id(role_id: int) -> Optional[str]:
     Returns:
         str: The name of the role, or None if not found or error occurs.
     """
-    response = _make_request(f"/users-service/{role_id}/name")
-    if response and "role_name" in response:
-        return response["role_name"]
-    logger.error(f"Could not retrieve role name for role_id {role_id}")
-    return None
\ No newline at end of file
+    try:
+        return _role_names_cache.get(role_id)
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
+    except Exception as e:
+        logger.error(f"Could not retrieve role name for role_id {role_id}: {e}")
+        return None
+
+async def get_role_name_by_id_async(role_id: int) -> Optional[str]:
+    """
+    Async counterpart of `get_role_name_by_id`, sharing the same cache.
+
+    Args:
+        role_id (int): ID of the Role
+
+    Returns:
+        str: The name of the role, or None if not found or error occurs.
+    """
+    try:
+        return await _role_names_cache.aget(role_id)
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
+    except Exception as e:
+        logger.error(f"Could not retrieve role name for role_id {role_id}: {e}")
+        return None
@@ -0,0 +1,59 @@
+from fastapi import APIRouter
+from adapters.http_clients import get_dependency_states
+from adapters.invitation_expiry import get_expiry_stats
+from dataBase import get_pool_stats, check_database
+from utils.response import create_response
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/dependencies")
+def dependencies_health():
+    """
+    Expone el estado de los circuit breakers y bulkheads de los servicios remotos.
+
+    Returns:
+        dict: Estado por servicio (farms, users, notifications).
+    """
+    return get_dependency_states()
+
+
+@router.get("/database")
+def database_health():
+    """
+    Expone el uso de los pools de conexiones a la base de datos: conexiones en
+    uso, esperas, tiempo de espera y uso de overflow.
+
+    Returns:
+        dict: Estado por pool (sync y, si está activo, async).
+    """
+    return get_pool_stats()
+
+
+@router.get("/invitation-expiry")
+def invitation_expiry_health():
+    """
+    Expone las métricas del barrido de invitaciones vencidas de esta instancia.
+
+    Returns:
+        dict: Barridos, invitaciones borradas (o que se borrarían en dry-run),
+        fallos al borrar notificaciones y duración del último barrido.
+    """
+    return get_expiry_stats()
+
+
+@router.get("/ready")
+async def readiness():
+    """
+    Indica si el servicio puede atender solicitudes: comprueba la conexión a la
+    base de datos sin bloquear el event loop.
+
+    Returns:
+        JSONResponse: 200 si la base de datos responde, 503 si no.
+    """
+    database = await check_database()
+    if database["status"] != "ok":
+        return create_response("error", "Base de datos no disponible", {"database": database}, status_code=503)
+    return create_response("success", "Servicio listo", {"database": database})
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from datetime import datetime
+from typing import Literal, Optional, Union
 from sqlalchemy.orm import Session
-from adapters.user_client import verify_session_token
-from dataBase import get_db_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from adapters.user_client import verify_session_token_async
+from dataBase import DB_ASYNC_ENABLED, AsyncSessionLocal, SessionLocal, get_db, init_db
 from utils.response import session_token_invalid_response
+from utils.deadline import request_deadline
 from use_cases.create_invitation_use_case import create_invitation
 from use_cases.respond_invitation_use_case import respond_invitation
+from use_cases.list_invitations_use_case import list_received_invitations, list_farm_invitations
+from use_cases.export_invitations_use_case import export_invitations
+from utils.pagination import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
 from domain.schemas import InvitationCreate
 import logging
 import pytz
@@ -16,27 +23,29 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/create-invitation")
-def create_invitation_endpoint(invitation_data: InvitationCreate, session_token: str, db: Session = Depends(get_db_session)):
+async def create_invitation_endpoint(invitation_data: InvitationCreate, session_token: str, db: Union[Session, AsyncSession] = Depends(get_db)):
     """
     Crea una invitación para un usuario a una finca.
 
     Args:
         invitation_data (InvitationCreate): Datos de la invitación a crear.
         session_token (str): Token de sesión del usuario autenticado.
-        db (Session): Sesión de base de datos.
+        db (Session | AsyncSession): Sesión de base de datos (asíncrona si DB_ASYNC_ENABLED).
 
     Returns:
         JSONResponse: Respuesta con el resultado de la creación de la invitación.
     """
-    # Validar el session_token y obtener el usuario autenticado (el invitador)
-    user = verify_session_token(session_token)
-    if not user:
-        return session_token_invalid_response()
-    
-    return create_invitation(invitation_data, user, db)
+    # Todas las llamadas remotas y consultas comparten el presupuesto de la solicitud
+    with request_deadline():
+        # Validar el session_token y obtener el usuario autenticado (el invitador)
+        user = await verify_session_token_async(session_token)
+        if not user:
+            return session_token_invalid_response()
+
+        return await create_invitation(invitation_data, user, db)
 
 @router.post("/respond-invitation/{invitation_id}")
-def respond_invitation_endpoint(invitation_id: int, action: str, session_token: str, db: Session = Depends(get_db_session)):
+async def respond_invitation_endpoint(invitation_id: int, action: str, session_token: str, db: Union[Session, AsyncSession] = Depends(get_db)):
     """
     Responde a una invitación con las acciones 'accept' o 'reject'.
     
@@ -44,15 +53,109 @@ def respond_invitation_endpoint(invitation_id: int, action: str, session_token:
     - invitation_id: ID de la invitación a procesar.
     - action: La acción a realizar ('accept' o 'reject').
     - session_token: Token de sesión del usuario autenticado.
-    - db: Sesión de la base de datos (inyectada mediante Depends).
+    - db: Sesión de la base de datos (inyectada mediante Depends; asíncrona si DB_ASYNC_ENABLED).
     
     Retorna:
     - Un mensaje de éxito o error en función de la acción realizada.
     """
-    # Validar el session_token y obtener el usuario autenticado
-    user = verify_session_token(session_token)
-    if not user:
-        return session_token_invalid_response()
+    with request_deadline():
+        # Validar el session_token y obtener el usuario autenticado
+        user = await verify_session_token_async(session_token)
+        if not user:
+            return session_token_invalid_response()
+
+        # Llama al use case para manejar la lógica de respuesta
+        return await respond_invitation(invitation_id, action, user, db)
+
+@router.get("/received")
+async def list_received_invitations_endpoint(
+    session_token: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    db: Union[Session, AsyncSession] = Depends(get_db)
+):
+    """
+    Lista las invitaciones pendientes del usuario autenticado, de la más reciente
+    a la más antigua.
+
+    Args:
+        session_token (str): Token de sesión del usuario autenticado.
+        cursor (str, optional): `next_cursor` de la página anterior; sin él, la primera página.
+        limit (int): Invitaciones por página (máximo PAGE_SIZE_MAX).
+        db (Session | AsyncSession): Sesión de base de datos (asíncrona si DB_ASYNC_ENABLED).
+
+    Returns:
+        JSONResponse: Las invitaciones de la página y `next_cursor` (null en la última).
+    """
+    with request_deadline():
+        user = await verify_session_token_async(session_token)
+        if not user:
+            return session_token_invalid_response()
+
+        return await list_received_invitations(user, cursor, limit, db)
+
+@router.get("/farm/{farm_id}")
+async def list_farm_invitations_endpoint(
+    farm_id: int,
+    session_token: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    db: Union[Session, AsyncSession] = Depends(get_db)
+):
+    """
+    Lista las invitaciones pendientes de una finca, de la más reciente a la más
+    antigua. Solo para usuarios activos en la finca con permiso para invitar.
+
+    Args:
+        farm_id (int): ID de la finca.
+        session_token (str): Token de sesión del usuario autenticado.
+        cursor (str, optional): `next_cursor` de la página anterior; sin él, la primera página.
+        limit (int): Invitaciones por página (máximo PAGE_SIZE_MAX).
+        db (Session | AsyncSession): Sesión de base de datos (asíncrona si DB_ASYNC_ENABLED).
+
+    Returns:
+        JSONResponse: Las invitaciones de la página y `next_cursor` (null en la última).
+    """
+    with request_deadline():
+        user = await verify_session_token_async(session_token)
+        if not user:
+            return session_token_invalid_response()
+
+        return await list_farm_invitations(farm_id, user, cursor, limit, db)
+
+@router.get("/export")
+async def export_invitations_endpoint(
+    farm_id: int,
+    session_token: str,
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    inviter_user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+):
+    """
+    Exporta las invitaciones de una finca como NDJSON o CSV, transmitidas por
+    partes desde un cursor del servidor. Mismo permiso que el listado de la finca.
+
+    Args:
+        farm_id (int): ID de la finca.
+        session_token (str): Token de sesión del usuario autenticado.
+        export_format (str): 'ndjson' (por defecto) o 'csv'; parámetro `format`.
+        inviter_user_id (int, optional): Solo las enviadas por este usuario.
+        date_from (datetime, optional): Desde esta fecha (inclusive).
+        date_to (datetime, optional): Hasta esta fecha (exclusiva).
+
+    Returns:
+        StreamingResponse: El archivo exportado, o un JSONResponse de error.
+    """
+    with request_deadline():
+        user = await verify_session_token_async(session_token)
+        if not user:
+            return session_token_invalid_response()
 
-    # Llama al use case para manejar la lógica de respuesta
-    return respond_invitation(invitation_id, action, user, db)
\ No newline at end of file
+        # La exportación abre su propia sesión: se transmite después de que el endpoint retorna
+        init_db()
+        session_factory = AsyncSessionLocal if DB_ASYNC_ENABLED else SessionLocal
+        return await export_invitations(
+            farm_id, user, export_format, session_factory,
+            inviter_user_id=inviter_user_id, date_from=date_from, date_to=date_to
+        )
@@ -1,15 +1,87 @@
-from fastapi import FastAPI
-from endpoints import invitations
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from endpoints import invitations, health
+from adapters.http_clients import init_http_clients, close_http_clients, aclose_http_clients
+from adapters.resilience import DependencyUnavailableError
+from adapters.notification_outbox import OutboxDispatcher, NOTIFICATION_OUTBOX_DISPATCHER_IN_PROCESS
+from adapters.invitation_expiry import InvitationExpirySweeper, INVITATION_TTL_DAYS
+from dataBase import SessionLocal, init_db, check_database, dispose_engines, primary_reads
+from utils.deadline import DeadlineExceededError
 from utils.logger import setup_logger
+from utils.response import dependency_unavailable_response, deadline_exceeded_response
 
 # Setup logging for the entire application
 logger = setup_logger()
 logger.info("Starting CoffeeTech Invitations Service")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Crea los clientes HTTP compartidos y los engines de la base de datos y
+    arranca el despachador del outbox de notificaciones y el barrido de
+    invitaciones vencidas al iniciar, sin esperar a la red; los detiene y
+    cierra al apagar el servicio.
+    """
+    init_http_clients()
+    # Crea los engines sin conectarse; la conexión se comprueba en segundo plano
+    init_db()
+    db_check = asyncio.create_task(check_database())
+    outbox_dispatcher = OutboxDispatcher(SessionLocal) if NOTIFICATION_OUTBOX_DISPATCHER_IN_PROCESS else None
+    if outbox_dispatcher:
+        outbox_dispatcher.start()
+    else:
+        logger.warning(
+            "El despachador del outbox no corre en este proceso: las notificaciones quedan en "
+            "notification_outbox hasta que otra instancia con NOTIFICATION_OUTBOX_DISPATCHER_IN_PROCESS=true las envíe"
+        )
+    expiry_sweeper = InvitationExpirySweeper(SessionLocal) if INVITATION_TTL_DAYS > 0 else None
+    if expiry_sweeper:
+        expiry_sweeper.start()
+    try:
+        yield
+    finally:
+        db_check.cancel()
+        if expiry_sweeper:
+            await expiry_sweeper.stop()
+        if outbox_dispatcher:
+            await outbox_dispatcher.stop()
+        close_http_clients()
+        await aclose_http_clients()
+        await dispose_engines()
+
+app = FastAPI(lifespan=lifespan)
 
 # Incluir las rutas de invitaciones
 app.include_router(invitations.router, prefix="/invitations", tags=["Invitaciones"])
+app.include_router(health.router, prefix="/health", tags=["Salud"])
+
+@app.middleware("http")
+async def read_preference_middleware(request: Request, call_next):
+    """
+    Con la cabecera `X-Read-Primary: true` las lecturas de la solicitud van al
+    primario en lugar de la réplica, p. ej. para listar justo después de crear.
+    """
+    if request.headers.get("x-read-primary", "").lower() in ("1", "true", "yes"):
+        with primary_reads():
+            return await call_next(request)
+    return await call_next(request)
+
+@app.exception_handler(DependencyUnavailableError)
+async def dependency_unavailable_handler(request: Request, exc: DependencyUnavailableError):
+    """
+    Responde 503 de inmediato cuando un servicio remoto no está disponible.
+    """
+    logger.warning(f"{request.method} {request.url.path}: {exc}")
+    return dependency_unavailable_response(exc.service)
+
+@app.exception_handler(DeadlineExceededError)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceededError):
+    """
+    Responde 504 cuando la solicitud agotó su presupuesto de tiempo.
+    """
+    logger.warning(f"{request.method} {request.url.path}: {exc}")
+    return deadline_exceeded_response()
 
 @app.get("/", include_in_schema=False)
 def read_root():
@@ -0,0 +1,15 @@
+-- Outbox de notificaciones: cada fila se escribe en la misma transacción que
+-- el cambio de la invitación y la entrega el despachador del servicio.
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    outbox_id BIGSERIAL PRIMARY KEY,
+    payload JSONB NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS ix_notification_outbox_due
+    ON notification_outbox (available_at)
+    WHERE status = 'pending';
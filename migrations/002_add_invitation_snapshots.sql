@@ -0,0 +1,7 @@
+-- Nombre de la finca y del rol sugerido copiados en la invitación al crearla,
+-- para responderla sin consultar los servicios de fincas y usuarios.
+ALTER TABLE invitations ADD COLUMN IF NOT EXISTS farm_name VARCHAR(255);
+ALTER TABLE invitations ADD COLUMN IF NOT EXISTS suggested_role_name VARCHAR(255);
+
+-- Los nombres viven en otros servicios, así que las filas existentes se
+-- completan con: uv run python -m tools.backfill_invitation_snapshots
@@ -0,0 +1,4 @@
+-- Índice del listado de invitaciones recibidas (GET /invitations/received):
+-- cada página es un recorrido del índice a partir del cursor, sin ordenar ni saltar filas.
+CREATE INDEX IF NOT EXISTS ix_invitations_received
+    ON invitations (invited_user_id, invitation_date DESC, invitation_id);
@@ -0,0 +1,4 @@
+-- Índice del listado de invitaciones pendientes de una finca
+-- (GET /invitations/farm/{farm_id}), con el mismo orden que el de recibidas.
+CREATE INDEX IF NOT EXISTS ix_invitations_farm
+    ON invitations (farm_id, invitation_date DESC, invitation_id);
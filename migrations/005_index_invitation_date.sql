@@ -0,0 +1,3 @@
+-- Índice del barrido de invitaciones vencidas (INVITATION_TTL_DAYS): cada lote
+-- toma las más antiguas sin recorrer la tabla.
+CREATE INDEX IF NOT EXISTS ix_invitations_date ON invitations (invitation_date);
@@ -1,15 +1,45 @@
-from sqlalchemy import Column, Integer, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, UniqueConstraint, Index, func, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
 class Invitations(Base):
     __tablename__ = 'invitations'
-    __table_args__ = (UniqueConstraint('invited_user_id', 'farm_id'),)
+    __table_args__ = (
+        UniqueConstraint('invited_user_id', 'farm_id'),
+        # Listado paginado de invitaciones recibidas (keyset sobre fecha e id)
+        Index('ix_invitations_received', 'invited_user_id', text('invitation_date DESC'), 'invitation_id'),
+        # Listado paginado de invitaciones pendientes de una finca
+        Index('ix_invitations_farm', 'farm_id', text('invitation_date DESC'), 'invitation_id'),
+        # Barrido de invitaciones vencidas, de la más antigua a la más reciente
+        Index('ix_invitations_date', 'invitation_date'),
+    )
 
     invitation_id = Column(Integer, primary_key=True)
     invited_user_id = Column(Integer, nullable=False)
     suggested_role_id = Column(Integer, nullable=False)
     farm_id = Column(Integer, nullable=False)
     inviter_user_id = Column(Integer, nullable=False)
-    invitation_date = Column(DateTime(timezone=True), nullable=False)
\ No newline at end of file
+    invitation_date = Column(DateTime(timezone=True), nullable=False)
+    # Copias tomadas al crear la invitación para no consultar otros servicios al responderla
+    farm_name = Column(String(255))
+    suggested_role_name = Column(String(255))
+
+class NotificationOutbox(Base):
+    """
+    Notificaciones pendientes de enviar, escritas en la misma transacción que
+    el cambio de la invitación y entregadas por el despachador del outbox.
+    """
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        Index('ix_notification_outbox_due', 'available_at', postgresql_where=text("status = 'pending'")),
+    )
+
+    outbox_id = Column(BigInteger, primary_key=True)
+    payload = Column(JSONB, nullable=False)
+    status = Column(String(16), nullable=False, default='pending', server_default='pending')
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text)
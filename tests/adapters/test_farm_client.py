@@ -6,14 +6,20 @@ Tests cover all functions, edge cases, and error scenarios including
 HTTP client interactions, timeouts, and API responses.
 """
 
-from unittest.mock import Mock, patch
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
 import httpx
+import pytest
 from domain.schemas import FarmDetailResponse, UserRoleFarmResponse
 from adapters.farm_client import (
     get_farm_by_id,
     get_user_role_farm,
     create_user_role_farm,
-    get_user_role_farm_state_by_name
+    get_user_role_farm_state_by_name,
+    get_farm_by_id_async,
+    get_user_role_farm_async,
+    create_user_role_farm_async,
+    get_user_role_farm_state_by_name_async
 )
 
 
@@ -63,7 +69,7 @@ class TestFarmClient:
 class TestGetFarmById(TestFarmClient):
     """Tests for get_farm_by_id function"""
     
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     @patch('adapters.farm_client.time.monotonic')
     def test_get_farm_by_id_success(self, mock_time, mock_client):
         """Test successful farm retrieval"""
@@ -77,7 +83,7 @@ class TestGetFarmById(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_farm_by_id(farm_id)
@@ -88,11 +94,9 @@ class TestGetFarmById(TestFarmClient):
         assert result.farm_id == 1
         assert result.name == "Test Farm"
         assert abs(result.area - 100.5) < 0.001  # Use approximate comparison for float
-        mock_client_instance.get.assert_called_once_with(
-            "http://localhost:8002/farms-service/get-farm/1"
-        )
+        mock_client_instance.get.assert_called_once_with("http://localhost:8002/farms-service/get-farm/1")
         
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     @patch('adapters.farm_client.time.monotonic')
     @patch('adapters.farm_client.logger')
     def test_get_farm_by_id_timeout(self, mock_logger, mock_time, mock_client):
@@ -103,7 +107,7 @@ class TestGetFarmById(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.side_effect = httpx.TimeoutException("Request timeout")
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_farm_by_id(farm_id)
@@ -115,7 +119,7 @@ class TestGetFarmById(TestFarmClient):
         assert "Timeout" in error_call_args
         assert f"finca {farm_id}" in error_call_args
         
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     @patch('adapters.farm_client.time.monotonic')
     @patch('adapters.farm_client.logger')
     def test_get_farm_by_id_http_error(self, mock_logger, mock_time, mock_client):
@@ -132,7 +136,7 @@ class TestGetFarmById(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_farm_by_id(farm_id)
@@ -141,7 +145,7 @@ class TestGetFarmById(TestFarmClient):
         assert result is None
         mock_logger.error.assert_called_once()
         
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     @patch('adapters.farm_client.time.monotonic')
     @patch('adapters.farm_client.logger')
     def test_get_farm_by_id_generic_exception(self, mock_logger, mock_time, mock_client):
@@ -152,7 +156,7 @@ class TestGetFarmById(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.side_effect = Exception("Connection error")
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_farm_by_id(farm_id)
@@ -164,7 +168,7 @@ class TestGetFarmById(TestFarmClient):
         assert "Exception" in error_call_args
         assert "Connection error" in error_call_args
         
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     @patch('adapters.farm_client.time.monotonic')
     @patch('adapters.farm_client.logger')
     def test_get_farm_by_id_invalid_json(self, mock_logger, mock_time, mock_client):
@@ -180,7 +184,7 @@ class TestGetFarmById(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_farm_by_id(farm_id)
@@ -193,7 +197,7 @@ class TestGetFarmById(TestFarmClient):
 class TestGetUserRoleFarm(TestFarmClient):
     """Tests for get_user_role_farm function"""
     
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     def test_get_user_role_farm_success(self, mock_client):
         """Test successful user role farm retrieval"""
         # Arrange
@@ -207,7 +211,7 @@ class TestGetUserRoleFarm(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_user_role_farm(user_id, farm_id)
@@ -222,7 +226,7 @@ class TestGetUserRoleFarm(TestFarmClient):
             "http://localhost:8002/farms-service/get-user-role-farm/1/1"
         )
         
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     def test_get_user_role_farm_error_status(self, mock_client):
         """Test error status in response"""
         # Arrange
@@ -237,7 +241,7 @@ class TestGetUserRoleFarm(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_user_role_farm(user_id, farm_id)
@@ -245,7 +249,7 @@ class TestGetUserRoleFarm(TestFarmClient):
         # Assert
         assert result is None
         
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     @patch('adapters.farm_client.logger')
     def test_get_user_role_farm_exception(self, mock_logger, mock_client):
         """Test exception handling"""
@@ -257,7 +261,7 @@ class TestGetUserRoleFarm(TestFarmClient):
         mock_client_instance.get.side_effect = httpx.HTTPStatusError(
             "500 Server Error", request=Mock(), response=Mock()
         )
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_user_role_farm(user_id, farm_id)
@@ -272,7 +276,7 @@ class TestGetUserRoleFarm(TestFarmClient):
 class TestCreateUserRoleFarm(TestFarmClient):
     """Tests for create_user_role_farm function"""
     
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     def test_create_user_role_farm_success(self, mock_client):
         """Test successful user role farm creation"""
         # Arrange
@@ -287,7 +291,7 @@ class TestCreateUserRoleFarm(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.post.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = create_user_role_farm(user_role_id, farm_id, user_role_farm_state_id)
@@ -307,7 +311,7 @@ class TestCreateUserRoleFarm(TestFarmClient):
             json=expected_payload
         )
         
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     @patch('adapters.farm_client.logger')
     def test_create_user_role_farm_http_error(self, mock_logger, mock_client):
         """Test HTTP error during creation"""
@@ -324,7 +328,7 @@ class TestCreateUserRoleFarm(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.post.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = create_user_role_farm(user_role_id, farm_id, user_role_farm_state_id)
@@ -335,7 +339,7 @@ class TestCreateUserRoleFarm(TestFarmClient):
         assert "Error al crear user_role_farm" in result["message"]
         mock_logger.error.assert_called_once()
         
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     @patch('adapters.farm_client.logger')
     def test_create_user_role_farm_connection_error(self, mock_logger, mock_client):
         """Test connection error during creation"""
@@ -346,7 +350,7 @@ class TestCreateUserRoleFarm(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.post.side_effect = httpx.ConnectError("Connection failed")
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = create_user_role_farm(user_role_id, farm_id, user_role_farm_state_id)
@@ -361,7 +365,7 @@ class TestCreateUserRoleFarm(TestFarmClient):
 class TestGetUserRoleFarmStateByName(TestFarmClient):
     """Tests for get_user_role_farm_state_by_name function"""
     
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     def test_get_user_role_farm_state_by_name_success(self, mock_client):
         """Test successful state retrieval by name"""
         # Arrange
@@ -374,7 +378,7 @@ class TestGetUserRoleFarmStateByName(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_user_role_farm_state_by_name(state_name)
@@ -387,7 +391,7 @@ class TestGetUserRoleFarmStateByName(TestFarmClient):
             "http://localhost:8002/farms-service/get-user-role-farm-state/Activo"
         )
         
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     def test_get_user_role_farm_state_by_name_error_status(self, mock_client):
         """Test error status in response"""
         # Arrange
@@ -401,7 +405,7 @@ class TestGetUserRoleFarmStateByName(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_user_role_farm_state_by_name(state_name)
@@ -409,7 +413,7 @@ class TestGetUserRoleFarmStateByName(TestFarmClient):
         # Assert
         assert result is None
         
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     @patch('adapters.farm_client.logger')
     def test_get_user_role_farm_state_by_name_exception(self, mock_logger, mock_client):
         """Test exception handling"""
@@ -418,7 +422,7 @@ class TestGetUserRoleFarmStateByName(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.side_effect = httpx.RequestError("Network error")
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_user_role_farm_state_by_name(state_name)
@@ -429,7 +433,7 @@ class TestGetUserRoleFarmStateByName(TestFarmClient):
         error_call_args = mock_logger.error.call_args[0][0]
         assert "Error al consultar user_role_farm_state" in error_call_args
         
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     def test_get_user_role_farm_state_by_name_with_special_characters(self, mock_client):
         """Test state name with special characters"""
         # Arrange
@@ -445,7 +449,7 @@ class TestGetUserRoleFarmStateByName(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_user_role_farm_state_by_name(state_name)
@@ -461,7 +465,7 @@ class TestGetUserRoleFarmStateByName(TestFarmClient):
 class TestFarmClientIntegration(TestFarmClient):
     """Integration tests for farm client functions"""
     
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     @patch('adapters.farm_client.time.monotonic')
     def test_get_farm_by_id_timeout_logging(self, mock_time, mock_client):
         """Test that timeout logging includes duration"""
@@ -471,7 +475,7 @@ class TestFarmClientIntegration(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.side_effect = httpx.TimeoutException("Timeout occurred")
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         with patch('adapters.farm_client.logger') as mock_logger:
             # Act
@@ -483,7 +487,7 @@ class TestFarmClientIntegration(TestFarmClient):
             error_message = mock_logger.error.call_args[0][0]
             assert "60.1234 segundos" in error_message
             
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     @patch('adapters.farm_client.time.monotonic')
     def test_get_farm_by_id_success_logging(self, mock_time, mock_client):
         """Test that success logging includes duration and status code"""
@@ -498,7 +502,7 @@ class TestFarmClientIntegration(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         with patch('adapters.farm_client.logger') as mock_logger:
             # Act
@@ -517,7 +521,7 @@ class TestFarmClientEnvironmentVariables(TestFarmClient):
     """Tests for environment variable handling"""
     
     @patch('adapters.farm_client.FARMS_SERVICE_URL', 'http://custom-farms-service:9000')
-    @patch('adapters.farm_client.httpx.Client')
+    @patch('adapters.farm_client.get_http_client')
     def test_custom_farms_service_url(self, mock_client):
         """Test using custom FARMS_SERVICE_URL from environment"""
         # Arrange
@@ -530,7 +534,7 @@ class TestFarmClientEnvironmentVariables(TestFarmClient):
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_farm_by_id(farm_id)
@@ -539,3 +543,159 @@ class TestFarmClientEnvironmentVariables(TestFarmClient):
         assert result is not None
         expected_url = "http://custom-farms-service:9000/farms-service/get-farm/1"
         mock_client_instance.get.assert_called_once_with(expected_url)
+
+
+class TestFarmClientAsync(TestFarmClient):
+    """Tests for the async farm client functions"""
+
+    def _mock_async_client(self, mock_get_client, method, response=None, side_effect=None):
+        mock_client_instance = Mock()
+        setattr(mock_client_instance, method, AsyncMock(return_value=response, side_effect=side_effect))
+        mock_get_client.return_value = mock_client_instance
+        return mock_client_instance
+
+    @patch('adapters.farm_client.get_async_http_client')
+    def test_get_farm_by_id_async_success(self, mock_client):
+        """Test successful async farm retrieval"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = self.farm_data
+        client = self._mock_async_client(mock_client, "get", response=mock_response)
+
+        result = asyncio.run(get_farm_by_id_async(1))
+
+        assert isinstance(result, FarmDetailResponse)
+        assert result.farm_id == 1
+        client.get.assert_awaited_once_with("http://localhost:8002/farms-service/get-farm/1")
+
+    @patch('adapters.farm_client.get_async_http_client')
+    def test_get_farm_by_id_async_timeout(self, mock_client):
+        """Test async farm retrieval timeout"""
+        self._mock_async_client(mock_client, "get", side_effect=httpx.TimeoutException("Request timeout"))
+
+        assert asyncio.run(get_farm_by_id_async(1)) is None
+
+    @patch('adapters.farm_client.get_async_http_client')
+    def test_get_user_role_farm_async_error_status(self, mock_client):
+        """Test async user_role_farm retrieval with error payload"""
+        mock_response = Mock()
+        mock_response.json.return_value = {"status": "error", "message": "Not found"}
+        self._mock_async_client(mock_client, "get", response=mock_response)
+
+        assert asyncio.run(get_user_role_farm_async(1, 1)) is None
+
+    @patch('adapters.farm_client.get_async_http_client')
+    def test_get_user_role_farm_async_success(self, mock_client):
+        """Test successful async user_role_farm retrieval"""
+        mock_response = Mock()
+        mock_response.json.return_value = self.urf_data
+        self._mock_async_client(mock_client, "get", response=mock_response)
+
+        result = asyncio.run(get_user_role_farm_async(1, 1))
+
+        assert isinstance(result, UserRoleFarmResponse)
+        assert result.user_role_id == 2
+
+    @patch('adapters.farm_client.get_async_http_client')
+    def test_create_user_role_farm_async_exception(self, mock_client):
+        """Test async user_role_farm creation failure"""
+        self._mock_async_client(mock_client, "post", side_effect=httpx.RequestError("Connection failed"))
+
+        result = asyncio.run(create_user_role_farm_async(2, 1, 1))
+
+        assert result["status"] == "error"
+
+    @patch('adapters.farm_client.get_async_http_client')
+    def test_get_user_role_farm_state_by_name_async_success(self, mock_client):
+        """Test successful async state retrieval"""
+        mock_response = Mock()
+        mock_response.json.return_value = self.state_data
+        self._mock_async_client(mock_client, "get", response=mock_response)
+
+        assert asyncio.run(get_user_role_farm_state_by_name_async("Activo")) == self.state_data
+
+
+class TestFarmClientSingleFlight(TestFarmClient):
+    """Tests for coalescing identical concurrent farm lookups"""
+
+    @patch('adapters.farm_client.get_async_http_client')
+    def test_concurrent_farm_lookups_share_one_request(self, mock_client):
+        """Concurrent get_farm_by_id_async calls for one farm hit the service once"""
+        mock_response = Mock()
+        mock_response.json.return_value = self.farm_data
+
+        async def slow_get(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return mock_response
+
+        mock_client.return_value.get = AsyncMock(side_effect=slow_get)
+
+        async def run():
+            return await asyncio.gather(*(get_farm_by_id_async(1) for _ in range(5)))
+
+        results = asyncio.run(run())
+
+        assert all(result.farm_id == 1 for result in results)
+        mock_client.return_value.get.assert_awaited_once()
+
+    @patch('adapters.farm_client.get_async_http_client')
+    def test_different_user_role_farm_keys_are_not_coalesced(self, mock_client):
+        """Lookups for different users are sent separately"""
+        mock_response = Mock()
+        mock_response.json.return_value = self.urf_data
+        mock_client.return_value.get = AsyncMock(return_value=mock_response)
+
+        async def run():
+            return await asyncio.gather(get_user_role_farm_async(1, 1), get_user_role_farm_async(2, 1))
+
+        asyncio.run(run())
+
+        assert mock_client.return_value.get.await_count == 2
+
+    @patch('adapters.farm_client.get_http_client')
+    def test_concurrent_threads_share_one_request(self, mock_client):
+        """Thread-pool callers are coalesced as well"""
+        import threading
+        from adapters.farm_client import _user_role_farm_flight
+        release = threading.Event()
+        mock_response = Mock()
+        mock_response.json.return_value = self.urf_data
+
+        def slow_get(*args, **kwargs):
+            release.wait(1)
+            return mock_response
+
+        mock_client.return_value.get.side_effect = slow_get
+        before = _user_role_farm_flight.stats()["requests"]
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_user_role_farm(1, 1))) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while _user_role_farm_flight.stats()["requests"] - before < 3:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(results) == 3 and all(isinstance(r, UserRoleFarmResponse) for r in results)
+        mock_client.return_value.get.assert_called_once()
+
+
+class TestFarmClientDependencyUnavailable(TestFarmClient):
+    """An unavailable farms service is reported, not mistaken for a missing farm"""
+
+    @patch('adapters.farm_client.get_async_http_client')
+    def test_get_farm_by_id_async_propagates(self, mock_client):
+        from adapters.resilience import DependencyUnavailableError
+        mock_client.return_value.get = AsyncMock(side_effect=DependencyUnavailableError("farms", "circuit breaker abierto"))
+
+        with pytest.raises(DependencyUnavailableError):
+            asyncio.run(get_farm_by_id_async(1))
+
+    @patch('adapters.farm_client.get_http_client')
+    def test_get_user_role_farm_propagates(self, mock_client):
+        from adapters.resilience import DependencyUnavailableError
+        mock_client.return_value.get.side_effect = DependencyUnavailableError("farms", "circuit breaker abierto")
+
+        with pytest.raises(DependencyUnavailableError):
+            get_user_role_farm(1, 1)
@@ -0,0 +1,167 @@
+"""
+Test file for http_clients.py
+
+Tests for the shared, pooled HTTP clients used by the adapters.
+"""
+
+import asyncio
+from unittest.mock import patch
+import httpx
+from adapters import http_clients
+from adapters.http_clients import (
+    get_http_client,
+    get_async_http_client,
+    aclose_http_clients,
+    get_pool_limits,
+    get_timeout,
+    init_http_clients,
+    close_http_clients,
+    SERVICES,
+    FARMS_SERVICE,
+    USERS_SERVICE
+)
+
+
+class TestHttpClients:
+    """Tests for client creation, reuse and shutdown"""
+
+    def setup_method(self):
+        close_http_clients()
+
+    def teardown_method(self):
+        close_http_clients()
+        asyncio.run(aclose_http_clients())
+
+    def test_get_http_client_reuses_instance(self):
+        """The same pooled client is returned on every call"""
+        first = get_http_client(FARMS_SERVICE)
+        second = get_http_client(FARMS_SERVICE)
+
+        assert isinstance(first, httpx.Client)
+        assert first is second
+
+    def test_each_service_has_its_own_client(self):
+        """Different services do not share a pool"""
+        assert get_http_client(FARMS_SERVICE) is not get_http_client(USERS_SERVICE)
+
+    def test_init_http_clients_creates_all_services(self):
+        """init_http_clients creates one client per known service"""
+        init_http_clients()
+
+        assert set(http_clients._clients) == set(SERVICES)
+        assert set(http_clients._async_clients) == set(SERVICES)
+
+    def test_get_async_http_client_reuses_instance(self):
+        """The same pooled async client is returned on every call"""
+        first = get_async_http_client(FARMS_SERVICE)
+
+        assert isinstance(first, httpx.AsyncClient)
+        assert get_async_http_client(FARMS_SERVICE) is first
+
+    def test_aclose_http_clients_closes_and_clears(self):
+        """aclose_http_clients closes the async clients"""
+        client = get_async_http_client(FARMS_SERVICE)
+
+        asyncio.run(aclose_http_clients())
+
+        assert client.is_closed
+        assert http_clients._async_clients == {}
+
+    def test_close_http_clients_closes_and_clears(self):
+        """close_http_clients closes clients and a later call recreates them"""
+        client = get_http_client(FARMS_SERVICE)
+
+        close_http_clients()
+
+        assert client.is_closed
+        assert http_clients._clients == {}
+        assert get_http_client(FARMS_SERVICE) is not client
+
+    def test_closed_client_is_recreated(self):
+        """A client closed elsewhere is replaced on the next call"""
+        client = get_http_client(FARMS_SERVICE)
+        client.close()
+
+        assert get_http_client(FARMS_SERVICE) is not client
+
+
+class TestPoolLimits:
+    """Tests for pool configuration"""
+
+    def test_default_limits(self):
+        """Global defaults are used when there is no service override"""
+        limits = get_pool_limits(USERS_SERVICE)
+
+        assert limits.max_connections == http_clients.HTTP_MAX_CONNECTIONS
+        assert limits.max_keepalive_connections == http_clients.HTTP_MAX_KEEPALIVE_CONNECTIONS
+        assert limits.keepalive_expiry == http_clients.HTTP_KEEPALIVE_EXPIRY
+
+    @patch.dict('os.environ', {"HTTP_FARMS_MAX_CONNECTIONS": "7", "HTTP_FARMS_KEEPALIVE_EXPIRY": "1.5"})
+    def test_service_override(self):
+        """HTTP_<SERVICE>_* variables override the global defaults"""
+        limits = get_pool_limits(FARMS_SERVICE)
+
+        assert limits.max_connections == 7
+        assert limits.keepalive_expiry == 1.5
+        assert limits.max_keepalive_connections == http_clients.HTTP_MAX_KEEPALIVE_CONNECTIONS
+
+    @patch.dict('os.environ', {"HTTP_FARMS_DEFAULT_TIMEOUT": "60"})
+    def test_service_timeout_override(self):
+        """HTTP_<SERVICE>_DEFAULT_TIMEOUT sets the timeout of that service's clients"""
+        close_http_clients()
+        try:
+            assert get_timeout(FARMS_SERVICE) == 60.0
+            assert get_timeout(USERS_SERVICE) == http_clients.HTTP_DEFAULT_TIMEOUT
+            assert get_http_client(FARMS_SERVICE).timeout.read == 60.0
+        finally:
+            close_http_clients()
+
+
+class TestDependencyResilience:
+    """Tests for the breakers and bulkheads attached to the pooled clients"""
+
+    def setup_method(self):
+        http_clients._breakers.clear()
+        http_clients._bulkheads.clear()
+        http_clients._retry_policies.clear()
+
+    def teardown_method(self):
+        http_clients._breakers.clear()
+        http_clients._bulkheads.clear()
+        http_clients._retry_policies.clear()
+
+    def test_states_cover_every_service(self):
+        """Every remote service reports a closed breaker and an idle bulkhead"""
+        states = http_clients.get_dependency_states()
+
+        assert set(states) == set(SERVICES)
+        assert states[FARMS_SERVICE]["circuit_breaker"]["state"] == "closed"
+        assert states[FARMS_SERVICE]["bulkhead"]["active"] == 0
+
+    @patch.dict('os.environ', {"HTTP_FARMS_BULKHEAD_MAX_CONCURRENT": "3", "HTTP_FARMS_BREAKER_FAILURE_THRESHOLD": "2"})
+    def test_service_override(self):
+        """Breaker and bulkhead limits can be set per service"""
+        assert http_clients.get_bulkhead(FARMS_SERVICE).max_concurrent == 3
+        assert http_clients.get_circuit_breaker(FARMS_SERVICE).failure_threshold == 2
+        assert http_clients.get_bulkhead(USERS_SERVICE).max_concurrent == http_clients.HTTP_BULKHEAD_MAX_CONCURRENT
+
+    def test_sync_and_async_clients_share_the_breaker(self):
+        """Failures seen by either client count against the same breaker"""
+        client = http_clients._build_client(FARMS_SERVICE)
+        async_client = http_clients._build_async_client(FARMS_SERVICE)
+        try:
+            assert client._transport._breaker is async_client._transport._breaker
+        finally:
+            client.close()
+            asyncio.run(async_client.aclose())
+
+    @patch.dict('os.environ', {"HTTP_USERS_HEDGE_ENABLED": "true", "HTTP_USERS_RETRY_MAX_RETRIES": "4"})
+    def test_retry_policy_per_service(self):
+        """Retries and hedging are configured per service"""
+        users = http_clients.get_retry_policy(USERS_SERVICE)
+        farms = http_clients.get_retry_policy(FARMS_SERVICE)
+
+        assert users.hedge is True and users.max_retries == 4
+        assert farms.hedge is http_clients.HTTP_HEDGE_ENABLED
+        assert farms.max_retries == http_clients.HTTP_RETRY_MAX_RETRIES
+
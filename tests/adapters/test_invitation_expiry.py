@@ -0,0 +1,200 @@
+import asyncio
+import httpx
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, Mock, patch
+from sqlalchemy.dialects import postgresql
+from adapters.invitation_expiry import (
+    InvitationExpirySweeper,
+    delete_expired_notifications,
+    expire_batch,
+    find_expired,
+    get_expiry_stats
+)
+from adapters.notification_client import BulkNotificationsUnsupportedError
+from tools.notification_service_stub import create_app
+
+
+@asynccontextmanager
+async def _stub_service(**options):
+    """Route the notifications client to an in-process stub service"""
+    stub = create_app(**options)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub))
+    with patch('adapters.notification_client.get_async_http_client', return_value=client):
+        try:
+            yield stub
+        finally:
+            await client.aclose()
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+class TestExpiryStatements:
+    """Tests for expire_batch and find_expired"""
+
+    def test_expire_batch_deletes_skipping_locked_rows_and_commits(self):
+        db = Mock()
+        db.execute.return_value.scalars.return_value.all.return_value = [4, 7]
+
+        assert expire_batch(db, ttl_days=30, batch_size=100) == [4, 7]
+
+        sql = _sql(db.execute.call_args_list[0].args[0])
+        assert sql.startswith("DELETE FROM invitations")
+        assert "FOR UPDATE SKIP LOCKED" in sql
+        assert "invitations.invitation_date < now() - " in sql
+        assert "ORDER BY invitations.invitation_date" in sql
+        assert "RETURNING invitations.invitation_id" in sql
+        db.commit.assert_called_once()
+
+    def test_expire_batch_drops_pending_outbox_rows_in_the_same_transaction(self):
+        db = Mock()
+        events = []
+        db.execute.side_effect = lambda stmt: events.append(_sql(stmt)) or Mock(
+            scalars=Mock(return_value=Mock(all=Mock(return_value=[4, 7]))))
+        db.commit.side_effect = lambda: events.append("COMMIT")
+
+        expire_batch(db, ttl_days=30, batch_size=100)
+
+        invitations, outbox, commit = events
+        assert invitations.startswith("DELETE FROM invitations")
+        assert outbox.startswith("DELETE FROM notification_outbox")
+        assert "notification_outbox.status = " in outbox
+        assert "(notification_outbox.payload ->> " in outbox and " IN (" in outbox
+        params = db.execute.call_args_list[1].args[0].compile(dialect=postgresql.dialect()).params
+        assert [4, 7] in params.values()
+        assert commit == "COMMIT"
+
+    def test_expire_batch_without_expired_rows_skips_outbox(self):
+        db = Mock()
+        db.execute.return_value.scalars.return_value.all.return_value = []
+
+        assert expire_batch(db, ttl_days=30, batch_size=100) == []
+        assert db.execute.call_count == 1
+
+    def test_find_expired_only_reads(self):
+        db = Mock()
+        db.execute.return_value.scalars.return_value.all.return_value = [4]
+
+        assert find_expired(db, ttl_days=30, batch_size=100) == [4]
+
+        sql = _sql(db.execute.call_args.args[0])
+        assert sql.startswith("SELECT")
+        assert "FOR UPDATE" not in sql
+        db.commit.assert_not_called()
+        db.rollback.assert_called_once()
+
+
+class TestDeleteExpiredNotifications:
+    """Tests for the notification cleanup against the stub service"""
+
+    def test_one_bulk_request_per_batch(self):
+        async def scenario():
+            async with _stub_service() as stub:
+                stub.state.sent = [{"invitation_id": i} for i in (1, 2, 3)]
+                failures = await delete_expired_notifications([1, 2])
+                return stub, failures
+
+        stub, failures = asyncio.run(scenario())
+
+        assert failures == 0
+        assert stub.state.requests["bulk_delete"] == 1
+        assert stub.state.requests["delete"] == 0
+        assert stub.state.sent == [{"invitation_id": 3}]
+
+    def test_falls_back_to_one_delete_per_invitation(self):
+        async def scenario():
+            async with _stub_service(bulk_enabled=False) as stub:
+                failures = await delete_expired_notifications([1, 2])
+                return stub, failures
+
+        stub, failures = asyncio.run(scenario())
+
+        assert failures == 0
+        assert stub.state.requests["delete"] == 2
+
+    @patch('adapters.invitation_expiry.notification_fanout_limit', return_value=3)
+    @patch('adapters.invitation_expiry.delete_notifications_by_invitation_id_async')
+    @patch('adapters.invitation_expiry.delete_notifications_by_invitation_ids_async', new_callable=AsyncMock)
+    def test_fallback_deletes_stay_below_the_bulkhead(self, mock_bulk_delete, mock_delete, mock_limit):
+        mock_bulk_delete.side_effect = BulkNotificationsUnsupportedError("no")
+        active, peak = [0], [0]
+
+        async def delete(invitation_id):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.001)
+            active[0] -= 1
+        mock_delete.side_effect = delete
+
+        assert asyncio.run(delete_expired_notifications(list(range(20)))) == 0
+        assert mock_delete.call_count == 20
+        assert peak[0] == 3
+
+    @patch('adapters.invitation_expiry.delete_notifications_by_invitation_ids_async', new_callable=AsyncMock)
+    def test_failed_cleanup_is_counted(self, mock_bulk_delete):
+        mock_bulk_delete.side_effect = RuntimeError("caído")
+
+        assert asyncio.run(delete_expired_notifications([1, 2, 3])) == 3
+
+
+class TestInvitationExpirySweeper:
+    """Tests for InvitationExpirySweeper"""
+
+    def setup_method(self):
+        self.sessions = []
+        self.sweeper = InvitationExpirySweeper(
+            self._session, ttl_days=30, interval=60, batch_size=2, batch_pause=0, max_batches=3
+        )
+
+    def _session(self):
+        session = Mock()
+        self.sessions.append(session)
+        return session
+
+    @patch('adapters.invitation_expiry.delete_expired_notifications', new_callable=AsyncMock)
+    def test_sweeps_in_batches_until_a_short_one(self, mock_cleanup):
+        mock_cleanup.side_effect = [0, 1]
+        with patch('adapters.invitation_expiry.expire_batch', side_effect=[[1, 2], [3]]) as mock_expire:
+            assert asyncio.run(self.sweeper.run_once()) == 3
+
+        assert mock_expire.call_count == 2
+        assert [call.args[0] for call in mock_cleanup.call_args_list] == [[1, 2], [3]]
+        stats = self.sweeper.snapshot()
+        assert stats["expired"] == 3
+        assert stats["notification_cleanup_failures"] == 1
+        assert stats["sweeps"] == 1
+        assert all(session.close.called for session in self.sessions)
+
+    @patch('adapters.invitation_expiry.delete_expired_notifications', new_callable=AsyncMock, return_value=0)
+    def test_max_batches_bounds_a_sweep(self, mock_cleanup):
+        with patch('adapters.invitation_expiry.expire_batch', return_value=[1, 2]) as mock_expire:
+            assert asyncio.run(self.sweeper.run_once()) == 6
+
+        assert mock_expire.call_count == 3
+
+    @patch('adapters.invitation_expiry.delete_expired_notifications', new_callable=AsyncMock)
+    def test_dry_run_deletes_nothing(self, mock_cleanup):
+        self.sweeper.dry_run = True
+        with patch('adapters.invitation_expiry.find_expired', return_value=[1, 2]), \
+             patch('adapters.invitation_expiry.expire_batch') as mock_expire:
+            assert asyncio.run(self.sweeper.run_once()) == 2
+
+        mock_expire.assert_not_called()
+        mock_cleanup.assert_not_called()
+        assert self.sweeper.snapshot()["would_expire"] == 2
+        assert self.sweeper.snapshot()["expired"] == 0
+
+    def test_running_sweeper_reports_its_stats(self):
+        async def scenario():
+            with patch.object(self.sweeper, 'run_once', AsyncMock(return_value=0)):
+                self.sweeper.start()
+                await asyncio.sleep(0)
+                stats = get_expiry_stats()
+                await self.sweeper.stop()
+            return stats
+
+        stats = asyncio.run(scenario())
+
+        assert stats["running"] is True
+        assert get_expiry_stats()["running"] is False
@@ -0,0 +1,154 @@
+import asyncio
+import httpx
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import patch
+from adapters.notification_batcher import NotificationBatcher
+from adapters.notification_outbox import OutboxDispatcher
+from tools.notification_service_stub import create_app
+
+
+def _notification(i):
+    return {"message": f"m{i}", "user_id": i, "notification_type_id": 1, "invitation_id": i, "notification_state_id": 1}
+
+
+@asynccontextmanager
+async def _stub_service(**options):
+    """Route the notifications client to an in-process stub service"""
+    stub = create_app(**options)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub))
+    with patch('adapters.notification_client.get_async_http_client', return_value=client):
+        try:
+            yield stub
+        finally:
+            await client.aclose()
+
+
+class TestNotificationBatcher:
+    """Tests for NotificationBatcher against the stub service"""
+
+    def test_concurrent_sends_share_one_bulk_request(self):
+        async def scenario():
+            async with _stub_service() as stub:
+                batcher = NotificationBatcher(max_batch_size=100, max_wait=0.01)
+                await asyncio.gather(*(batcher.send(**_notification(i)) for i in range(30)))
+                return stub, batcher
+
+        stub, batcher = asyncio.run(scenario())
+
+        assert stub.state.requests["bulk"] == 1
+        assert stub.state.requests["single"] == 0
+        assert len(stub.state.sent) == 30
+        assert batcher.snapshot()["batches"] == 1
+
+    def test_full_batches_do_not_wait_for_the_window(self):
+        async def scenario():
+            async with _stub_service() as stub:
+                batcher = NotificationBatcher(max_batch_size=10, max_wait=30)
+                sends = asyncio.gather(*(batcher.send(**_notification(i)) for i in range(20)))
+                await asyncio.wait_for(sends, 1)
+                return stub
+
+        stub = asyncio.run(scenario())
+
+        assert stub.state.requests["bulk"] == 2
+        assert len(stub.state.sent) == 20
+
+    def test_falls_back_to_single_sends_when_bulk_is_missing(self):
+        async def scenario():
+            async with _stub_service(bulk_enabled=False) as stub:
+                batcher = NotificationBatcher(max_batch_size=100, max_wait=0.01)
+                await asyncio.gather(*(batcher.send(**_notification(i)) for i in range(5)))
+                await asyncio.gather(*(batcher.send(**_notification(i)) for i in range(5)))
+                return stub, batcher
+
+        stub, batcher = asyncio.run(scenario())
+
+        assert stub.state.requests["single"] == 10
+        assert len(stub.state.sent) == 10
+        assert batcher.snapshot()["bulk_requests"] == 1  # Not retried within the interval
+        assert not batcher.snapshot()["bulk_available"]
+
+    def test_fallback_reports_each_failure_to_its_caller(self):
+        async def send_one(**notification):
+            if notification["user_id"] == 1:
+                raise httpx.ConnectError("caído")
+            return {"status": "success"}
+
+        async def scenario():
+            batcher = NotificationBatcher(max_batch_size=100, max_wait=0.01)
+            with patch('adapters.notification_batcher.send_notifications_bulk_async',
+                       side_effect=httpx.ConnectError("caído")), \
+                 patch('adapters.notification_batcher.send_notification_async', side_effect=send_one):
+                return await asyncio.gather(*(batcher.send(**_notification(i)) for i in range(3)),
+                                            return_exceptions=True), batcher
+
+        results, batcher = asyncio.run(scenario())
+
+        assert isinstance(results[1], httpx.ConnectError)
+        assert results[0] == results[2] == {"status": "success"}
+        assert batcher.snapshot()["bulk_available"]  # Transient errors keep bulk enabled
+
+    def test_fallback_sends_stay_below_the_bulkhead(self):
+        active, peak = [0], [0]
+
+        async def send_one(**notification):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.001)
+            active[0] -= 1
+            return {"status": "success"}
+
+        async def scenario():
+            batcher = NotificationBatcher(max_batch_size=100, max_wait=0.01)
+            with patch('adapters.notification_batcher.send_notifications_bulk_async',
+                       side_effect=httpx.ConnectError("caído")), \
+                 patch('adapters.notification_batcher.send_notification_async', side_effect=send_one), \
+                 patch('adapters.notification_batcher.notification_fanout_limit', return_value=5):
+                return await asyncio.gather(*(batcher.send(**_notification(i)) for i in range(40)))
+
+        results = asyncio.run(scenario())
+
+        assert results == [{"status": "success"}] * 40
+        assert peak[0] == 5
+
+    def test_single_notification_skips_bulk_endpoint(self):
+        async def scenario():
+            async with _stub_service() as stub:
+                batcher = NotificationBatcher(max_batch_size=100, max_wait=0.01)
+                await batcher.send(**_notification(1))
+                return stub
+
+        stub = asyncio.run(scenario())
+
+        assert stub.state.requests == {"single": 1, "bulk": 0, "delete": 0, "bulk_delete": 0, "catalog": 0}
+
+
+class TestOutboxDispatcherBatching:
+    """The outbox dispatcher sends a claimed batch in a few requests"""
+
+    def test_claimed_rows_are_sent_in_bulk(self):
+        rows = [
+            SimpleNamespace(outbox_id=i, attempts=1, payload={
+                "message": f"m{i}", "user_id": i, "invitation_id": i, "notification_type": "Invitation",
+                "notification_state": "Pendiente", "replace_existing": False,
+            })
+            for i in range(20)
+        ]
+
+        async def scenario():
+            async with _stub_service() as stub:
+                dispatcher = OutboxDispatcher(lambda: SimpleNamespace(close=lambda: None), batch_size=20)
+                dispatcher.batcher = NotificationBatcher(max_batch_size=100, max_wait=0.01)
+                with patch('adapters.notification_outbox.claim_batch', return_value=rows), \
+                     patch('adapters.notification_outbox.complete_batch') as mock_complete:
+                    await dispatcher.run_once()
+                return stub, mock_complete
+
+        stub, mock_complete = asyncio.run(scenario())
+
+        assert stub.state.requests["bulk"] == 1
+        assert stub.state.requests["single"] == 0
+        _db, delivered, failed = mock_complete.call_args.args
+        assert sorted(delivered) == list(range(20))
+        assert failed == []
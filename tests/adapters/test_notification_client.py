@@ -1,6 +1,7 @@
+import asyncio
 import pytest
 import httpx
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock
 from adapters.notification_client import (
     get_notification_state_by_name,
     get_notification_type_by_name,
@@ -8,6 +9,17 @@ from adapters.notification_client import (
     get_notification_id_by_invitation_id,
     delete_notifications_by_invitation_id,
     send_notification,
+    get_notification_state_by_name_async,
+    get_notification_type_by_name_async,
+    update_notification_state_async,
+    delete_notifications_by_invitation_id_async,
+    send_notification_async,
+    send_notifications_bulk,
+    send_notifications_bulk_async,
+    delete_notifications_by_invitation_ids,
+    delete_notifications_by_invitation_ids_async,
+    BulkNotificationsUnsupportedError,
+    notification_fanout_limit,
     NOTIFICATIONS_SERVICE_URL
 )
 
@@ -15,7 +27,7 @@ from adapters.notification_client import (
 class TestGetNotificationStateByName:
     """Tests for get_notification_state_by_name function"""
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_get_notification_state_by_name_success(self, mock_client):
         # Arrange
         mock_response = Mock()
@@ -28,7 +40,7 @@ class TestGetNotificationStateByName:
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_notification_state_by_name("sent")
@@ -38,7 +50,7 @@ class TestGetNotificationStateByName:
         mock_client_instance.get.assert_called_once_with(f"{NOTIFICATIONS_SERVICE_URL}/notification-states")
         mock_response.raise_for_status.assert_called_once()
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_get_notification_state_by_name_case_insensitive(self, mock_client):
         # Arrange
         mock_response = Mock()
@@ -50,7 +62,7 @@ class TestGetNotificationStateByName:
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_notification_state_by_name("sent")
@@ -58,7 +70,7 @@ class TestGetNotificationStateByName:
         # Assert
         assert result == {"id": 2, "name": "SENT"}
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_get_notification_state_by_name_not_found(self, mock_client):
         # Arrange
         mock_response = Mock()
@@ -70,7 +82,7 @@ class TestGetNotificationStateByName:
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_notification_state_by_name("nonexistent")
@@ -78,18 +90,18 @@ class TestGetNotificationStateByName:
         # Assert
         assert result is None
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_get_notification_state_by_name_request_error(self, mock_client):
         # Arrange
         mock_client_instance = Mock()
         mock_client_instance.get.side_effect = httpx.RequestError("Connection failed")
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act & Assert
         with pytest.raises(httpx.RequestError):
             get_notification_state_by_name("sent")
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_get_notification_state_by_name_http_error(self, mock_client):
         # Arrange
         mock_response = Mock()
@@ -101,7 +113,7 @@ class TestGetNotificationStateByName:
         mock_response.raise_for_status.side_effect = httpx.HTTPStatusError(
             "404 Not Found", request=Mock(), response=mock_response
         )
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act & Assert
         with pytest.raises(httpx.HTTPStatusError):
@@ -111,7 +123,7 @@ class TestGetNotificationStateByName:
 class TestGetNotificationTypeByName:
     """Tests for get_notification_type_by_name function"""
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_get_notification_type_by_name_success(self, mock_client):
         # Arrange
         mock_response = Mock()
@@ -124,7 +136,7 @@ class TestGetNotificationTypeByName:
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_notification_type_by_name("invitation")
@@ -133,7 +145,7 @@ class TestGetNotificationTypeByName:
         assert result == {"id": 1, "name": "invitation"}
         mock_client_instance.get.assert_called_once_with(f"{NOTIFICATIONS_SERVICE_URL}/notification-types")
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_get_notification_type_by_name_case_insensitive(self, mock_client):
         # Arrange
         mock_response = Mock()
@@ -145,7 +157,7 @@ class TestGetNotificationTypeByName:
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_notification_type_by_name("invitation")
@@ -153,7 +165,7 @@ class TestGetNotificationTypeByName:
         # Assert
         assert result == {"id": 1, "name": "INVITATION"}
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_get_notification_type_by_name_not_found(self, mock_client):
         # Arrange
         mock_response = Mock()
@@ -165,7 +177,7 @@ class TestGetNotificationTypeByName:
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_notification_type_by_name("nonexistent")
@@ -177,7 +189,7 @@ class TestGetNotificationTypeByName:
 class TestUpdateNotificationState:
     """Tests for update_notification_state function"""
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_update_notification_state_success(self, mock_client):
         # Arrange
         notification_id = 123
@@ -190,7 +202,7 @@ class TestUpdateNotificationState:
         
         mock_client_instance = Mock()
         mock_client_instance.patch.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = update_notification_state(notification_id, notification_state_id)
@@ -202,18 +214,18 @@ class TestUpdateNotificationState:
             json={"notification_state_id": notification_state_id}
         )
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_update_notification_state_request_error(self, mock_client):
         # Arrange
         mock_client_instance = Mock()
         mock_client_instance.patch.side_effect = httpx.RequestError("Connection failed")
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act & Assert
         with pytest.raises(httpx.RequestError):
             update_notification_state(123, 2)
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_update_notification_state_http_error(self, mock_client):
         # Arrange
         mock_response = Mock()
@@ -225,7 +237,7 @@ class TestUpdateNotificationState:
         mock_response.raise_for_status.side_effect = httpx.HTTPStatusError(
             "404 Not Found", request=Mock(), response=mock_response
         )
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act & Assert
         with pytest.raises(httpx.HTTPStatusError):
@@ -235,7 +247,7 @@ class TestUpdateNotificationState:
 class TestGetNotificationIdByInvitationId:
     """Tests for get_notification_id_by_invitation_id function"""
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     @patch('builtins.print')  # Mock print to avoid output during tests
     def test_get_notification_id_by_invitation_id_success(self, mock_print, mock_client):
         # Arrange
@@ -249,7 +261,7 @@ class TestGetNotificationIdByInvitationId:
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_notification_id_by_invitation_id(invitation_id)
@@ -259,9 +271,9 @@ class TestGetNotificationIdByInvitationId:
         mock_client_instance.get.assert_called_once_with(
             f"{NOTIFICATIONS_SERVICE_URL}/notifications/by-invitation/{invitation_id}"
         )
-        mock_print.assert_called_once_with('Response: {"notification_id": 789}')
+        mock_print.assert_not_called()
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     @patch('builtins.print')
     def test_get_notification_id_by_invitation_id_no_notification_id(self, mock_print, mock_client):
         # Arrange
@@ -274,7 +286,7 @@ class TestGetNotificationIdByInvitationId:
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = get_notification_id_by_invitation_id(invitation_id)
@@ -282,12 +294,12 @@ class TestGetNotificationIdByInvitationId:
         # Assert
         assert result is None
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_get_notification_id_by_invitation_id_request_error(self, mock_client):
         # Arrange
         mock_client_instance = Mock()
         mock_client_instance.get.side_effect = httpx.RequestError("Connection failed")
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act & Assert
         with pytest.raises(httpx.RequestError):
@@ -297,7 +309,7 @@ class TestGetNotificationIdByInvitationId:
 class TestDeleteNotificationsByInvitationId:
     """Tests for delete_notifications_by_invitation_id function"""
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_delete_notifications_by_invitation_id_success(self, mock_client):
         # Arrange
         invitation_id = 456
@@ -309,7 +321,7 @@ class TestDeleteNotificationsByInvitationId:
         
         mock_client_instance = Mock()
         mock_client_instance.delete.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = delete_notifications_by_invitation_id(invitation_id)
@@ -320,18 +332,18 @@ class TestDeleteNotificationsByInvitationId:
             f"{NOTIFICATIONS_SERVICE_URL}/notifications/by-invitation/{invitation_id}"
         )
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_delete_notifications_by_invitation_id_request_error(self, mock_client):
         # Arrange
         mock_client_instance = Mock()
         mock_client_instance.delete.side_effect = httpx.RequestError("Connection failed")
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act & Assert
         with pytest.raises(httpx.RequestError):
             delete_notifications_by_invitation_id(456)
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_delete_notifications_by_invitation_id_http_error(self, mock_client):
         # Arrange
         mock_response = Mock()
@@ -343,7 +355,7 @@ class TestDeleteNotificationsByInvitationId:
         mock_response.raise_for_status.side_effect = httpx.HTTPStatusError(
             "500 Internal Server Error", request=Mock(), response=mock_response
         )
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act & Assert
         with pytest.raises(httpx.HTTPStatusError):
@@ -353,7 +365,7 @@ class TestDeleteNotificationsByInvitationId:
 class TestSendNotification:
     """Tests for send_notification function"""
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_send_notification_minimal_payload(self, mock_client):
         # Arrange
         expected_response = {"id": 123, "status": "sent"}
@@ -364,7 +376,7 @@ class TestSendNotification:
         
         mock_client_instance = Mock()
         mock_client_instance.post.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = send_notification(
@@ -389,7 +401,7 @@ class TestSendNotification:
             json=expected_payload
         )
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_send_notification_full_payload(self, mock_client):
         # Arrange
         expected_response = {"id": 123, "status": "sent"}
@@ -400,7 +412,7 @@ class TestSendNotification:
         
         mock_client_instance = Mock()
         mock_client_instance.post.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = send_notification(
@@ -431,7 +443,7 @@ class TestSendNotification:
             json=expected_payload
         )
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_send_notification_partial_fcm_fields(self, mock_client):
         # Arrange
         expected_response = {"id": 123, "status": "sent"}
@@ -442,7 +454,7 @@ class TestSendNotification:
         
         mock_client_instance = Mock()
         mock_client_instance.post.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = send_notification(
@@ -469,12 +481,12 @@ class TestSendNotification:
             json=expected_payload
         )
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_send_notification_request_error(self, mock_client):
         # Arrange
         mock_client_instance = Mock()
         mock_client_instance.post.side_effect = httpx.RequestError("Connection failed")
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act & Assert
         with pytest.raises(httpx.RequestError):
@@ -486,7 +498,7 @@ class TestSendNotification:
                 notification_state_id=4
             )
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_send_notification_http_error(self, mock_client):
         # Arrange
         mock_response = Mock()
@@ -498,7 +510,7 @@ class TestSendNotification:
         mock_response.raise_for_status.side_effect = httpx.HTTPStatusError(
             "400 Bad Request", request=Mock(), response=mock_response
         )
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act & Assert
         with pytest.raises(httpx.HTTPStatusError):
@@ -510,12 +522,12 @@ class TestSendNotification:
                 notification_state_id=4
             )
     
-    @patch('adapters.notification_client.httpx.Client')
+    @patch('adapters.notification_client.get_http_client')
     def test_send_notification_generic_exception(self, mock_client):
         # Arrange
         mock_client_instance = Mock()
         mock_client_instance.post.side_effect = Exception("Unexpected error")
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act & Assert
         with pytest.raises(Exception, match="Unexpected error"):
@@ -528,6 +540,78 @@ class TestSendNotification:
             )
 
 
+class TestSendNotificationsBulk:
+    """Tests for send_notifications_bulk and its async twin"""
+
+    def _notifications(self):
+        return [
+            {"message": "a", "user_id": 1, "notification_type_id": 1, "invitation_id": 10,
+             "notification_state_id": 1, "fcm_title": "T"},
+            {"message": "b", "user_id": 2, "notification_type_id": 1, "invitation_id": 11,
+             "notification_state_id": 1},
+        ]
+
+    @patch('adapters.notification_client.get_http_client')
+    def test_send_notifications_bulk_posts_one_request(self, mock_client):
+        mock_response = Mock(status_code=200)
+        mock_response.json.return_value = {"status": "success", "sent": 2}
+        mock_client.return_value.post.return_value = mock_response
+
+        result = send_notifications_bulk(self._notifications())
+
+        assert result == {"status": "success", "sent": 2}
+        url = mock_client.return_value.post.call_args.args[0]
+        body = mock_client.return_value.post.call_args.kwargs["json"]
+        assert url == f"{NOTIFICATIONS_SERVICE_URL}/send-notifications/bulk"
+        assert [n["user_id"] for n in body["notifications"]] == [1, 2]
+        assert body["notifications"][0]["fcm_title"] == "T"
+        assert "fcm_title" not in body["notifications"][1]
+
+    @pytest.mark.parametrize("status_code", [404, 405, 501])
+    @patch('adapters.notification_client.get_http_client')
+    def test_send_notifications_bulk_unsupported(self, mock_client, status_code):
+        mock_client.return_value.post.return_value = Mock(status_code=status_code)
+
+        with pytest.raises(BulkNotificationsUnsupportedError):
+            send_notifications_bulk(self._notifications())
+
+    @patch('adapters.notification_client.get_async_http_client')
+    def test_send_notifications_bulk_async_server_error(self, mock_client):
+        mock_response = Mock(status_code=500)
+        mock_response.raise_for_status.side_effect = httpx.HTTPStatusError(
+            "Server error", request=Mock(), response=Mock(status_code=500)
+        )
+        mock_client.return_value.post = AsyncMock(return_value=mock_response)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(send_notifications_bulk_async(self._notifications()))
+
+
+class TestDeleteNotificationsBulk:
+    """Tests for delete_notifications_by_invitation_ids and its async twin"""
+
+    @patch('adapters.notification_client.get_http_client')
+    def test_delete_notifications_by_invitation_ids_posts_one_request(self, mock_client):
+        mock_response = Mock(status_code=200)
+        mock_response.json.return_value = {"deleted_count": 3}
+        mock_client.return_value.post.return_value = mock_response
+
+        result = delete_notifications_by_invitation_ids([10, 11])
+
+        assert result == {"deleted_count": 3}
+        url = mock_client.return_value.post.call_args.args[0]
+        assert url == f"{NOTIFICATIONS_SERVICE_URL}/notifications/by-invitation/bulk-delete"
+        assert mock_client.return_value.post.call_args.kwargs["json"] == {"invitation_ids": [10, 11]}
+
+    @pytest.mark.parametrize("status_code", [404, 405, 501])
+    @patch('adapters.notification_client.get_async_http_client')
+    def test_delete_notifications_by_invitation_ids_async_unsupported(self, mock_client, status_code):
+        mock_client.return_value.post = AsyncMock(return_value=Mock(status_code=status_code))
+
+        with pytest.raises(BulkNotificationsUnsupportedError):
+            asyncio.run(delete_notifications_by_invitation_ids_async([10]))
+
+
 class TestNotificationServiceUrl:
     """Tests for environment variable configuration"""
     
@@ -546,3 +630,109 @@ class TestNotificationServiceUrl:
         
         # Assert (this should be the default value)
         assert NOTIFICATIONS_SERVICE_URL == 'http://localhost:8001'
+
+
+class TestNotificationFanoutLimit:
+    """Tests for the concurrency of fanned-out single calls"""
+
+    def test_defaults_to_half_the_bulkhead(self):
+        with patch('adapters.notification_client.get_bulkhead', return_value=Mock(max_concurrent=50)):
+            assert notification_fanout_limit() == 25
+
+    @patch('adapters.notification_client.NOTIFICATION_FANOUT_CONCURRENCY', 8)
+    def test_explicit_setting_wins(self):
+        assert notification_fanout_limit() == 8
+
+
+class TestNotificationClientAsync:
+    """Tests for the async notification client functions"""
+
+    def _mock_async_client(self, mock_get_client, method, response=None, side_effect=None):
+        mock_client_instance = Mock()
+        setattr(mock_client_instance, method, AsyncMock(return_value=response, side_effect=side_effect))
+        mock_get_client.return_value = mock_client_instance
+        return mock_client_instance
+
+    @patch('adapters.notification_client.get_async_http_client')
+    def test_get_notification_state_by_name_async_case_insensitive(self, mock_client):
+        """Test async state lookup matches names case-insensitively"""
+        mock_response = Mock()
+        mock_response.json.return_value = [
+            {"notification_state_id": 1, "name": "Pendiente"},
+            {"notification_state_id": 2, "name": "Respondida"}
+        ]
+        self._mock_async_client(mock_client, "get", response=mock_response)
+
+        result = asyncio.run(get_notification_state_by_name_async("respondida"))
+
+        assert result == {"notification_state_id": 2, "name": "Respondida"}
+
+    @patch('adapters.notification_client.get_async_http_client')
+    def test_get_notification_type_by_name_async_not_found(self, mock_client):
+        """Test async type lookup returns None when missing"""
+        mock_response = Mock()
+        mock_response.json.return_value = [{"notification_type_id": 1, "name": "Invitation"}]
+        self._mock_async_client(mock_client, "get", response=mock_response)
+
+        assert asyncio.run(get_notification_type_by_name_async("Reminder")) is None
+
+    @patch('adapters.notification_client.get_async_http_client')
+    def test_update_notification_state_async_request_error(self, mock_client):
+        """Test async state update re-raises request errors"""
+        self._mock_async_client(mock_client, "patch", side_effect=httpx.RequestError("Connection failed"))
+
+        with pytest.raises(httpx.RequestError):
+            asyncio.run(update_notification_state_async(1, 2))
+
+    @patch('adapters.notification_client.get_async_http_client')
+    def test_delete_notifications_by_invitation_id_async_success(self, mock_client):
+        """Test async deletion of invitation notifications"""
+        mock_response = Mock()
+        mock_response.json.return_value = {"deleted_count": 2}
+        client = self._mock_async_client(mock_client, "delete", response=mock_response)
+
+        result = asyncio.run(delete_notifications_by_invitation_id_async(5))
+
+        assert result == {"deleted_count": 2}
+        client.delete.assert_awaited_once_with(f"{NOTIFICATIONS_SERVICE_URL}/notifications/by-invitation/5")
+
+    @patch('adapters.notification_client.get_async_http_client')
+    def test_send_notification_async_payload(self, mock_client):
+        """Test async send builds the same payload as the sync version"""
+        mock_response = Mock()
+        mock_response.json.return_value = {"status": "success"}
+        client = self._mock_async_client(mock_client, "post", response=mock_response)
+
+        asyncio.run(send_notification_async("Hola", 1, 2, 3, 4, fcm_title="Título"))
+
+        client.post.assert_awaited_once_with(
+            f"{NOTIFICATIONS_SERVICE_URL}/send-notification",
+            json={
+                "message": "Hola",
+                "user_id": 1,
+                "notification_type_id": 2,
+                "invitation_id": 3,
+                "notification_state_id": 4,
+                "fcm_title": "Título"
+            }
+        )
+
+
+class TestNotificationCatalogCache:
+    """Tests for the cached notification catalogs"""
+
+    @patch('adapters.notification_client.get_http_client')
+    def test_catalog_is_downloaded_once(self, mock_client):
+        """Repeated lookups reuse the cached catalog"""
+        mock_response = Mock()
+        mock_response.json.return_value = [
+            {"notification_state_id": 1, "name": "Pendiente"},
+            {"notification_state_id": 2, "name": "Respondida"}
+        ]
+        mock_client_instance = Mock()
+        mock_client_instance.get.return_value = mock_response
+        mock_client.return_value = mock_client_instance
+
+        assert get_notification_state_by_name("Pendiente")["notification_state_id"] == 1
+        assert get_notification_state_by_name("RESPONDIDA")["notification_state_id"] == 2
+        mock_client_instance.get.assert_called_once()
@@ -0,0 +1,188 @@
+import asyncio
+import pytest
+import httpx
+from types import SimpleNamespace
+from unittest.mock import patch, Mock
+from sqlalchemy.dialects import postgresql
+from adapters.notification_outbox import (
+    OutboxDispatcher,
+    PermanentDeliveryError,
+    claim_batch,
+    complete_batch,
+    deliver_notification,
+    enqueue_notification,
+    notify_outbox,
+    FAILED,
+    PENDING
+)
+from models.models import NotificationOutbox
+
+
+def _row(outbox_id, attempts=1, **payload):
+    payload.setdefault("invitation_id", outbox_id)
+    return SimpleNamespace(outbox_id=outbox_id, attempts=attempts, payload=payload)
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+class TestEnqueueNotification:
+    """Tests for enqueue_notification"""
+
+    def test_adds_pending_row_to_session(self):
+        db = Mock()
+
+        entry = enqueue_notification(
+            db, message="Hola", user_id=2, invitation_id=7,
+            notification_type="Invitation", notification_state="Pendiente",
+            fcm_title="Nueva Invitación", replace_existing=True
+        )
+
+        db.add.assert_called_once_with(entry)
+        db.commit.assert_not_called()  # The caller commits with the invitation
+        assert isinstance(entry, NotificationOutbox)
+        assert entry.status == PENDING
+        assert entry.payload["invitation_id"] == 7
+        assert entry.payload["notification_type"] == "Invitation"
+        assert entry.payload["replace_existing"] is True
+
+
+class TestOutboxStatements:
+    """Tests for claim_batch and complete_batch"""
+
+    def test_claim_batch_skips_locked_rows_and_commits(self):
+        db = Mock()
+        db.execute.return_value.all.return_value = [_row(3), _row(1)]
+
+        rows = claim_batch(db, batch_size=10, lease_seconds=60)
+
+        sql = _sql(db.execute.call_args.args[0])
+        assert "FOR UPDATE SKIP LOCKED" in sql
+        assert "RETURNING" in sql
+        assert [row.outbox_id for row in rows] == [1, 3]
+        db.commit.assert_called_once()
+
+    def test_complete_batch_deletes_delivered_and_reschedules_failed(self):
+        db = Mock()
+
+        complete_batch(db, [1, 2], [(3, "timeout", 4.0), (4, "tipo inexistente", None)])
+
+        statements = [_sql(call.args[0]) for call in db.execute.call_args_list]
+        assert statements[0].startswith("DELETE FROM notification_outbox")
+        assert "available_at" in statements[1] and "status" not in statements[1]
+        assert "status" in statements[2]
+        assert db.execute.call_args_list[2].args[0].compile().params["status"] == FAILED
+        db.commit.assert_called_once()
+
+
+class TestDeliverNotification:
+    """Tests for deliver_notification"""
+
+    @patch('adapters.notification_outbox.send_notification_async')
+    @patch('adapters.notification_outbox.delete_notifications_by_invitation_id_async')
+    @patch('adapters.notification_outbox.get_notification_state_by_name_async', return_value={"notification_state_id": 5})
+    @patch('adapters.notification_outbox.get_notification_type_by_name_async', return_value={"notification_type_id": 9})
+    def test_resolves_catalog_ids_and_sends(self, mock_type, mock_state, mock_delete, mock_send):
+        payload = {"message": "Hola", "user_id": 2, "invitation_id": 7, "notification_type": "Invitation",
+                   "notification_state": "Pendiente", "fcm_title": "T", "fcm_body": "B", "replace_existing": False}
+
+        asyncio.run(deliver_notification(payload))
+
+        mock_delete.assert_not_called()
+        mock_send.assert_called_once_with(
+            message="Hola", user_id=2, notification_type_id=9, invitation_id=7,
+            notification_state_id=5, fcm_title="T", fcm_body="B"
+        )
+
+    @patch('adapters.notification_outbox.get_notification_state_by_name_async', return_value={"notification_state_id": 5})
+    @patch('adapters.notification_outbox.get_notification_type_by_name_async', return_value={"notification_type_id": 9})
+    def test_replace_existing_deletes_before_sending(self, mock_type, mock_state):
+        calls = []
+        with patch('adapters.notification_outbox.delete_notifications_by_invitation_id_async',
+                   side_effect=lambda invitation_id: calls.append(("delete", invitation_id))), \
+             patch('adapters.notification_outbox.send_notification_async',
+                   side_effect=lambda **kwargs: calls.append(("send", kwargs["invitation_id"]))):
+            asyncio.run(deliver_notification({"message": "m", "user_id": 2, "invitation_id": 7,
+                                              "notification_type": "Invitation", "notification_state": "Pendiente",
+                                              "replace_existing": True}))
+
+        assert calls == [("delete", 7), ("send", 7)]
+
+    @patch('adapters.notification_outbox.send_notification_async')
+    @patch('adapters.notification_outbox.get_notification_type_by_name_async', return_value=None)
+    def test_unknown_type_is_permanent(self, mock_type, mock_send):
+        with pytest.raises(PermanentDeliveryError):
+            asyncio.run(deliver_notification({"notification_type": "Nope", "notification_state": "Pendiente"}))
+        mock_send.assert_not_called()
+
+
+class TestOutboxDispatcher:
+    """Tests for OutboxDispatcher"""
+
+    def setup_method(self):
+        self.sessions = []
+        self.dispatcher = OutboxDispatcher(self._session, batch_size=10, poll_interval=30, max_attempts=3)
+
+    def _session(self):
+        session = Mock()
+        self.sessions.append(session)
+        return session
+
+    def test_run_once_sorts_outcomes(self):
+        rows = [_row(1), _row(2, attempts=1), _row(3, attempts=3), _row(4)]
+
+        async def deliver(payload, batcher=None):
+            if payload["invitation_id"] in (2, 3):
+                raise httpx.ConnectError("caído")
+            if payload["invitation_id"] == 4:
+                raise PermanentDeliveryError("tipo inexistente")
+
+        with patch('adapters.notification_outbox.claim_batch', return_value=rows), \
+             patch('adapters.notification_outbox.complete_batch') as mock_complete, \
+             patch('adapters.notification_outbox.deliver_notification', side_effect=deliver):
+            claimed = asyncio.run(self.dispatcher.run_once())
+
+        assert claimed == 4
+        _db, delivered, failed = mock_complete.call_args.args
+        assert delivered == [1]
+        outcomes = {outbox_id: retry_in for outbox_id, _error, retry_in in failed}
+        assert outcomes[2] is not None  # Transient: rescheduled with backoff
+        assert outcomes[3] is None      # Out of attempts
+        assert outcomes[4] is None      # Permanent
+        assert self.dispatcher.snapshot()["delivered"] == 1
+        assert self.dispatcher.snapshot()["retried"] == 1
+        assert self.dispatcher.snapshot()["failed"] == 2
+        assert all(session.close.called for session in self.sessions)
+
+    def test_run_once_with_empty_outbox_skips_completion(self):
+        with patch('adapters.notification_outbox.claim_batch', return_value=[]), \
+             patch('adapters.notification_outbox.complete_batch') as mock_complete:
+            assert asyncio.run(self.dispatcher.run_once()) == 0
+        mock_complete.assert_not_called()
+
+    def test_backoff_is_capped(self):
+        self.dispatcher.backoff_max = 5
+        assert all(0 <= self.dispatcher.backoff(20) <= 5 for _ in range(50))
+
+    def test_notify_outbox_wakes_running_dispatcher(self):
+        runs = []
+
+        async def run_once():
+            runs.append(1)
+            return 0
+
+        async def scenario():
+            self.dispatcher.run_once = run_once
+            self.dispatcher.start()
+            await asyncio.sleep(0.01)
+            notify_outbox()
+            await asyncio.sleep(0.01)
+            running = self.dispatcher.snapshot()["running"]
+            await self.dispatcher.stop()
+            return running
+
+        assert asyncio.run(scenario())
+        assert len(runs) == 2  # Startup pass plus the wake-up, long before poll_interval
+        assert not self.dispatcher.snapshot()["running"]
+        notify_outbox()  # No dispatcher registered after stop: no-op
@@ -0,0 +1,420 @@
+"""
+Test file for resilience.py
+
+Tests for the per-service circuit breaker, bulkhead and resilient transports.
+"""
+
+import asyncio
+import threading
+from unittest.mock import patch
+import httpx
+import pytest
+from adapters.resilience import (
+    CircuitBreaker,
+    Bulkhead,
+    ResilientTransport,
+    AsyncResilientTransport,
+    DependencyUnavailableError,
+    CLOSED,
+    OPEN,
+    HALF_OPEN
+)
+
+
+def _client(handler, breaker, bulkhead):
+    return httpx.Client(transport=ResilientTransport(httpx.MockTransport(handler), breaker, bulkhead))
+
+
+class TestCircuitBreaker:
+    """Tests for the breaker state machine"""
+
+    def test_opens_after_consecutive_failures(self):
+        """The breaker opens once the failure threshold is reached"""
+        breaker = CircuitBreaker("farms", failure_threshold=3, reset_timeout=30)
+
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+
+        assert breaker.state == OPEN
+        with pytest.raises(DependencyUnavailableError) as exc_info:
+            breaker.before_call()
+        assert exc_info.value.service == "farms"
+        assert breaker.snapshot()["rejected"] == 1
+
+    def test_success_resets_failure_count(self):
+        """Only consecutive failures count"""
+        breaker = CircuitBreaker("farms", failure_threshold=2, reset_timeout=30)
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        assert breaker.state == CLOSED
+
+    def test_half_open_allows_one_probe(self):
+        """After the reset timeout a single probe call is let through"""
+        breaker = CircuitBreaker("farms", failure_threshold=1, reset_timeout=30)
+        with patch('adapters.resilience.time.monotonic', return_value=100.0):
+            breaker.record_failure()
+        with patch('adapters.resilience.time.monotonic', return_value=131.0):
+            assert breaker.state == HALF_OPEN
+            breaker.before_call()
+            with pytest.raises(DependencyUnavailableError):
+                breaker.before_call()
+            breaker.record_success()
+
+        assert breaker.state == CLOSED
+
+    def test_failed_probe_reopens(self):
+        """A failing probe opens the breaker again"""
+        breaker = CircuitBreaker("farms", failure_threshold=5, reset_timeout=30)
+        with patch('adapters.resilience.time.monotonic', return_value=100.0):
+            for _ in range(5):
+                breaker.record_failure()
+        with patch('adapters.resilience.time.monotonic', return_value=131.0):
+            breaker.before_call()
+            breaker.record_failure()
+            assert breaker.state == OPEN
+
+    def test_abandoned_probe_is_released(self):
+        """A cancelled probe does not block the breaker in half-open"""
+        breaker = CircuitBreaker("farms", failure_threshold=1, reset_timeout=30)
+        with patch('adapters.resilience.time.monotonic', return_value=100.0):
+            breaker.record_failure()
+        with patch('adapters.resilience.time.monotonic', return_value=131.0):
+            breaker.before_call()
+            breaker.record_abandoned()
+            breaker.before_call()
+
+
+class TestBulkhead:
+    """Tests for the concurrency cap"""
+
+    def test_rejects_when_full(self):
+        """Calls beyond the cap fail fast"""
+        bulkhead = Bulkhead("users", max_concurrent=2)
+        bulkhead.acquire()
+        bulkhead.acquire()
+
+        with pytest.raises(DependencyUnavailableError):
+            bulkhead.acquire()
+
+        bulkhead.release()
+        bulkhead.acquire()
+        assert bulkhead.snapshot() == {"active": 2, "max_concurrent": 2, "rejected": 1}
+
+
+class TestResilientTransport:
+    """Tests for the transports used by the pooled clients"""
+
+    def test_server_errors_open_the_breaker(self):
+        """5xx answers count as failures and then requests fail fast"""
+        breaker = CircuitBreaker("farms", failure_threshold=2, reset_timeout=30)
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503)
+
+        client = _client(handler, breaker, Bulkhead("farms", 10))
+        client.get("http://farms/a")
+        client.get("http://farms/a")
+
+        with pytest.raises(DependencyUnavailableError):
+            client.get("http://farms/a")
+        assert len(calls) == 2
+
+    def test_client_errors_do_not_count(self):
+        """4xx answers are a healthy service"""
+        breaker = CircuitBreaker("users", failure_threshold=1, reset_timeout=30)
+        client = _client(lambda request: httpx.Response(404), breaker, Bulkhead("users", 10))
+
+        client.get("http://users/a")
+        client.get("http://users/a")
+
+        assert breaker.state == CLOSED
+
+    def test_transport_errors_count(self):
+        """Timeouts and connection errors count as failures"""
+        breaker = CircuitBreaker("farms", failure_threshold=1, reset_timeout=30)
+
+        def handler(request):
+            raise httpx.ConnectTimeout("timeout", request=request)
+
+        client = _client(handler, breaker, Bulkhead("farms", 10))
+        with pytest.raises(httpx.ConnectTimeout):
+            client.get("http://farms/a")
+
+        assert breaker.state == OPEN
+
+    def test_bulkhead_slot_released_after_call(self):
+        """The bulkhead slot is freed whether the call succeeds or fails"""
+        bulkhead = Bulkhead("farms", 1)
+
+        def handler(request):
+            raise httpx.ReadTimeout("timeout", request=request)
+
+        client = _client(handler, CircuitBreaker("farms", 100, 30), bulkhead)
+        for _ in range(3):
+            with pytest.raises(httpx.ReadTimeout):
+                client.get("http://farms/a")
+
+        assert bulkhead.snapshot()["active"] == 0
+
+    def test_bulkhead_caps_concurrent_threads(self):
+        """Concurrent calls beyond the cap are rejected without reaching the service"""
+        bulkhead = Bulkhead("farms", 1)
+        entered = threading.Event()
+        release = threading.Event()
+
+        def handler(request):
+            entered.set()
+            release.wait(1)
+            return httpx.Response(200)
+
+        client = _client(handler, CircuitBreaker("farms", 5, 30), bulkhead)
+        worker = threading.Thread(target=lambda: client.get("http://farms/slow"))
+        worker.start()
+        entered.wait(1)
+
+        with pytest.raises(DependencyUnavailableError):
+            client.get("http://farms/other")
+        release.set()
+        worker.join()
+
+    def test_async_transport_fails_fast_when_open(self):
+        """The async transport shares the breaker semantics"""
+        breaker = CircuitBreaker("notifications", failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        transport = AsyncResilientTransport(
+            httpx.MockTransport(lambda request: httpx.Response(200)), breaker, Bulkhead("notifications", 10)
+        )
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport) as client:
+                await client.get("http://notifications/a")
+
+        with pytest.raises(DependencyUnavailableError):
+            asyncio.run(run())
+
+
+class TestDeadlineInTransport:
+    """Tests for the request deadline applied by the transports"""
+
+    def test_timeout_is_limited_to_the_remaining_budget(self):
+        """Each call only gets what is left of the request budget"""
+        from utils.deadline import request_deadline
+        seen = {}
+
+        def handler(request):
+            seen.update(request.extensions["timeout"])
+            return httpx.Response(200)
+
+        client = _client(handler, CircuitBreaker("farms", 5, 30), Bulkhead("farms", 10))
+        with request_deadline(2):
+            client.get("http://farms/a", timeout=60.0)
+
+        assert 0 < seen["read"] <= 2
+
+    def test_spent_budget_skips_the_call(self):
+        """No request is sent once the deadline has passed"""
+        from utils.deadline import request_deadline, DeadlineExceededError
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200)
+
+        client = _client(handler, CircuitBreaker("farms", 5, 30), Bulkhead("farms", 10))
+        with request_deadline(-1):
+            with pytest.raises(DeadlineExceededError):
+                client.get("http://farms/a")
+
+        assert calls == []
+
+    def test_timeout_caused_by_deadline_does_not_trip_breaker(self):
+        """Running out of budget is not held against the service"""
+        from utils.deadline import request_deadline, DeadlineExceededError
+        breaker = CircuitBreaker("farms", failure_threshold=1, reset_timeout=30)
+
+        def handler(request):
+            raise httpx.ReadTimeout("timeout", request=request)
+
+        client = _client(handler, breaker, Bulkhead("farms", 10))
+        with request_deadline(0.001):
+            with patch('adapters.resilience._deadline_spent', return_value=True):
+                with pytest.raises(DeadlineExceededError):
+                    client.get("http://farms/a")
+
+        assert breaker.state == CLOSED
+
+
+def _policy(max_retries=2, budget_tokens=10, hedge=False, hedge_delay=0.5):
+    from adapters.resilience import RetryPolicy, RetryBudget
+    return RetryPolicy(max_retries=max_retries, backoff_base=0, backoff_max=0,
+                       budget=RetryBudget(ratio=0.1, max_tokens=budget_tokens),
+                       hedge=hedge, hedge_delay=hedge_delay)
+
+
+def _retrying_client(handler, policy, breaker=None):
+    transport = ResilientTransport(
+        httpx.MockTransport(handler), breaker or CircuitBreaker("farms", 100, 30), Bulkhead("farms", 10), policy
+    )
+    return httpx.Client(transport=transport)
+
+
+class TestRetries:
+    """Tests for retries of idempotent requests"""
+
+    def test_transient_error_is_retried(self):
+        """A GET that fails once succeeds on the retry"""
+        answers = [httpx.Response(503), httpx.Response(200, json={"ok": True})]
+        client = _retrying_client(lambda request: answers.pop(0), _policy())
+
+        assert client.get("http://farms/a").json() == {"ok": True}
+
+    def test_connection_error_is_retried(self):
+        """Transport errors are retried too"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(200)
+
+        assert _retrying_client(handler, _policy()).get("http://farms/a").status_code == 200
+        assert len(calls) == 2
+
+    def test_post_is_not_retried(self):
+        """Non-idempotent requests are sent once"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503)
+
+        assert _retrying_client(handler, _policy()).post("http://farms/a", json={}).status_code == 503
+        assert len(calls) == 1
+
+    def test_client_errors_are_not_retried(self):
+        """A 404 is a real answer"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(404)
+
+        _retrying_client(handler, _policy()).get("http://farms/a")
+
+        assert len(calls) == 1
+
+    def test_max_retries(self):
+        """Retries stop after max_retries"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503)
+
+        assert _retrying_client(handler, _policy(max_retries=2)).get("http://farms/a").status_code == 503
+        assert len(calls) == 3
+
+    def test_retry_budget_limits_amplification(self):
+        """With the budget spent, failures are not retried"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503)
+
+        policy = _policy(max_retries=5, budget_tokens=2)
+        client = _retrying_client(handler, policy)
+        for _ in range(5):
+            client.get("http://farms/a")
+
+        # 5 first attempts + at most 2 retries (plus the small ratio deposits)
+        assert len(calls) <= 8
+        assert policy.budget.snapshot()["exhausted"] > 0
+
+    def test_no_retry_when_breaker_opens(self):
+        """A breaker that opens stops the retry loop"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503)
+
+        client = _retrying_client(handler, _policy(max_retries=5), CircuitBreaker("farms", 2, 30))
+        with pytest.raises(DependencyUnavailableError):
+            client.get("http://farms/a")
+
+        assert len(calls) == 2
+
+    def test_backoff_uses_full_jitter(self):
+        """The wait is random and bounded by the exponential cap"""
+        from adapters.resilience import RetryPolicy, RetryBudget
+        policy = RetryPolicy(5, backoff_base=0.1, backoff_max=1.0, budget=RetryBudget(0.1, 10))
+
+        delays = [policy.backoff(3) for _ in range(50)]
+
+        assert all(0 <= delay <= 0.8 for delay in delays)
+        assert len(set(delays)) > 1
+
+
+class TestHedging:
+    """Tests for hedged GETs in the async transport"""
+
+    def _client(self, handler, policy):
+        transport = AsyncResilientTransport(
+            httpx.MockTransport(handler), CircuitBreaker("users", 100, 30), Bulkhead("users", 10), policy
+        )
+        return httpx.AsyncClient(transport=transport)
+
+    def test_slow_request_is_hedged(self):
+        """A second request is sent when the first is slower than the hedge delay"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                await asyncio.sleep(1)
+                return httpx.Response(200, json={"from": "first"})
+            return httpx.Response(200, json={"from": "hedge"})
+
+        policy = _policy(hedge=True, hedge_delay=0.01)
+
+        async def run():
+            async with self._client(handler, policy) as client:
+                return (await client.get("http://users/a")).json()
+
+        assert asyncio.run(run()) == {"from": "hedge"}
+        assert policy.hedges == 1
+
+    def test_fast_request_is_not_hedged(self):
+        """Requests answering within the delay are sent once"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            return httpx.Response(200)
+
+        policy = _policy(hedge=True, hedge_delay=1)
+
+        async def run():
+            async with self._client(handler, policy) as client:
+                await client.get("http://users/a")
+
+        asyncio.run(run())
+
+        assert len(calls) == 1 and policy.hedges == 0
+
+    def test_hedge_delay_follows_observed_p95(self):
+        """Once enough samples exist the p95 latency replaces the default delay"""
+        policy = _policy(hedge=True, hedge_delay=5)
+        for i in range(100):
+            policy.latencies.record(i / 1000)
+
+        assert policy.hedge_after(httpx.Request("GET", "http://users/a")) == pytest.approx(0.095)
+        assert policy.hedge_after(httpx.Request("POST", "http://users/a")) is None
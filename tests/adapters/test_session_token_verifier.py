@@ -0,0 +1,163 @@
+"""
+Test file for session_token_verifier.py
+
+Tests for local verification of signed session tokens.
+"""
+
+import asyncio
+import base64
+import time
+from unittest.mock import Mock, AsyncMock, patch
+import pytest
+from jose import jwt
+from adapters import session_token_verifier
+from adapters.session_token_verifier import (
+    UNVERIFIABLE,
+    verify_session_token_locally,
+    verify_session_token_locally_async
+)
+from domain.schemas import UserResponse
+
+SECRET = "test-signing-secret"
+
+
+def _jwk(kid, secret=SECRET):
+    encoded = base64.urlsafe_b64encode(secret.encode()).decode().rstrip("=")
+    return {"kty": "oct", "kid": kid, "alg": "HS256", "k": encoded}
+
+
+def _token(kid="k1", secret=SECRET, **claims):
+    payload = {"user_id": 7, "name": "Ana", "email": "ana@example.com", "exp": int(time.time()) + 60}
+    payload.update(claims)
+    return jwt.encode(payload, secret, algorithm="HS256", headers={"kid": kid})
+
+
+@pytest.fixture(autouse=True)
+def local_mode():
+    with patch.object(session_token_verifier, "SESSION_TOKEN_LOCAL_VERIFICATION", True), \
+         patch.object(session_token_verifier, "SESSION_TOKEN_ALGORITHMS", ["HS256"]), \
+         patch.object(session_token_verifier, "_last_forced_refresh", float("-inf")):
+        yield
+
+
+def _mock_jwks(mock_client, *key_sets):
+    responses = []
+    for keys in key_sets:
+        response = Mock()
+        response.json.return_value = {"keys": keys}
+        responses.append(response)
+    mock_client.return_value.get.side_effect = responses
+    return mock_client.return_value
+
+
+class TestVerifySessionTokenLocally:
+    """Tests for the synchronous local verification"""
+
+    @patch('adapters.session_token_verifier.get_http_client')
+    def test_valid_token(self, mock_client):
+        """A correctly signed token yields the user without a remote check"""
+        _mock_jwks(mock_client, [_jwk("k1")])
+
+        user = verify_session_token_locally(_token())
+
+        assert user == UserResponse(user_id=7, name="Ana", email="ana@example.com")
+
+    @patch('adapters.session_token_verifier.get_http_client')
+    def test_key_set_is_cached(self, mock_client):
+        """The key set is fetched once for several verifications"""
+        client = _mock_jwks(mock_client, [_jwk("k1")])
+
+        verify_session_token_locally(_token())
+        verify_session_token_locally(_token())
+
+        client.get.assert_called_once()
+
+    @patch('adapters.session_token_verifier.get_http_client')
+    def test_bad_signature_is_rejected(self, mock_client):
+        """A token signed with another key is invalid"""
+        _mock_jwks(mock_client, [_jwk("k1")])
+
+        assert verify_session_token_locally(_token(secret="other-secret")) is None
+
+    @patch('adapters.session_token_verifier.get_http_client')
+    def test_expired_token_is_rejected(self, mock_client):
+        """An expired token is invalid"""
+        _mock_jwks(mock_client, [_jwk("k1")])
+
+        assert verify_session_token_locally(_token(exp=int(time.time()) - 10)) is None
+
+    def test_opaque_token_is_unverifiable(self):
+        """Non-JWT tokens must go to the user service"""
+        assert verify_session_token_locally("opaque-session-token") is UNVERIFIABLE
+
+    @patch('adapters.session_token_verifier.get_http_client')
+    def test_key_rotation_reloads_key_set(self, mock_client):
+        """An unknown kid triggers one reload of the key set"""
+        client = _mock_jwks(mock_client, [_jwk("k1")], [_jwk("k1"), _jwk("k2", "rotated-secret")])
+
+        verify_session_token_locally(_token())
+        user = verify_session_token_locally(_token(kid="k2", secret="rotated-secret"))
+
+        assert user is not None and user is not UNVERIFIABLE
+        assert client.get.call_count == 2
+
+    @patch('adapters.session_token_verifier.get_http_client')
+    def test_unknown_kid_is_unverifiable(self, mock_client):
+        """A kid missing even after reload falls back to the remote check"""
+        _mock_jwks(mock_client, [_jwk("k1")], [_jwk("k1")])
+
+        assert verify_session_token_locally(_token(kid="unknown")) is UNVERIFIABLE
+
+    @patch('adapters.session_token_verifier.get_http_client')
+    def test_missing_user_claims_is_unverifiable(self, mock_client):
+        """A valid token without user claims is checked remotely"""
+        _mock_jwks(mock_client, [_jwk("k1")])
+
+        assert verify_session_token_locally(_token(email=None)) is UNVERIFIABLE
+
+    @patch('adapters.session_token_verifier.get_http_client')
+    def test_key_set_unavailable_is_unverifiable(self, mock_client):
+        """If the key set cannot be loaded the remote check is used"""
+        mock_client.return_value.get.side_effect = Exception("down")
+
+        assert verify_session_token_locally(_token()) is UNVERIFIABLE
+
+    def test_disabled_mode(self):
+        """With local verification disabled every token is unverifiable"""
+        with patch.object(session_token_verifier, "SESSION_TOKEN_LOCAL_VERIFICATION", False):
+            assert verify_session_token_locally(_token()) is UNVERIFIABLE
+
+    @patch('adapters.session_token_verifier.get_async_http_client')
+    def test_async_valid_token(self, mock_client):
+        """The async path verifies locally as well"""
+        response = Mock()
+        response.json.return_value = {"keys": [_jwk("k1")]}
+        mock_client.return_value.get = AsyncMock(return_value=response)
+
+        user = asyncio.run(verify_session_token_locally_async(_token()))
+
+        assert user.user_id == 7
+
+
+class TestUserClientIntegration:
+    """verify_session_token only calls the user service when needed"""
+
+    @patch('adapters.user_client._make_request')
+    @patch('adapters.session_token_verifier.get_http_client')
+    def test_signed_token_skips_remote_check(self, mock_client, mock_make_request):
+        from adapters.user_client import verify_session_token
+        _mock_jwks(mock_client, [_jwk("k1")])
+
+        user = verify_session_token(_token())
+
+        assert user.user_id == 7
+        mock_make_request.assert_not_called()
+
+    @patch('adapters.user_client._make_request')
+    def test_opaque_token_uses_remote_check(self, mock_make_request):
+        from adapters.user_client import verify_session_token
+        mock_make_request.return_value = None
+
+        verify_session_token("opaque-session-token")
+
+        mock_make_request.assert_called_once()
@@ -1,5 +1,6 @@
+import asyncio
 import pytest
-from unittest.mock import patch, Mock, MagicMock
+from unittest.mock import patch, Mock, MagicMock, AsyncMock
 import httpx
 from adapters.user_client import (
     _make_request,
@@ -8,6 +9,16 @@ from adapters.user_client import (
     create_user_role,
     get_role_permissions_for_user_role,
     get_role_name_by_id,
+    _make_request_async,
+    verify_session_token_async,
+    create_user_role_async,
+    get_role_permissions_for_user_role_async,
+    get_role_name_by_id_async,
+    evict_session_token,
+    invalidate_role_name,
+    invalidate_user_role_permissions,
+    _valid_session_tokens,
+    _invalid_session_tokens,
     UserRoleCreationError,
     USER_SERVICE_URL,
     DEFAULT_TIMEOUT
@@ -18,7 +29,7 @@ from domain.schemas import UserResponse
 class TestMakeRequest:
     """Tests for the _make_request function."""
     
-    @patch('adapters.user_client.httpx.Client')
+    @patch('adapters.user_client.get_http_client')
     def test_make_request_get_success(self, mock_client):
         """Test successful GET request."""
         # Arrange
@@ -28,7 +39,7 @@ class TestMakeRequest:
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = _make_request("/test", method="GET", params={"param": "value"})
@@ -37,10 +48,11 @@ class TestMakeRequest:
         assert result == {"data": "test"}
         mock_client_instance.get.assert_called_once_with(
             f"{USER_SERVICE_URL}/test", 
-            params={"param": "value"}
+            params={"param": "value"},
+            timeout=DEFAULT_TIMEOUT
         )
     
-    @patch('adapters.user_client.httpx.Client')
+    @patch('adapters.user_client.get_http_client')
     def test_make_request_post_success(self, mock_client):
         """Test successful POST request."""
         # Arrange
@@ -50,7 +62,7 @@ class TestMakeRequest:
         
         mock_client_instance = Mock()
         mock_client_instance.post.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = _make_request("/test", method="POST", data={"key": "value"})
@@ -59,10 +71,11 @@ class TestMakeRequest:
         assert result == {"created": True}
         mock_client_instance.post.assert_called_once_with(
             f"{USER_SERVICE_URL}/test", 
-            json={"key": "value"}
+            json={"key": "value"},
+            timeout=DEFAULT_TIMEOUT
         )
     
-    @patch('adapters.user_client.httpx.Client')
+    @patch('adapters.user_client.get_http_client')
     def test_make_request_error_status(self, mock_client):
         """Test request with error status code."""
         # Arrange
@@ -72,7 +85,7 @@ class TestMakeRequest:
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = _make_request("/test")
@@ -80,13 +93,13 @@ class TestMakeRequest:
         # Assert
         assert result is None
     
-    @patch('adapters.user_client.httpx.Client')
+    @patch('adapters.user_client.get_http_client')
     def test_make_request_exception(self, mock_client):
         """Test request that raises an exception."""
         # Arrange
         mock_client_instance = Mock()
         mock_client_instance.get.side_effect = httpx.RequestError("Connection error")
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = _make_request("/test")
@@ -94,7 +107,7 @@ class TestMakeRequest:
         # Assert
         assert result is None
     
-    @patch('adapters.user_client.httpx.Client')
+    @patch('adapters.user_client.get_http_client')
     def test_make_request_unsupported_method(self, mock_client):
         """Test request with unsupported HTTP method."""
         # Act
@@ -103,7 +116,7 @@ class TestMakeRequest:
         # Assert
         assert result is None
     
-    @patch('adapters.user_client.httpx.Client')
+    @patch('adapters.user_client.get_http_client')
     def test_make_request_custom_timeout(self, mock_client):
         """Test request with custom timeout."""
         # Arrange
@@ -113,14 +126,18 @@ class TestMakeRequest:
         
         mock_client_instance = Mock()
         mock_client_instance.get.return_value = mock_response
-        mock_client.return_value.__enter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         # Act
         result = _make_request("/test", timeout=30.0)
         
         # Assert
         assert result == {"data": "test"}
-        mock_client.assert_called_once_with(timeout=30.0)
+        mock_client_instance.get.assert_called_once_with(
+            f"{USER_SERVICE_URL}/test",
+            params=None,
+            timeout=30.0
+        )
 
 
 class TestVerifySessionToken:
@@ -152,7 +169,8 @@ class TestVerifySessionToken:
         mock_make_request.assert_called_once_with(
             "/users-service/session-token-verification",
             method="POST",
-            data={"session_token": "valid_token"}
+            data={"session_token": "valid_token"},
+            client_errors_as_response=True
         )
     
     @patch('adapters.user_client._make_request')
@@ -198,6 +216,90 @@ class TestVerifySessionToken:
         assert result is None
 
 
+class TestSessionTokenCache:
+    """Tests for the session token verification cache."""
+
+    VALID_RESPONSE = {
+        "status": "success",
+        "data": {"user": {"user_id": 1, "name": "John Doe", "email": "john@example.com"}}
+    }
+
+    @patch('adapters.user_client._make_request')
+    def test_valid_token_is_cached(self, mock_make_request):
+        """A valid token is verified remotely only once."""
+        mock_make_request.return_value = self.VALID_RESPONSE
+
+        first = verify_session_token("token")
+        second = verify_session_token("token")
+
+        assert first == second
+        mock_make_request.assert_called_once()
+
+    @patch('adapters.user_client._make_request')
+    def test_rejected_token_is_negatively_cached(self, mock_make_request):
+        """A token rejected by the user service is not re-verified."""
+        mock_make_request.return_value = {"status": "error", "status_code": 401}
+
+        assert verify_session_token("bad") is None
+        assert verify_session_token("bad") is None
+        mock_make_request.assert_called_once()
+        assert len(_invalid_session_tokens) == 1
+        assert len(_valid_session_tokens) == 0
+
+    @patch('adapters.user_client._make_request')
+    def test_request_failure_is_not_cached(self, mock_make_request):
+        """Transport failures are retried on the next call."""
+        mock_make_request.side_effect = [None, self.VALID_RESPONSE]
+
+        assert verify_session_token("token") is None
+        assert len(_invalid_session_tokens) == 0
+        assert verify_session_token("token") is not None
+
+    @patch('adapters.user_client._make_request')
+    def test_cache_never_stores_raw_token(self, mock_make_request):
+        """Only a digest of the token is used as cache key."""
+        mock_make_request.return_value = self.VALID_RESPONSE
+
+        verify_session_token("secret-token")
+
+        assert "secret-token" not in _valid_session_tokens._data
+        assert all(isinstance(key, bytes) and len(key) == 32 for key in _valid_session_tokens._data)
+
+    @patch('adapters.user_client._make_request')
+    def test_evict_session_token(self, mock_make_request):
+        """An evicted token is verified again."""
+        mock_make_request.return_value = self.VALID_RESPONSE
+
+        verify_session_token("token")
+        evict_session_token("token")
+        verify_session_token("token")
+
+        assert mock_make_request.call_count == 2
+
+    @patch('adapters.user_client._make_request_async')
+    def test_async_shares_cache(self, mock_make_request_async):
+        """The async verification reuses entries cached by the sync path."""
+        with patch('adapters.user_client._make_request', return_value=self.VALID_RESPONSE):
+            verify_session_token("token")
+
+        result = asyncio.run(verify_session_token_async("token"))
+
+        assert result.user_id == 1
+        mock_make_request_async.assert_not_called()
+
+    @patch('adapters.user_client.get_http_client')
+    def test_client_error_status_returns_error_dict(self, mock_client):
+        """4xx answers are reported as rejections when requested."""
+        mock_response = Mock()
+        mock_response.status_code = 401
+        mock_response.text = "Unauthorized"
+        mock_client.return_value.post.return_value = mock_response
+
+        result = _make_request("/test", method="POST", data={}, client_errors_as_response=True)
+
+        assert result == {"status": "error", "status_code": 401}
+
+
 class TestUserVerificationByEmail:
     """Tests for the user_verification_by_email function."""
     
@@ -330,7 +432,7 @@ class TestGetRolePermissionsForUserRole:
         result = get_role_permissions_for_user_role(123)
         
         # Assert
-        assert result == ["read_users", "write_users", "delete_users"]
+        assert result == frozenset({"read_users", "write_users", "delete_users"})
         mock_make_request.assert_called_once_with(
             "/users-service/user-role/123/permissions"
         )
@@ -347,7 +449,7 @@ class TestGetRolePermissionsForUserRole:
         result = get_role_permissions_for_user_role(999)
         
         # Assert
-        assert result == []
+        assert result == frozenset()
     
     @patch('adapters.user_client._make_request')
     def test_get_role_permissions_request_failure(self, mock_make_request):
@@ -359,7 +461,7 @@ class TestGetRolePermissionsForUserRole:
         result = get_role_permissions_for_user_role(123)
         
         # Assert
-        assert result == []
+        assert result == frozenset()
     
     @patch('adapters.user_client._make_request')
     def test_get_role_permissions_empty_permissions(self, mock_make_request):
@@ -373,7 +475,7 @@ class TestGetRolePermissionsForUserRole:
         result = get_role_permissions_for_user_role(123)
         
         # Assert
-        assert result == []
+        assert result == frozenset()
 
 
 class TestGetRoleNameById:
@@ -423,6 +525,129 @@ class TestGetRoleNameById:
         assert result is None
 
 
+class TestRoleCatalogCache:
+    """Tests for the role name and user_role permission caches."""
+
+    @patch('adapters.user_client._make_request')
+    def test_role_name_is_cached(self, mock_make_request):
+        """A role name is fetched once per role_id."""
+        mock_make_request.return_value = {"role_name": "Operador de campo"}
+
+        assert get_role_name_by_id(2) == "Operador de campo"
+        assert get_role_name_by_id(2) == "Operador de campo"
+        mock_make_request.assert_called_once()
+
+    @patch('adapters.user_client._make_request')
+    def test_unknown_role_is_not_cached(self, mock_make_request):
+        """A missing role is looked up again on the next call."""
+        mock_make_request.side_effect = [{}, {"role_name": "Administrador de finca"}]
+
+        assert get_role_name_by_id(1) is None
+        assert get_role_name_by_id(1) == "Administrador de finca"
+
+    @patch('adapters.user_client._make_request')
+    def test_permissions_are_cached_as_frozenset(self, mock_make_request):
+        """Permissions are fetched once and stored as a frozenset."""
+        mock_make_request.return_value = {"permissions": [{"name": "add_operator_farm"}]}
+
+        first = get_role_permissions_for_user_role(10)
+        second = get_role_permissions_for_user_role(10)
+
+        assert isinstance(first, frozenset)
+        assert "add_operator_farm" in second
+        mock_make_request.assert_called_once()
+
+    @patch('adapters.user_client._make_request')
+    def test_invalidate_user_role_permissions(self, mock_make_request):
+        """Invalidated permissions are fetched again."""
+        mock_make_request.side_effect = [
+            {"permissions": [{"name": "add_operator_farm"}]},
+            {"permissions": []}
+        ]
+
+        get_role_permissions_for_user_role(10)
+        invalidate_user_role_permissions(10)
+
+        assert get_role_permissions_for_user_role(10) == frozenset()
+
+    @patch('adapters.user_client._make_request')
+    def test_invalidate_role_name(self, mock_make_request):
+        """Invalidating all role names forces a reload."""
+        mock_make_request.return_value = {"role_name": "Operador de campo"}
+
+        get_role_name_by_id(2)
+        invalidate_role_name()
+        get_role_name_by_id(2)
+
+        assert mock_make_request.call_count == 2
+
+    @patch('adapters.user_client._make_request')
+    def test_expired_permissions_fail_closed_when_service_fails(self, mock_make_request):
+        """An expired entry is not served if the user service is down."""
+        from adapters.user_client import _user_role_permissions_cache
+        mock_make_request.side_effect = [{"permissions": [{"name": "add_operator_farm"}]}, None]
+
+        with patch.object(_user_role_permissions_cache, "ttl", 0):
+            get_role_permissions_for_user_role(10)
+        result = get_role_permissions_for_user_role(10)
+
+        assert result == frozenset()
+        assert mock_make_request.call_count == 2
+
+    @patch('adapters.user_client._make_request')
+    def test_failed_permissions_lookup_is_not_cached(self, mock_make_request):
+        """A failed lookup is retried on the next call."""
+        mock_make_request.side_effect = [None, {"permissions": [{"name": "add_operator_farm"}]}]
+
+        assert get_role_permissions_for_user_role(10) == frozenset()
+        assert get_role_permissions_for_user_role(10) == frozenset({"add_operator_farm"})
+
+    @patch('adapters.user_client._make_request')
+    def test_permissions_cache_is_bounded(self, mock_make_request):
+        """The least recently used user_role is evicted past the size limit."""
+        from adapters.user_client import _user_role_permissions_cache
+        mock_make_request.return_value = {"permissions": [{"name": "add_operator_farm"}]}
+
+        with patch.object(_user_role_permissions_cache, "max_size", 2):
+            for user_role_id in (10, 11, 12):
+                get_role_permissions_for_user_role(user_role_id)
+
+            assert len(_user_role_permissions_cache) == 2
+            get_role_permissions_for_user_role(10)
+
+        assert mock_make_request.call_count == 4
+
+    @patch('adapters.user_client._make_request')
+    def test_stale_role_name_served_when_service_fails(self, mock_make_request):
+        """An expired role name is still served if the user service is down."""
+        from adapters.user_client import _role_names_cache
+        mock_make_request.side_effect = [{"role_name": "Operador de campo"}, None]
+
+        get_role_name_by_id(2)
+        with patch.object(_role_names_cache, "ttl", 0):
+            result = get_role_name_by_id(2)
+
+        assert result == "Operador de campo"
+
+    @patch('adapters.user_client._make_request_async')
+    def test_async_permissions_share_cache(self, mock_make_request_async):
+        """The async permission lookup reuses entries cached by the sync path."""
+        with patch('adapters.user_client._make_request', return_value={"permissions": [{"name": "add_operator_farm"}]}):
+            get_role_permissions_for_user_role(10)
+
+        assert asyncio.run(get_role_permissions_for_user_role_async(10)) == frozenset({"add_operator_farm"})
+        mock_make_request_async.assert_not_called()
+
+    @patch('adapters.user_client._make_request_async')
+    def test_async_shares_cache(self, mock_make_request_async):
+        """The async lookups reuse entries cached by the sync path."""
+        with patch('adapters.user_client._make_request', return_value={"role_name": "Operador de campo"}):
+            get_role_name_by_id(2)
+
+        assert asyncio.run(get_role_name_by_id_async(2)) == "Operador de campo"
+        mock_make_request_async.assert_not_called()
+
+
 class TestConstants:
     """Tests for module constants and configuration."""
     
@@ -451,3 +676,70 @@ class TestUserRoleCreationError:
             raise UserRoleCreationError(message)
         
         assert str(exc_info.value) == message
+
+
+class TestUserClientAsync:
+    """Tests for the async user client functions."""
+
+    @patch('adapters.user_client.get_async_http_client')
+    def test_make_request_async_post_success(self, mock_client):
+        """Test successful async POST request."""
+        mock_response = Mock()
+        mock_response.status_code = 201
+        mock_response.json.return_value = {"created": True}
+        mock_client_instance = Mock()
+        mock_client_instance.post = AsyncMock(return_value=mock_response)
+        mock_client.return_value = mock_client_instance
+
+        result = asyncio.run(_make_request_async("/test", method="POST", data={"key": "value"}))
+
+        assert result == {"created": True}
+        mock_client_instance.post.assert_awaited_once_with(
+            f"{USER_SERVICE_URL}/test",
+            json={"key": "value"},
+            timeout=DEFAULT_TIMEOUT
+        )
+
+    @patch('adapters.user_client.get_async_http_client')
+    def test_make_request_async_exception(self, mock_client):
+        """Test async request that raises an exception."""
+        mock_client_instance = Mock()
+        mock_client_instance.get = AsyncMock(side_effect=httpx.RequestError("Connection error"))
+        mock_client.return_value = mock_client_instance
+
+        assert asyncio.run(_make_request_async("/test")) is None
+
+    @patch('adapters.user_client._make_request_async')
+    def test_verify_session_token_async_success(self, mock_make_request):
+        """Test successful async session token verification."""
+        mock_make_request.return_value = {
+            "status": "success",
+            "data": {"user": {"user_id": 1, "name": "John Doe", "email": "john@example.com"}}
+        }
+
+        result = asyncio.run(verify_session_token_async("valid_token"))
+
+        assert isinstance(result, UserResponse)
+        assert result.user_id == 1
+
+    @patch('adapters.user_client._make_request_async')
+    def test_create_user_role_async_failure(self, mock_make_request):
+        """Test async user role creation failure."""
+        mock_make_request.return_value = None
+
+        with pytest.raises(UserRoleCreationError):
+            asyncio.run(create_user_role_async(1, "admin"))
+
+    @patch('adapters.user_client._make_request_async')
+    def test_get_role_permissions_async_success(self, mock_make_request):
+        """Test async retrieval of role permissions."""
+        mock_make_request.return_value = {"permissions": [{"name": "add_operator_farm"}]}
+
+        assert asyncio.run(get_role_permissions_for_user_role_async(5)) == frozenset({"add_operator_farm"})
+
+    @patch('adapters.user_client._make_request_async')
+    def test_get_role_name_async_not_found(self, mock_make_request):
+        """Test async role name lookup when role is missing."""
+        mock_make_request.return_value = {}
+
+        assert asyncio.run(get_role_name_by_id_async(99)) is None
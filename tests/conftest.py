@@ -0,0 +1,10 @@
+import pytest
+from utils.cache import clear_caches
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    """Keep in-process caches from leaking state between tests."""
+    clear_caches()
+    yield
+    clear_caches()
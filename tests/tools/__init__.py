@@ -0,0 +1 @@
+# Test tools package
@@ -0,0 +1,53 @@
+"""
+Test file for tools/backfill_invitation_snapshots.py
+
+Tests for the batch that fills farm_name and suggested_role_name on old invitations.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from tools.backfill_invitation_snapshots import backfill_invitation_snapshots
+
+
+def _invitation(invitation_id, farm_id=1, suggested_role_id=2):
+    return SimpleNamespace(
+        invitation_id=invitation_id,
+        farm_id=farm_id,
+        suggested_role_id=suggested_role_id,
+        farm_name=None,
+        suggested_role_name=None
+    )
+
+
+def _session(*batches):
+    db = MagicMock()
+    query = db.query.return_value.filter.return_value.order_by.return_value.limit.return_value
+    query.all.side_effect = [list(batch) for batch in batches] + [[]]
+    return db
+
+
+class TestBackfillInvitationSnapshots:
+    """Tests for counting completed and unresolved invitations"""
+
+    @patch('tools.backfill_invitation_snapshots.get_role_name_by_id', return_value="Operador de campo")
+    @patch('tools.backfill_invitation_snapshots.get_farm_by_id')
+    def test_counts_only_completed_rows(self, mock_get_farm, mock_get_role_name):
+        """Rows whose farm could not be resolved are reported apart"""
+        mock_get_farm.side_effect = lambda farm_id: SimpleNamespace(name="La Esperanza") if farm_id == 1 else None
+        resolved, missing_farm = _invitation(1, farm_id=1), _invitation(2, farm_id=9)
+        db = _session([resolved, missing_farm])
+
+        assert backfill_invitation_snapshots(db, batch_size=10) == (1, 1)
+        assert resolved.farm_name == "La Esperanza"
+        assert missing_farm.farm_name is None
+        db.commit.assert_called_once()
+
+    @patch('tools.backfill_invitation_snapshots.get_role_name_by_id', return_value=None)
+    @patch('tools.backfill_invitation_snapshots.get_farm_by_id', return_value=SimpleNamespace(name="La Esperanza"))
+    def test_unresolved_role_is_not_counted(self, mock_get_farm, mock_get_role_name):
+        """A row missing its role name is unresolved even if the farm name was written"""
+        db = _session([_invitation(1)], [_invitation(2)])
+
+        assert backfill_invitation_snapshots(db, batch_size=1) == (0, 2)
+        mock_get_farm.assert_called_once_with(1)
+        assert db.commit.call_count == 2
@@ -5,19 +5,25 @@ This file contains comprehensive unit tests for the create invitation use case.
 Tests cover all functions, edge cases, and error scenarios.
 """
 
-from unittest.mock import Mock, patch
+import asyncio
+import pytest
+from unittest.mock import ANY, AsyncMock, Mock, patch
 from datetime import datetime
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.responses import ORJSONResponse
 
 from use_cases.create_invitation_use_case import (
     create_invitation,
-    _validate_farm_and_user_access,
     _validate_role_permissions,
     _validate_invited_user,
+    _start_lookups,
     _handle_invitation_creation_or_update,
-    _send_invitation_notification
+    _save_invitation,
+    _upsert_invitation_statement
 )
+from use_cases.access import cancel_pending, validate_farm_and_user_access
 from domain.schemas import InvitationCreate, UserResponse, FarmDetailResponse, UserRoleFarmResponse
 from utils.constants import (
     ROLE_ADMIN_FARM,
@@ -78,10 +84,36 @@ class TestCreateInvitationUseCase:
         """Teardown method called after each test"""
         pass
 
-    # Tests for _validate_farm_and_user_access function
-    @patch('use_cases.create_invitation_use_case.get_farm_by_id')
-    @patch('use_cases.create_invitation_use_case.get_user_role_farm_state_by_name')
-    @patch('use_cases.create_invitation_use_case.get_user_role_farm')
+    @pytest.fixture(autouse=True)
+    def default_lookups(self):
+        """Every remote lookup succeeds unless a test patches it differently"""
+        inviter_urf = Mock(user_role_id=1, user_role_farm_state_id=1)
+        with patch('use_cases.create_invitation_use_case.get_farm_by_id_async', return_value=Mock(name="farm")), \
+             patch('use_cases.create_invitation_use_case.get_user_role_farm_state_by_name_async',
+                   return_value={"user_role_farm_state_id": 1}), \
+             patch('use_cases.create_invitation_use_case.get_user_role_farm_async',
+                   side_effect=lambda user_id, farm_id: inviter_urf if user_id == 1 else None), \
+             patch('use_cases.create_invitation_use_case.get_role_name_by_id_async', return_value=ROLE_OPERATOR_FARM), \
+             patch('use_cases.create_invitation_use_case.get_role_permissions_for_user_role_async',
+                   return_value=frozenset({"add_operator_farm", "add_administrator_farm"})), \
+             patch('use_cases.create_invitation_use_case.user_verification_by_email_async',
+                   return_value=Mock(user_id=2)):
+            yield
+
+    def _run_validator(self, validator, *args):
+        """Run a validator against freshly started lookups"""
+        async def run():
+            lookups = _start_lookups(self.invitation_data, self.user)
+            try:
+                return await validator(lookups, *args)
+            finally:
+                await cancel_pending(lookups)
+        return asyncio.run(run())
+
+    # Tests for validate_farm_and_user_access function
+    @patch('use_cases.create_invitation_use_case.get_farm_by_id_async')
+    @patch('use_cases.create_invitation_use_case.get_user_role_farm_state_by_name_async')
+    @patch('use_cases.create_invitation_use_case.get_user_role_farm_async')
     def test_validate_farm_and_user_access_success(self, mock_get_urf, mock_get_state, mock_get_farm):
         """Test successful farm and user access validation"""
         # Arrange
@@ -90,7 +122,7 @@ class TestCreateInvitationUseCase:
         mock_get_urf.return_value = self.urf
         
         # Act
-        result, error = _validate_farm_and_user_access(self.invitation_data, self.user)
+        result, error = self._run_validator(validate_farm_and_user_access)
         
         # Assert
         assert error is None
@@ -99,14 +131,14 @@ class TestCreateInvitationUseCase:
         assert result["urf"] == self.urf
         assert result["urf_active_state_id"] == 1
         
-    @patch('use_cases.create_invitation_use_case.get_farm_by_id')
+    @patch('use_cases.create_invitation_use_case.get_farm_by_id_async')
     def test_validate_farm_and_user_access_farm_not_found(self, mock_get_farm):
         """Test farm not found scenario"""
         # Arrange
         mock_get_farm.return_value = None
         
         # Act
-        result, error = _validate_farm_and_user_access(self.invitation_data, self.user)
+        result, error = self._run_validator(validate_farm_and_user_access)
         
         # Assert
         assert result is None
@@ -114,8 +146,8 @@ class TestCreateInvitationUseCase:
         assert isinstance(error, ORJSONResponse)
         assert error.status_code == 404
         
-    @patch('use_cases.create_invitation_use_case.get_farm_by_id')
-    @patch('use_cases.create_invitation_use_case.get_user_role_farm_state_by_name')
+    @patch('use_cases.create_invitation_use_case.get_farm_by_id_async')
+    @patch('use_cases.create_invitation_use_case.get_user_role_farm_state_by_name_async')
     def test_validate_farm_and_user_access_state_not_found(self, mock_get_state, mock_get_farm):
         """Test when active state is not found"""
         # Arrange
@@ -123,16 +155,16 @@ class TestCreateInvitationUseCase:
         mock_get_state.return_value = None
         
         # Act
-        result, error = _validate_farm_and_user_access(self.invitation_data, self.user)
+        result, error = self._run_validator(validate_farm_and_user_access)
         
         # Assert
         assert result is None
         assert error is not None
         assert error.status_code == 500
         
-    @patch('use_cases.create_invitation_use_case.get_farm_by_id')
-    @patch('use_cases.create_invitation_use_case.get_user_role_farm_state_by_name')
-    @patch('use_cases.create_invitation_use_case.get_user_role_farm')
+    @patch('use_cases.create_invitation_use_case.get_farm_by_id_async')
+    @patch('use_cases.create_invitation_use_case.get_user_role_farm_state_by_name_async')
+    @patch('use_cases.create_invitation_use_case.get_user_role_farm_async')
     def test_validate_farm_and_user_access_no_permission(self, mock_get_urf, mock_get_state, mock_get_farm):
         """Test when user has no access to farm"""
         # Arrange
@@ -141,7 +173,7 @@ class TestCreateInvitationUseCase:
         mock_get_urf.return_value = None
         
         # Act
-        result, error = _validate_farm_and_user_access(self.invitation_data, self.user)
+        result, error = self._run_validator(validate_farm_and_user_access)
         
         # Assert
         assert result is None
@@ -149,8 +181,8 @@ class TestCreateInvitationUseCase:
         assert error.status_code == 403
 
     # Tests for _validate_role_permissions function
-    @patch('use_cases.create_invitation_use_case.get_role_name_by_id')
-    @patch('use_cases.create_invitation_use_case.get_role_permissions_for_user_role')
+    @patch('use_cases.create_invitation_use_case.get_role_name_by_id_async')
+    @patch('use_cases.create_invitation_use_case.get_role_permissions_for_user_role_async')
     def test_validate_role_permissions_admin_success(self, mock_get_permissions, mock_get_role):
         """Test successful admin role permission validation"""
         # Arrange
@@ -158,14 +190,14 @@ class TestCreateInvitationUseCase:
         mock_get_permissions.return_value = ["add_administrator_farm", "other_permission"]
         
         # Act
-        result, error = _validate_role_permissions(self.invitation_data, self.urf)
+        result, error = self._run_validator(_validate_role_permissions)
         
         # Assert
         assert error is None
         assert result == ROLE_ADMIN_FARM
         
-    @patch('use_cases.create_invitation_use_case.get_role_name_by_id')
-    @patch('use_cases.create_invitation_use_case.get_role_permissions_for_user_role')
+    @patch('use_cases.create_invitation_use_case.get_role_name_by_id_async')
+    @patch('use_cases.create_invitation_use_case.get_role_permissions_for_user_role_async')
     def test_validate_role_permissions_operator_success(self, mock_get_permissions, mock_get_role):
         """Test successful operator role permission validation"""
         # Arrange
@@ -173,28 +205,28 @@ class TestCreateInvitationUseCase:
         mock_get_permissions.return_value = ["add_operator_farm", "other_permission"]
         
         # Act
-        result, error = _validate_role_permissions(self.invitation_data, self.urf)
+        result, error = self._run_validator(_validate_role_permissions)
         
         # Assert
         assert error is None
         assert result == ROLE_OPERATOR_FARM
         
-    @patch('use_cases.create_invitation_use_case.get_role_name_by_id')
+    @patch('use_cases.create_invitation_use_case.get_role_name_by_id_async')
     def test_validate_role_permissions_invalid_role(self, mock_get_role):
         """Test invalid role scenario"""
         # Arrange
         mock_get_role.return_value = None
         
         # Act
-        result, error = _validate_role_permissions(self.invitation_data, self.urf)
+        result, error = self._run_validator(_validate_role_permissions)
         
         # Assert
         assert result is None
         assert error is not None
         assert error.status_code == 400
         
-    @patch('use_cases.create_invitation_use_case.get_role_name_by_id')
-    @patch('use_cases.create_invitation_use_case.get_role_permissions_for_user_role')
+    @patch('use_cases.create_invitation_use_case.get_role_name_by_id_async')
+    @patch('use_cases.create_invitation_use_case.get_role_permissions_for_user_role_async')
     def test_validate_role_permissions_no_admin_permission(self, mock_get_permissions, mock_get_role):
         """Test when user lacks admin permission"""
         # Arrange
@@ -202,15 +234,15 @@ class TestCreateInvitationUseCase:
         mock_get_permissions.return_value = ["other_permission"]
         
         # Act
-        result, error = _validate_role_permissions(self.invitation_data, self.urf)
+        result, error = self._run_validator(_validate_role_permissions)
         
         # Assert
         assert result is None
         assert error is not None
         assert error.status_code == 403
         
-    @patch('use_cases.create_invitation_use_case.get_role_name_by_id')
-    @patch('use_cases.create_invitation_use_case.get_role_permissions_for_user_role')
+    @patch('use_cases.create_invitation_use_case.get_role_name_by_id_async')
+    @patch('use_cases.create_invitation_use_case.get_role_permissions_for_user_role_async')
     def test_validate_role_permissions_no_operator_permission(self, mock_get_permissions, mock_get_role):
         """Test when user lacks operator permission"""
         # Arrange
@@ -218,15 +250,15 @@ class TestCreateInvitationUseCase:
         mock_get_permissions.return_value = ["other_permission"]
         
         # Act
-        result, error = _validate_role_permissions(self.invitation_data, self.urf)
+        result, error = self._run_validator(_validate_role_permissions)
         
         # Assert
         assert result is None
         assert error is not None
         assert error.status_code == 403
         
-    @patch('use_cases.create_invitation_use_case.get_role_name_by_id')
-    @patch('use_cases.create_invitation_use_case.get_role_permissions_for_user_role')
+    @patch('use_cases.create_invitation_use_case.get_role_name_by_id_async')
+    @patch('use_cases.create_invitation_use_case.get_role_permissions_for_user_role_async')
     def test_validate_role_permissions_invalid_role_type(self, mock_get_permissions, mock_get_role):
         """Test when role is not admin or operator"""
         # Arrange
@@ -234,7 +266,7 @@ class TestCreateInvitationUseCase:
         mock_get_permissions.return_value = ["some_permission"]
         
         # Act
-        result, error = _validate_role_permissions(self.invitation_data, self.urf)
+        result, error = self._run_validator(_validate_role_permissions)
         
         # Assert
         assert result is None
@@ -242,8 +274,8 @@ class TestCreateInvitationUseCase:
         assert error.status_code == 403
 
     # Tests for _validate_invited_user function
-    @patch('use_cases.create_invitation_use_case.user_verification_by_email')
-    @patch('use_cases.create_invitation_use_case.get_user_role_farm')
+    @patch('use_cases.create_invitation_use_case.user_verification_by_email_async')
+    @patch('use_cases.create_invitation_use_case.get_user_role_farm_async')
     def test_validate_invited_user_success(self, mock_get_urf, mock_verify_user):
         """Test successful invited user validation"""
         # Arrange
@@ -251,28 +283,28 @@ class TestCreateInvitationUseCase:
         mock_get_urf.return_value = None  # User not associated with farm
         
         # Act
-        result, error = _validate_invited_user(self.invitation_data, 1)
+        result, error = self._run_validator(_validate_invited_user, 1)
         
         # Assert
         assert error is None
         assert result == self.invited_user
         
-    @patch('use_cases.create_invitation_use_case.user_verification_by_email')
+    @patch('use_cases.create_invitation_use_case.user_verification_by_email_async')
     def test_validate_invited_user_not_found(self, mock_verify_user):
         """Test when invited user is not found"""
         # Arrange
         mock_verify_user.return_value = None
         
         # Act
-        result, error = _validate_invited_user(self.invitation_data, 1)
+        result, error = self._run_validator(_validate_invited_user, 1)
         
         # Assert
         assert result is None
         assert error is not None
         assert error.status_code == 404
         
-    @patch('use_cases.create_invitation_use_case.user_verification_by_email')
-    @patch('use_cases.create_invitation_use_case.get_user_role_farm')
+    @patch('use_cases.create_invitation_use_case.user_verification_by_email_async')
+    @patch('use_cases.create_invitation_use_case.get_user_role_farm_async')
     def test_validate_invited_user_already_associated(self, mock_get_urf, mock_verify_user):
         """Test when user is already associated with farm"""
         # Arrange
@@ -282,7 +314,7 @@ class TestCreateInvitationUseCase:
         mock_get_urf.return_value = mock_urf
         
         # Act
-        result, error = _validate_invited_user(self.invitation_data, 1)
+        result, error = self._run_validator(_validate_invited_user, 1)
         
         # Assert
         assert result is None
@@ -290,139 +322,119 @@ class TestCreateInvitationUseCase:
         assert error.status_code == 400
 
     # Tests for _handle_invitation_creation_or_update function
-    @patch('use_cases.create_invitation_use_case.delete_notifications_by_invitation_id')
-    @patch('use_cases.create_invitation_use_case.datetime')
-    def test_handle_invitation_update_existing(self, mock_datetime, mock_delete_notifications):
+    @patch('use_cases.create_invitation_use_case.notify_outbox')
+    @patch('use_cases.create_invitation_use_case.enqueue_notification')
+    def test_handle_invitation_update_existing(self, mock_enqueue, mock_notify):
         """Test updating existing invitation"""
         # Arrange
-        mock_now = datetime(2023, 1, 1, 12, 0, 0)
-        mock_datetime.now.return_value = mock_now
-        
-        existing_invitation = Mock()
-        existing_invitation.invitation_id = 1
-        self.db.query().filter().first.return_value = existing_invitation
+        upserted = Mock(invitation_id=1, inserted=False)
+        self.db.execute.return_value.one.return_value = upserted
         
         # Act
-        result = _handle_invitation_creation_or_update(
-            self.invitation_data, self.user, self.invited_user, self.db
-        )
+        result = asyncio.run(_handle_invitation_creation_or_update(
+            self.invitation_data, self.user, self.invited_user, self.db, ROLE_ADMIN_FARM, self.farm
+        ))
         
         # Assert
-        assert result == existing_invitation
-        assert existing_invitation.invitation_date == mock_now
-        assert existing_invitation.suggested_role_id == self.invitation_data.suggested_role_id
-        assert existing_invitation.inviter_user_id == self.user.user_id
+        assert result == upserted
+        self.db.execute.assert_called_once()
         self.db.commit.assert_called_once()
-        self.db.refresh.assert_called_once_with(existing_invitation)
-        mock_delete_notifications.assert_called_once_with(existing_invitation.invitation_id)
-        
-    @patch('use_cases.create_invitation_use_case.datetime')
-    def test_handle_invitation_create_new(self, mock_datetime):
+        self.db.query.assert_not_called()
+        self.db.refresh.assert_not_called()
+        mock_enqueue.assert_called_once()
+        assert mock_enqueue.call_args.kwargs["invitation_id"] == 1
+        assert mock_enqueue.call_args.kwargs["replace_existing"] is True
+        mock_notify.assert_called_once()
+        
+    @patch('use_cases.create_invitation_use_case.notify_outbox')
+    @patch('use_cases.create_invitation_use_case.enqueue_notification')
+    def test_handle_invitation_create_new(self, mock_enqueue, mock_notify):
         """Test creating new invitation"""
         # Arrange
-        mock_now = datetime(2023, 1, 1, 12, 0, 0)
-        mock_datetime.now.return_value = mock_now
-        
-        self.db.query().filter().first.return_value = None
-        new_invitation = Mock()
-        new_invitation.invitation_id = 1
+        self.db.execute.return_value.one.return_value = Mock(invitation_id=7, inserted=True)
         
         # Act
-        result = _handle_invitation_creation_or_update(
-            self.invitation_data, self.user, self.invited_user, self.db
-        )
+        result = asyncio.run(_handle_invitation_creation_or_update(
+            self.invitation_data, self.user, self.invited_user, self.db, ROLE_ADMIN_FARM, self.farm
+        ))
         
         # Assert
-        assert result is not None
-        self.db.add.assert_called_once()
+        assert result.invitation_id == 7
+        self.db.execute.assert_called_once()
         self.db.commit.assert_called_once()
-        self.db.refresh.assert_called_once()
-        
-    @patch('use_cases.create_invitation_use_case.delete_notifications_by_invitation_id')
-    @patch('use_cases.create_invitation_use_case.datetime')
-    def test_handle_invitation_update_notification_error(self, mock_datetime, mock_delete_notifications):
-        """Test updating invitation when notification deletion fails"""
-        # Arrange
-        mock_now = datetime(2023, 1, 1, 12, 0, 0)
-        mock_datetime.now.return_value = mock_now
-        mock_delete_notifications.side_effect = Exception("Notification error")
-        
-        existing_invitation = Mock()
-        existing_invitation.invitation_id = 1
-        self.db.query().filter().first.return_value = existing_invitation
-        
-        # Act
-        result = _handle_invitation_creation_or_update(
-            self.invitation_data, self.user, self.invited_user, self.db
-        )
-        
-        # Assert - Should still return the invitation even if notification deletion fails
-        assert result == existing_invitation
+        self.db.add.assert_not_called()
+        assert mock_enqueue.call_args.kwargs["invitation_id"] == 7
+        assert mock_enqueue.call_args.kwargs["replace_existing"] is False
+        mock_notify.assert_called_once()
 
-    # Tests for _send_invitation_notification function
-    @patch('use_cases.create_invitation_use_case.get_notification_state_by_name')
-    @patch('use_cases.create_invitation_use_case.get_notification_type_by_name')
-    @patch('use_cases.create_invitation_use_case.send_notification')
-    def test_send_invitation_notification_success(self, mock_send, mock_get_type, mock_get_state):
-        """Test successful notification sending"""
+    @patch('use_cases.create_invitation_use_case.notify_outbox')
+    @patch('use_cases.create_invitation_use_case.enqueue_notification')
+    @patch('use_cases.create_invitation_use_case.run_in_threadpool')
+    def test_handle_invitation_with_async_session(self, mock_threadpool, mock_enqueue, mock_notify):
+        """An AsyncSession is awaited directly instead of going through the thread pool"""
         # Arrange
-        mock_get_state.return_value = {"notification_state_id": 1}
-        mock_get_type.return_value = {"notification_type_id": 1}
-        invitation = Mock()
-        invitation.invitation_id = 1
+        db = AsyncMock(spec=AsyncSession)
+        db.execute.return_value = Mock(one=Mock(return_value=Mock(invitation_id=5, inserted=False)))
         
         # Act
-        result = _send_invitation_notification(
-            invitation, self.invited_user, ROLE_ADMIN_FARM, self.farm
-        )
+        result = asyncio.run(_handle_invitation_creation_or_update(
+            self.invitation_data, self.user, self.invited_user, db, ROLE_ADMIN_FARM, self.farm
+        ))
         
         # Assert
-        assert result is None
-        mock_send.assert_called_once()
-        
-    @patch('use_cases.create_invitation_use_case.get_notification_state_by_name')
-    def test_send_invitation_notification_state_not_found(self, mock_get_state):
-        """Test when notification state is not found"""
-        # Arrange
-        mock_get_state.return_value = None
-        invitation = Mock()
-        invitation.invitation_id = 1
-        
-        # Act
-        result = _send_invitation_notification(
-            invitation, self.invited_user, ROLE_ADMIN_FARM, self.farm
-        )
-        
-        # Assert
-        assert result is not None
-        assert result.status_code == 400
+        assert result.invitation_id == 5
+        db.execute.assert_awaited_once()
+        db.commit.assert_awaited_once()
+        mock_threadpool.assert_not_called()
+        assert mock_enqueue.call_args.args == (db,)
+        assert mock_enqueue.call_args.kwargs["replace_existing"] is True
+        mock_notify.assert_called_once()
+
+    @patch('use_cases.create_invitation_use_case.datetime')
+    def test_upsert_invitation_statement(self, mock_datetime):
+        """The create-or-update is one INSERT ... ON CONFLICT DO UPDATE ... RETURNING"""
+        mock_now = datetime(2023, 1, 1, 12, 0, 0)
+        mock_datetime.now.return_value = mock_now
         
-    @patch('use_cases.create_invitation_use_case.get_notification_state_by_name')
-    @patch('use_cases.create_invitation_use_case.get_notification_type_by_name')
-    def test_send_invitation_notification_type_not_found(self, mock_get_type, mock_get_state):
-        """Test when notification type is not found"""
+        stmt = _upsert_invitation_statement(self.invitation_data, self.user, self.invited_user, ROLE_ADMIN_FARM, self.farm)
+        compiled = stmt.compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+        
+        assert sql.startswith("INSERT INTO invitations")
+        assert "ON CONFLICT (invited_user_id, farm_id) DO UPDATE SET" in sql
+        assert "RETURNING invitations.invitation_id, xmax = 0 AS inserted" in sql
+        assert compiled.params["invited_user_id"] == self.invited_user.user_id
+        assert compiled.params["inviter_user_id"] == self.user.user_id
+        assert compiled.params["invitation_date"] == mock_now
+        assert compiled.params["farm_name"] == self.farm.name
+        assert compiled.params["suggested_role_name"] == ROLE_ADMIN_FARM
+
+    @patch('use_cases.create_invitation_use_case.enqueue_notification')
+    def test_save_invitation_queues_notification_before_commit(self, mock_enqueue):
+        """The outbox row is written in the same transaction as the invitation"""
         # Arrange
-        mock_get_state.return_value = {"notification_state_id": 1}
-        mock_get_type.return_value = None
-        invitation = Mock()
-        invitation.invitation_id = 1
+        calls = []
+        mock_enqueue.side_effect = lambda *args, **kwargs: calls.append("enqueue")
+        self.db.commit.side_effect = lambda: calls.append("commit")
+        self.db.execute.return_value.one.return_value = Mock(invitation_id=1, inserted=True)
         
         # Act
-        result = _send_invitation_notification(
-            invitation, self.invited_user, ROLE_ADMIN_FARM, self.farm
-        )
+        _save_invitation(self.invitation_data, self.user, self.invited_user, self.db, ROLE_ADMIN_FARM, self.farm)
         
         # Assert
-        assert result is not None
-        assert result.status_code == 400
+        assert calls == ["enqueue", "commit"]
+        assert mock_enqueue.call_args.args == (self.db,)
+        kwargs = mock_enqueue.call_args.kwargs
+        assert kwargs["user_id"] == self.invited_user.user_id
+        assert kwargs["message"] == f"Has sido invitado como {ROLE_ADMIN_FARM} a la finca Test Farm"
+        assert kwargs["fcm_title"] == "Nueva Invitación"
 
     # Tests for main create_invitation function
-    @patch('use_cases.create_invitation_use_case._validate_farm_and_user_access')
+    @patch('use_cases.create_invitation_use_case.validate_farm_and_user_access')
     @patch('use_cases.create_invitation_use_case._validate_role_permissions')
     @patch('use_cases.create_invitation_use_case._validate_invited_user')
     @patch('use_cases.create_invitation_use_case._handle_invitation_creation_or_update')
-    @patch('use_cases.create_invitation_use_case._send_invitation_notification')
-    def test_create_invitation_success(self, mock_send_notif, mock_handle, mock_validate_user, 
+    def test_create_invitation_success(self, mock_handle, mock_validate_user, 
                                      mock_validate_role, mock_validate_farm):
         """Test successful invitation creation"""
         # Arrange
@@ -434,20 +446,20 @@ class TestCreateInvitationUseCase:
         new_invitation = Mock()
         new_invitation.invitation_id = 1
         mock_handle.return_value = new_invitation
-        mock_send_notif.return_value = None
         
         # Act
-        result = create_invitation(self.invitation_data, self.user, self.db)
+        result = asyncio.run(create_invitation(self.invitation_data, self.user, self.db))
         
         # Assert
         assert result.status_code == 201
-        mock_validate_farm.assert_called_once_with(self.invitation_data, self.user)
-        mock_validate_role.assert_called_once_with(self.invitation_data, self.urf)
-        mock_validate_user.assert_called_once_with(self.invitation_data, 1)
-        mock_handle.assert_called_once()
-        mock_send_notif.assert_called_once()
+        mock_validate_farm.assert_called_once()
+        mock_validate_role.assert_called_once()
+        mock_validate_user.assert_called_once_with(ANY, 1)
+        mock_handle.assert_called_once_with(
+            self.invitation_data, self.user, self.invited_user, self.db, ROLE_ADMIN_FARM, self.farm
+        )
         
-    @patch('use_cases.create_invitation_use_case._validate_farm_and_user_access')
+    @patch('use_cases.create_invitation_use_case.validate_farm_and_user_access')
     def test_create_invitation_farm_validation_error(self, mock_validate_farm):
         """Test when farm validation fails"""
         # Arrange
@@ -456,12 +468,12 @@ class TestCreateInvitationUseCase:
         mock_validate_farm.return_value = (None, error_response)
         
         # Act
-        result = create_invitation(self.invitation_data, self.user, self.db)
+        result = asyncio.run(create_invitation(self.invitation_data, self.user, self.db))
         
         # Assert
         assert result == error_response
         
-    @patch('use_cases.create_invitation_use_case._validate_farm_and_user_access')
+    @patch('use_cases.create_invitation_use_case.validate_farm_and_user_access')
     @patch('use_cases.create_invitation_use_case._validate_role_permissions')
     def test_create_invitation_role_validation_error(self, mock_validate_role, mock_validate_farm):
         """Test when role validation fails"""
@@ -474,12 +486,12 @@ class TestCreateInvitationUseCase:
         mock_validate_role.return_value = (None, error_response)
         
         # Act
-        result = create_invitation(self.invitation_data, self.user, self.db)
+        result = asyncio.run(create_invitation(self.invitation_data, self.user, self.db))
         
         # Assert
         assert result == error_response
         
-    @patch('use_cases.create_invitation_use_case._validate_farm_and_user_access')
+    @patch('use_cases.create_invitation_use_case.validate_farm_and_user_access')
     @patch('use_cases.create_invitation_use_case._validate_role_permissions')
     @patch('use_cases.create_invitation_use_case._validate_invited_user')
     def test_create_invitation_user_validation_error(self, mock_validate_user, mock_validate_role, mock_validate_farm):
@@ -494,12 +506,12 @@ class TestCreateInvitationUseCase:
         mock_validate_user.return_value = (None, error_response)
         
         # Act
-        result = create_invitation(self.invitation_data, self.user, self.db)
+        result = asyncio.run(create_invitation(self.invitation_data, self.user, self.db))
         
         # Assert
         assert result == error_response
         
-    @patch('use_cases.create_invitation_use_case._validate_farm_and_user_access')
+    @patch('use_cases.create_invitation_use_case.validate_farm_and_user_access')
     @patch('use_cases.create_invitation_use_case._validate_role_permissions')
     @patch('use_cases.create_invitation_use_case._validate_invited_user')
     @patch('use_cases.create_invitation_use_case._handle_invitation_creation_or_update')
@@ -514,36 +526,128 @@ class TestCreateInvitationUseCase:
         mock_handle.side_effect = Exception("Database error")
         
         # Act
-        result = create_invitation(self.invitation_data, self.user, self.db)
+        result = asyncio.run(create_invitation(self.invitation_data, self.user, self.db))
         
         # Assert
         assert result.status_code == 500
         self.db.rollback.assert_called_once()
         
-    @patch('use_cases.create_invitation_use_case._validate_farm_and_user_access')
-    @patch('use_cases.create_invitation_use_case._validate_role_permissions')
-    @patch('use_cases.create_invitation_use_case._validate_invited_user')
-    @patch('use_cases.create_invitation_use_case._handle_invitation_creation_or_update')
-    @patch('use_cases.create_invitation_use_case._send_invitation_notification')
-    def test_create_invitation_notification_error(self, mock_send_notif, mock_handle, mock_validate_user,
-                                                 mock_validate_role, mock_validate_farm):
-        """Test when notification sending fails"""
+    @patch('use_cases.create_invitation_use_case.notify_outbox')
+    @patch('adapters.notification_outbox.send_notification_async')
+    def test_create_invitation_does_not_wait_for_notification_service(self, mock_send, mock_notify):
+        """The API answers once the invitation and its outbox row are committed"""
         # Arrange
-        farm_data = {"farm": self.farm, "urf": self.urf, "urf_active_state_id": 1}
-        mock_validate_farm.return_value = (farm_data, None)
-        mock_validate_role.return_value = (ROLE_ADMIN_FARM, None)
-        mock_validate_user.return_value = (self.invited_user, None)
-        
-        new_invitation = Mock()
-        new_invitation.invitation_id = 1
-        mock_handle.return_value = new_invitation
-        
-        error_response = Mock()
-        error_response.status_code = 400
-        mock_send_notif.return_value = error_response
+        from adapters.resilience import DependencyUnavailableError
+        mock_send.side_effect = DependencyUnavailableError("notifications", "circuit breaker abierto")
+        self.db.execute.return_value.one.return_value = Mock(invitation_id=1, inserted=True)
         
         # Act
-        result = create_invitation(self.invitation_data, self.user, self.db)
+        result = asyncio.run(create_invitation(self.invitation_data, self.user, self.db))
         
         # Assert
-        assert result == error_response 
\ No newline at end of file
+        assert result.status_code == 201
+        mock_send.assert_not_called()
+        self.db.commit.assert_called_once()
+        mock_notify.assert_called_once()
+
+class TestCreateInvitationConcurrency:
+    """Tests for the concurrent lookups of create_invitation"""
+
+    def setup_method(self):
+        self.invitation_data = InvitationCreate(email="invited@test.com", suggested_role_id=2, farm_id=1)
+        self.user = UserResponse(user_id=1, name="Test User", email="inviter@test.com")
+        self.db = Mock(spec=Session)
+        self.inviter_urf = Mock(user_role_id=1, user_role_farm_state_id=1)
+
+    def _patch_lookups(self, farm=None, invited_user=None, delay=0.05):
+        """Patch every lookup with a slow fake that records call order"""
+        self.started = []
+
+        def slow(name, value):
+            async def lookup(*args):
+                self.started.append(name)
+                await asyncio.sleep(delay)
+                return value(*args) if callable(value) else value
+            return lookup
+
+        return [
+            patch('use_cases.create_invitation_use_case.get_farm_by_id_async', side_effect=slow("farm", farm)),
+            patch('use_cases.create_invitation_use_case.get_user_role_farm_state_by_name_async',
+                  side_effect=slow("state", {"user_role_farm_state_id": 1})),
+            patch('use_cases.create_invitation_use_case.get_user_role_farm_async',
+                  side_effect=slow("urf", lambda user_id, farm_id: self.inviter_urf if user_id == 1 else None)),
+            patch('use_cases.create_invitation_use_case.get_role_name_by_id_async',
+                  side_effect=slow("role_name", ROLE_OPERATOR_FARM)),
+            patch('use_cases.create_invitation_use_case.get_role_permissions_for_user_role_async',
+                  side_effect=slow("permissions", frozenset({"add_operator_farm"}))),
+            patch('use_cases.create_invitation_use_case.user_verification_by_email_async',
+                  side_effect=slow("invited_user", invited_user)),
+        ]
+
+    def _run(self, patches, coro_factory):
+        for p in patches:
+            p.start()
+        try:
+            return asyncio.run(coro_factory())
+        finally:
+            for p in patches:
+                p.stop()
+
+    @patch('use_cases.create_invitation_use_case._handle_invitation_creation_or_update')
+    def test_latency_follows_longest_chain(self, mock_handle):
+        """Seven lookups with two-step chains take about two lookup delays"""
+        mock_handle.return_value = Mock(invitation_id=1)
+        patches = self._patch_lookups(farm=Mock(name="farm"), invited_user=Mock(user_id=2), delay=0.1)
+
+        async def timed():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            result = await create_invitation(self.invitation_data, self.user, self.db)
+            return result, loop.time() - start
+
+        result, elapsed = self._run(patches, timed)
+
+        assert result.status_code == 201
+        assert elapsed < 0.5  # Sequential execution would take ~0.7s
+        assert set(self.started[:5]) == {"farm", "state", "urf", "role_name", "invited_user"}
+
+    def test_error_priority_is_preserved(self):
+        """A missing farm wins over a missing invited user even if it resolves later"""
+        patches = self._patch_lookups(farm=None, invited_user=None)
+
+        result = self._run(patches, lambda: create_invitation(self.invitation_data, self.user, self.db))
+
+        assert result.status_code == 404
+        assert "Finca no encontrada" in result.body.decode()
+
+    def test_failed_validation_cancels_pending_lookups(self):
+        """Lookups still running when a validation fails are cancelled"""
+        async def never_finishes(*args):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+
+        self.cancelled = False
+        patches = self._patch_lookups(farm=None, delay=0)
+        patches.append(patch('use_cases.create_invitation_use_case.user_verification_by_email_async',
+                             side_effect=never_finishes))
+
+        async def run():
+            return await asyncio.wait_for(create_invitation(self.invitation_data, self.user, self.db), 1)
+
+        result = self._run(patches, run)
+
+        assert result.status_code == 404
+        assert self.cancelled
+
+    @patch('use_cases.create_invitation_use_case._handle_invitation_creation_or_update')
+    def test_spent_deadline_is_not_turned_into_500(self, mock_handle):
+        """A spent request deadline propagates so the app can answer 504"""
+        from utils.deadline import DeadlineExceededError
+        mock_handle.side_effect = DeadlineExceededError("El tiempo de la solicitud se agotó")
+        patches = self._patch_lookups(farm=Mock(name="farm"), invited_user=Mock(user_id=2), delay=0)
+
+        with pytest.raises(DeadlineExceededError):
+            self._run(patches, lambda: create_invitation(self.invitation_data, self.user, self.db))
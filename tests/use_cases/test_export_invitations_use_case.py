@@ -0,0 +1,172 @@
+"""
+Test file for export_invitations_use_case.py
+
+Tests for the streamed NDJSON/CSV export of invitations.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+import orjson
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from fastapi.responses import StreamingResponse
+
+from use_cases.export_invitations_use_case import (
+    export_invitations,
+    export_statement,
+    stream_export,
+    stream_export_async,
+    EXPORT_CHUNK_SIZE
+)
+from domain.schemas import UserResponse
+
+
+class _Row(tuple):
+    """Stand-in for a Core row: a tuple with a _mapping."""
+    _fields = ("invitation_id", "invited_user_id", "inviter_user_id", "farm_id", "farm_name",
+               "suggested_role_id", "suggested_role_name", "invitation_date")
+
+    @property
+    def _mapping(self):
+        return dict(zip(self._fields, self))
+
+
+def _row(invitation_id, farm_name="Finca, Norte"):
+    return _Row((invitation_id, 2, 1, 10, farm_name, 3, "Operador de Campo",
+                 datetime(2025, 3, 1, 10, 30, tzinfo=timezone.utc)))
+
+
+def _session(partitions):
+    db = Mock(spec=Session)
+    db.execute.return_value.partitions.return_value = iter(partitions)
+    return db
+
+
+class TestExportStatement:
+    """Tests for the export query"""
+
+    def test_filters_and_server_side_cursor(self):
+        """Every filter narrows the query and rows are streamed in partitions"""
+        stmt = export_statement(10, 1, datetime(2025, 1, 1), datetime(2025, 2, 1))
+
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "invitations.farm_id = " in sql
+        assert "invitations.inviter_user_id = " in sql
+        assert "invitations.invitation_date >= " in sql
+        assert "invitations.invitation_date < " in sql
+        assert "ORDER BY invitations.invitation_id" in sql
+        assert stmt.get_execution_options()["yield_per"] == EXPORT_CHUNK_SIZE
+
+    def test_no_filters_exports_everything(self):
+        """Without filters there is no WHERE clause"""
+        assert "WHERE" not in str(export_statement().compile(dialect=postgresql.dialect()))
+
+
+class TestStreamExport:
+    """Tests for the chunked serialization"""
+
+    def test_ndjson_one_chunk_per_partition(self):
+        """Each partition becomes one chunk of orjson lines"""
+        db = _session([[_row(1), _row(2)], [_row(3)]])
+
+        chunks = [chunk for chunk in stream_export(export_statement(), "ndjson", db) if chunk]
+
+        assert len(chunks) == 2
+        lines = b"".join(chunks).splitlines()
+        assert [orjson.loads(line)["invitation_id"] for line in lines] == [1, 2, 3]
+        assert orjson.loads(lines[0])["invitation_date"] == "2025-03-01T10:30:00+00:00"
+
+    def test_csv_header_once_and_quoted_values(self):
+        """The CSV header goes with the first chunk only"""
+        db = _session([[_row(1)], [_row(2)]])
+
+        output = b"".join(stream_export(export_statement(), "csv", db)).decode()
+
+        lines = output.splitlines()
+        assert lines[0].startswith("invitation_id,invited_user_id,")
+        assert lines[1] == '1,2,1,10,"Finca, Norte",3,Operador de Campo,2025-03-01T10:30:00+00:00'
+        assert len(lines) == 3
+
+    def test_empty_csv_still_has_header(self):
+        """An export with no rows is a CSV with only its header"""
+        output = b"".join(stream_export(export_statement(), "csv", _session([])))
+
+        assert output == (",".join(_Row._fields) + "\n").encode()
+
+    def test_unknown_format_is_rejected(self):
+        """Only NDJSON and CSV are supported"""
+        with pytest.raises(ValueError):
+            list(stream_export(export_statement(), "xml", _session([])))
+
+    def test_async_session_streams(self):
+        """An AsyncSession reads through db.stream()"""
+        async def partitions():
+            yield [_row(1)]
+
+        db = AsyncMock(spec=AsyncSession)
+        db.stream.return_value = Mock(partitions=Mock(return_value=partitions()))
+
+        async def collect():
+            return b"".join([chunk async for chunk in stream_export_async(export_statement(), "ndjson", db)])
+
+        assert orjson.loads(asyncio.run(collect()))["invitation_id"] == 1
+
+
+class TestExportInvitations:
+    """Tests for the export endpoint use case"""
+
+    def setup_method(self):
+        self.user = UserResponse(user_id=1, name="Admin", email="admin@test.com")
+
+    @patch('use_cases.export_invitations_use_case._validate_farm_listing_access', new_callable=AsyncMock)
+    def test_stream_opens_its_own_session(self, mock_access):
+        """The response body reads through a session the stream opens and closes"""
+        mock_access.return_value = None
+        db = _session([[_row(1)]])
+        factory = MagicMock(spec=sessionmaker)
+        factory.return_value.__enter__.return_value = db
+
+        response = asyncio.run(export_invitations(10, self.user, "csv", factory))
+
+        assert isinstance(response, StreamingResponse)
+        assert response.media_type.startswith("text/csv")
+        factory.assert_not_called()
+
+        async def body():
+            return b"".join([chunk async for chunk in response.body_iterator])
+
+        assert b'"Finca, Norte"' in asyncio.run(body())
+        factory.return_value.__exit__.assert_called_once()
+
+    @patch('use_cases.export_invitations_use_case._validate_farm_listing_access', new_callable=AsyncMock)
+    def test_async_factory_streams_with_async_session(self, mock_access):
+        """With DB_ASYNC_ENABLED the stream uses an AsyncSession"""
+        mock_access.return_value = None
+
+        async def partitions():
+            yield [_row(1)]
+
+        db = AsyncMock(spec=AsyncSession)
+        db.stream.return_value = Mock(partitions=Mock(return_value=partitions()))
+        factory = MagicMock(spec=async_sessionmaker)
+        factory.return_value.__aenter__.return_value = db
+
+        async def run():
+            response = await export_invitations(10, self.user, "ndjson", factory)
+            return b"".join([chunk async for chunk in response.body_iterator])
+
+        assert orjson.loads(asyncio.run(run()))["farm_id"] == 10
+
+    @patch('use_cases.export_invitations_use_case._validate_farm_listing_access', new_callable=AsyncMock)
+    def test_access_denied_does_not_stream(self, mock_access):
+        """Without farm listing access the error response is returned"""
+        mock_access.return_value = Mock(status_code=403)
+        factory = MagicMock(spec=sessionmaker)
+
+        response = asyncio.run(export_invitations(10, self.user, "ndjson", factory))
+
+        assert response.status_code == 403
+        factory.assert_not_called()
@@ -0,0 +1,146 @@
+"""
+Test file for list_invitations_use_case.py
+
+Tests for the keyset-paginated invitation listings.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, Mock, patch
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Invitations
+from use_cases.list_invitations_use_case import list_received_invitations, list_farm_invitations, _page_statement
+from utils.pagination import decode_cursor, encode_cursor
+from domain.schemas import UserResponse
+
+
+def _row(invitation_id, invitation_date):
+    values = {
+        "invitation_id": invitation_id,
+        "invited_user_id": 2,
+        "inviter_user_id": 1,
+        "farm_id": 10,
+        "farm_name": "Finca",
+        "suggested_role_id": 3,
+        "suggested_role_name": "Operador de Campo",
+        "invitation_date": invitation_date,
+    }
+    return Mock(_mapping=values, **values)
+
+
+class TestListReceivedInvitations:
+    """Tests for GET /invitations/received"""
+
+    def setup_method(self):
+        self.user = UserResponse(user_id=2, name="Invited User", email="invited@test.com")
+        self.db = Mock(spec=Session)
+        self.dates = [datetime(2025, 3, day, tzinfo=timezone.utc) for day in (5, 4, 3)]
+
+    def test_first_page_has_next_cursor(self):
+        """One extra row means there is a next page, starting after the last row shown"""
+        self.db.execute.return_value.all.return_value = [_row(i, d) for i, d in zip((7, 6, 5), self.dates)]
+
+        response = asyncio.run(list_received_invitations(self.user, None, 2, self.db))
+
+        body = json.loads(response.body)
+        assert response.status_code == 200
+        assert [inv["invitation_id"] for inv in body["data"]["invitations"]] == [7, 6]
+        assert decode_cursor(body["data"]["next_cursor"]) == (self.dates[1], 6)
+        self.db.rollback.assert_called_once()
+
+    def test_last_page_has_no_cursor(self):
+        """When no extra row comes back the listing is over"""
+        self.db.execute.return_value.all.return_value = [_row(5, self.dates[2])]
+
+        response = asyncio.run(list_received_invitations(self.user, None, 2, self.db))
+
+        assert json.loads(response.body)["data"]["next_cursor"] is None
+
+    def test_invalid_cursor_returns_400_without_querying(self):
+        """A tampered cursor is a client error"""
+        response = asyncio.run(list_received_invitations(self.user, "@@@", 2, self.db))
+
+        assert response.status_code == 400
+        self.db.execute.assert_not_called()
+
+    def test_async_session(self):
+        """An AsyncSession runs the same page query"""
+        db = AsyncMock(spec=AsyncSession)
+        db.execute.return_value = Mock(all=Mock(return_value=[_row(5, self.dates[2])]))
+
+        response = asyncio.run(list_received_invitations(self.user, None, 2, db))
+
+        assert response.status_code == 200
+        db.execute.assert_awaited_once()
+        db.rollback.assert_awaited_once()
+
+    def test_page_statement_follows_the_index(self):
+        """The page is a range on (invitation_date DESC, invitation_id) with LIMIT n + 1"""
+        cursor = encode_cursor(self.dates[0], 7)
+
+        stmt = _page_statement(Invitations.invited_user_id == 2, cursor, 20)
+
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "invitations.invited_user_id = " in sql
+        assert "invitations.invitation_date <= " in sql
+        assert "invitations.invitation_id > " in sql
+        assert "ORDER BY invitations.invitation_date DESC, invitations.invitation_id" in sql
+        assert stmt._limit == 21
+        assert "OFFSET" not in sql
+
+
+@patch('use_cases.list_invitations_use_case.get_role_permissions_for_user_role_async')
+@patch('use_cases.list_invitations_use_case.get_user_role_farm_async')
+@patch('use_cases.list_invitations_use_case.get_user_role_farm_state_by_name_async')
+@patch('use_cases.list_invitations_use_case.get_farm_by_id_async')
+class TestListFarmInvitations:
+    """Tests for GET /invitations/farm/{farm_id}"""
+
+    def setup_method(self):
+        self.user = UserResponse(user_id=1, name="Admin", email="admin@test.com")
+        self.db = Mock(spec=Session)
+        self.db.execute.return_value.all.return_value = [_row(5, datetime(2025, 3, 3, tzinfo=timezone.utc))]
+
+    def _grant(self, get_farm, get_state, get_urf, get_permissions, permissions):
+        get_farm.return_value = Mock(farm_id=10, name="Finca")
+        get_state.return_value = {"user_role_farm_state_id": 1}
+        get_urf.return_value = Mock(user_role_id=4, user_role_farm_state_id=1)
+        get_permissions.return_value = frozenset(permissions)
+
+    def test_member_who_can_invite_lists_the_farm(self, get_farm, get_state, get_urf, get_permissions):
+        """An active member with an invite permission gets the farm's page"""
+        self._grant(get_farm, get_state, get_urf, get_permissions, {"add_operator_farm"})
+
+        response = asyncio.run(list_farm_invitations(10, self.user, None, 20, self.db))
+
+        assert response.status_code == 200
+        assert json.loads(response.body)["data"]["invitations"][0]["farm_id"] == 10
+        sql = str(self.db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        assert "invitations.farm_id = " in sql
+        get_urf.assert_awaited_once_with(1, 10)
+
+    def test_member_without_invite_permission_is_forbidden(self, get_farm, get_state, get_urf, get_permissions):
+        """Members who cannot invite cannot see the farm's invitations"""
+        self._grant(get_farm, get_state, get_urf, get_permissions, {"read_farm"})
+
+        response = asyncio.run(list_farm_invitations(10, self.user, None, 20, self.db))
+
+        assert response.status_code == 403
+        self.db.execute.assert_not_called()
+
+    def test_access_check_is_the_create_invitation_one(self, get_farm, get_state, get_urf, get_permissions):
+        """Unknown farm and inactive membership answer like create-invitation"""
+        self._grant(get_farm, get_state, get_urf, get_permissions, {"add_operator_farm"})
+        get_farm.return_value = None
+
+        assert asyncio.run(list_farm_invitations(10, self.user, None, 20, self.db)).status_code == 404
+
+        self._grant(get_farm, get_state, get_urf, get_permissions, {"add_operator_farm"})
+        get_urf.return_value = Mock(user_role_id=4, user_role_farm_state_id=2)
+
+        assert asyncio.run(list_farm_invitations(10, self.user, None, 20, self.db)).status_code == 403
+        self.db.execute.assert_not_called()
@@ -5,22 +5,32 @@ This file contains unit tests for the respond invitation use case.
 Tests cover all functions and edge cases with proper mocking.
 """
 
-from unittest.mock import Mock, patch
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 # Import the functions to test
 from use_cases.respond_invitation_use_case import (
     respond_invitation,
-    _validate_invitation,
+    _read_invitation,
+    _read_invitation_async,
+    _commit_response,
+    _commit_response_async,
     _delete_invitation_notifications,
     _create_user_role_farm_association,
-    _send_response_notification
+    _close_invitation
 )
 from models.models import Invitations
+from adapters.resilience import DependencyUnavailableError
 from utils.constants import (
     STATE_ACTIVE,
-    NOTIFICATION_TYPE_ACCEPTED
+    NOTIFICATION_STATE_RESPONDED,
+    NOTIFICATION_TYPE_ACCEPTED,
+    NOTIFICATION_TYPE_REJECTED
 )
 
 
@@ -42,90 +52,140 @@ class TestRespondInvitationUseCase:
         self.sample_invitation.farm_id = 10
         self.sample_invitation.suggested_role_id = 3
         self.sample_invitation.invitation_date = datetime.now()
+        self.sample_invitation.farm_name = "Test Farm"
+        self.sample_invitation.suggested_role_name = "Operador de Campo"
     
     def teardown_method(self):
         """Teardown method called after each test"""
         pass
 
-    # Tests for _validate_invitation function
-    def test_validate_invitation_success(self):
-        """Test successful invitation validation"""
-        # Mock database query
-        mock_query = self.mock_db.query.return_value
-        mock_filter = mock_query.filter.return_value
-        mock_filter.first.return_value = self.sample_invitation
+    # Tests for _read_invitation function
+    def test_read_invitation_success(self):
+        """Test the invitation is read, not deleted, and the transaction ends before returning"""
+        self.mock_db.execute.return_value.one_or_none.return_value = self.sample_invitation
         
-        invitation, error = _validate_invitation(1, self.mock_user, self.mock_db)
+        invitation, error = _read_invitation(1, self.mock_user, self.mock_db)
         
         assert invitation == self.sample_invitation
         assert error is None
-        self.mock_db.query.assert_called_once_with(Invitations)
+        sql = str(self.mock_db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        assert sql.startswith("SELECT")
+        self.mock_db.rollback.assert_called_once()
+        self.mock_db.commit.assert_not_called()
 
-    def test_validate_invitation_not_found(self):
-        """Test invitation validation when invitation doesn't exist"""
-        # Mock database query to return None
-        mock_query = self.mock_db.query.return_value
-        mock_filter = mock_query.filter.return_value
-        mock_filter.first.return_value = None
+    def test_read_invitation_not_found(self):
+        """Test reading when the invitation doesn't exist"""
+        self.mock_db.execute.return_value.one_or_none.return_value = None
         
-        invitation, error = _validate_invitation(1, self.mock_user, self.mock_db)
+        invitation, error = _read_invitation(1, self.mock_user, self.mock_db)
         
         assert invitation is None
-        assert error is not None
         assert error.status_code == 404
+        self.mock_db.rollback.assert_called_once()
 
-    def test_validate_invitation_permission_denied(self):
-        """Test invitation validation when user doesn't have permission"""
-        # Set different user ID for permission test
+    def test_read_invitation_permission_denied(self):
+        """Test reading an invitation sent to another user"""
         self.sample_invitation.invited_user_id = 999
+        self.mock_db.execute.return_value.one_or_none.return_value = self.sample_invitation
         
-        mock_query = self.mock_db.query.return_value
-        mock_filter = mock_query.filter.return_value
-        mock_filter.first.return_value = self.sample_invitation
-        
-        invitation, error = _validate_invitation(1, self.mock_user, self.mock_db)
+        invitation, error = _read_invitation(1, self.mock_user, self.mock_db)
         
         assert invitation is None
-        assert error is not None
         assert error.status_code == 403
 
+    def test_read_invitation_async_session(self):
+        """Test an AsyncSession reads the invitation with the same statement"""
+        db = AsyncMock(spec=AsyncSession)
+        db.execute.return_value = Mock(one_or_none=Mock(return_value=self.sample_invitation))
+        
+        invitation, error = asyncio.run(_read_invitation_async(1, self.mock_user, db))
+        
+        assert invitation == self.sample_invitation
+        assert error is None
+        db.rollback.assert_awaited_once()
+
+    # Tests for _commit_response function
+    @patch('use_cases.respond_invitation_use_case.enqueue_notification')
+    def test_commit_response_deletes_invitation_with_notification(self, mock_enqueue):
+        """Test the conditional DELETE ... RETURNING and the outbox row share one commit"""
+        calls = []
+        self.mock_db.execute.side_effect = lambda stmt: calls.append(
+            str(stmt.compile(dialect=postgresql.dialect()))) or Mock(
+            one_or_none=Mock(return_value=self.sample_invitation))
+        mock_enqueue.side_effect = lambda *args, **kwargs: calls.append("enqueue")
+        self.mock_db.commit.side_effect = lambda: calls.append("commit")
+        
+        assert _commit_response(1, 1, {"message": "hola"}, self.mock_db) is True
+        
+        claim, outbox, enqueue, commit = calls
+        assert claim.startswith("DELETE FROM invitations")
+        assert "invitations.invited_user_id = " in claim
+        assert "RETURNING" in claim
+        assert outbox.startswith("DELETE FROM notification_outbox")
+        assert "notification_outbox.status = " in outbox
+        assert "(notification_outbox.payload ->> " in outbox
+        assert (enqueue, commit) == ("enqueue", "commit")
+
+    @patch('use_cases.respond_invitation_use_case.enqueue_notification')
+    def test_commit_response_already_answered(self, mock_enqueue):
+        """Test nothing is queued when a concurrent response deleted the invitation first"""
+        self.mock_db.execute.return_value.one_or_none.return_value = None
+        
+        assert _commit_response(1, 1, {"message": "hola"}, self.mock_db) is False
+        
+        mock_enqueue.assert_not_called()
+        self.mock_db.rollback.assert_called_once()
+        self.mock_db.commit.assert_not_called()
+
+    @patch('use_cases.respond_invitation_use_case.enqueue_notification')
+    def test_commit_response_async_session(self, mock_enqueue):
+        """Test an AsyncSession commits the deletion and the notification together"""
+        db = AsyncMock(spec=AsyncSession)
+        db.execute.return_value = Mock(one_or_none=Mock(return_value=self.sample_invitation))
+        
+        assert asyncio.run(_commit_response_async(1, 1, {"message": "hola"}, db)) is True
+        
+        mock_enqueue.assert_called_once_with(db, message="hola")
+        assert db.execute.await_count == 2
+        db.commit.assert_awaited_once()
+
     # Tests for _delete_invitation_notifications function
-    @patch('use_cases.respond_invitation_use_case.delete_notifications_by_invitation_id')
+    @patch('use_cases.respond_invitation_use_case.delete_notifications_by_invitation_id_async')
     def test_delete_invitation_notifications_success(self, mock_delete_notifications):
         """Test successful deletion of invitation notifications"""
         mock_delete_notifications.return_value = {"deleted_count": 2}
         
         # Should not raise any exception
-        _delete_invitation_notifications(1)
+        asyncio.run(_delete_invitation_notifications(1))
         
         mock_delete_notifications.assert_called_once_with(1)
 
-    @patch('use_cases.respond_invitation_use_case.delete_notifications_by_invitation_id')
+    @patch('use_cases.respond_invitation_use_case.delete_notifications_by_invitation_id_async')
     def test_delete_invitation_notifications_no_notifications(self, mock_delete_notifications):
         """Test deletion when no notifications found"""
         mock_delete_notifications.return_value = {"deleted_count": 0}
         
         # Should not raise any exception
-        _delete_invitation_notifications(1)
+        asyncio.run(_delete_invitation_notifications(1))
         
         mock_delete_notifications.assert_called_once_with(1)
 
-    @patch('use_cases.respond_invitation_use_case.delete_notifications_by_invitation_id')
+    @patch('use_cases.respond_invitation_use_case.delete_notifications_by_invitation_id_async')
     @patch('use_cases.respond_invitation_use_case.logger')
     def test_delete_invitation_notifications_exception(self, mock_logger, mock_delete_notifications):
         """Test deletion when an exception occurs"""
         mock_delete_notifications.side_effect = Exception("Connection error")
         
         # Should not raise any exception but log the error
-        _delete_invitation_notifications(1)
+        asyncio.run(_delete_invitation_notifications(1))
         
         mock_logger.error.assert_called_once()
 
     # Tests for _create_user_role_farm_association function
-    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id')
-    @patch('use_cases.respond_invitation_use_case.create_user_role')
-    @patch('use_cases.respond_invitation_use_case.get_user_role_farm_state_by_name')
-    @patch('use_cases.respond_invitation_use_case.create_user_role_farm')
+    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id_async')
+    @patch('use_cases.respond_invitation_use_case.create_user_role_async')
+    @patch('use_cases.respond_invitation_use_case.get_user_role_farm_state_by_name_async')
+    @patch('use_cases.respond_invitation_use_case.create_user_role_farm_async')
     def test_create_user_role_farm_association_success(self, mock_create_urf, mock_get_state, 
                                                       mock_create_user_role, mock_get_role_name):
         """Test successful creation of user-role-farm association"""
@@ -135,7 +195,7 @@ class TestRespondInvitationUseCase:
         mock_get_state.return_value = {"user_role_farm_state_id": 1}
         mock_create_urf.return_value = {"status": "success"}
         
-        result = _create_user_role_farm_association(1, 3, 10)
+        result = asyncio.run(_create_user_role_farm_association(1, 3, 10))
         
         assert result is None  # Success returns None
         mock_get_role_name.assert_called_once_with(3)
@@ -143,46 +203,63 @@ class TestRespondInvitationUseCase:
         mock_get_state.assert_called_once_with(STATE_ACTIVE)
         mock_create_urf.assert_called_once_with(123, 10, 1)
 
-    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id')
+    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id_async')
+    @patch('use_cases.respond_invitation_use_case.create_user_role_async')
+    @patch('use_cases.respond_invitation_use_case.get_user_role_farm_state_by_name_async')
+    @patch('use_cases.respond_invitation_use_case.create_user_role_farm_async')
+    def test_create_user_role_farm_association_uses_role_name_snapshot(self, mock_create_urf, mock_get_state,
+                                                                      mock_create_user_role, mock_get_role_name):
+        """Test the invitation's role name snapshot skips the role lookup"""
+        mock_create_user_role.return_value = {"user_role_id": 123}
+        mock_get_state.return_value = {"user_role_farm_state_id": 1}
+        mock_create_urf.return_value = {"status": "success"}
+        
+        result = asyncio.run(_create_user_role_farm_association(1, 3, 10, "Operador de Campo"))
+        
+        assert result is None
+        mock_get_role_name.assert_not_called()
+        mock_create_user_role.assert_called_once_with(1, "Operador de Campo")
+
+    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id_async')
     def test_create_user_role_farm_association_invalid_role(self, mock_get_role_name):
         """Test creation with invalid role"""
         mock_get_role_name.return_value = None
         
-        result = _create_user_role_farm_association(1, 999, 10)
+        result = asyncio.run(_create_user_role_farm_association(1, 999, 10))
         
         assert result is not None
         assert result.status_code == 400
 
-    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id')
-    @patch('use_cases.respond_invitation_use_case.create_user_role')
+    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id_async')
+    @patch('use_cases.respond_invitation_use_case.create_user_role_async')
     def test_create_user_role_farm_association_user_role_creation_fails(self, mock_create_user_role, mock_get_role_name):
         """Test creation when user role creation fails"""
         mock_get_role_name.return_value = "Farm Manager"
         mock_create_user_role.return_value = {}  # No user_role_id
         
-        result = _create_user_role_farm_association(1, 3, 10)
+        result = asyncio.run(_create_user_role_farm_association(1, 3, 10))
         
         assert result is not None
         assert result.status_code == 500
 
-    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id')
-    @patch('use_cases.respond_invitation_use_case.create_user_role')
-    @patch('use_cases.respond_invitation_use_case.get_user_role_farm_state_by_name')
+    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id_async')
+    @patch('use_cases.respond_invitation_use_case.create_user_role_async')
+    @patch('use_cases.respond_invitation_use_case.get_user_role_farm_state_by_name_async')
     def test_create_user_role_farm_association_state_not_found(self, mock_get_state, mock_create_user_role, mock_get_role_name):
         """Test creation when active state is not found"""
         mock_get_role_name.return_value = "Farm Manager"
         mock_create_user_role.return_value = {"user_role_id": 123}
         mock_get_state.return_value = None
         
-        result = _create_user_role_farm_association(1, 3, 10)
+        result = asyncio.run(_create_user_role_farm_association(1, 3, 10))
         
         assert result is not None
         assert result.status_code == 500
 
-    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id')
-    @patch('use_cases.respond_invitation_use_case.create_user_role')
-    @patch('use_cases.respond_invitation_use_case.get_user_role_farm_state_by_name')
-    @patch('use_cases.respond_invitation_use_case.create_user_role_farm')
+    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id_async')
+    @patch('use_cases.respond_invitation_use_case.create_user_role_async')
+    @patch('use_cases.respond_invitation_use_case.get_user_role_farm_state_by_name_async')
+    @patch('use_cases.respond_invitation_use_case.create_user_role_farm_async')
     def test_create_user_role_farm_association_urf_creation_fails(self, mock_create_urf, mock_get_state, 
                                                                  mock_create_user_role, mock_get_role_name):
         """Test creation when UserRoleFarm creation fails"""
@@ -191,244 +268,296 @@ class TestRespondInvitationUseCase:
         mock_get_state.return_value = {"user_role_farm_state_id": 1}
         mock_create_urf.return_value = {"status": "error"}
         
-        result = _create_user_role_farm_association(1, 3, 10)
+        result = asyncio.run(_create_user_role_farm_association(1, 3, 10))
         
         assert result is not None
         assert result.status_code == 500
 
-    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id')
-    @patch('use_cases.respond_invitation_use_case.create_user_role')
+    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id_async')
+    @patch('use_cases.respond_invitation_use_case.create_user_role_async')
     def test_create_user_role_farm_association_exception(self, mock_create_user_role, mock_get_role_name):
         """Test creation when an exception occurs"""
         mock_get_role_name.return_value = "Farm Manager"
         mock_create_user_role.side_effect = Exception("Database error")
         
-        result = _create_user_role_farm_association(1, 3, 10)
+        result = asyncio.run(_create_user_role_farm_association(1, 3, 10))
         
         assert result is not None
         assert result.status_code == 500
 
-    # Tests for _send_response_notification function
-    @patch('use_cases.respond_invitation_use_case.get_notification_type_by_name')
-    @patch('use_cases.respond_invitation_use_case.get_notification_state_by_name')
-    @patch('use_cases.respond_invitation_use_case.get_farm_by_id')
-    @patch('use_cases.respond_invitation_use_case.send_notification')
-    def test_send_response_notification_success(self, mock_send_notification, mock_get_farm, 
-                                               mock_get_state, mock_get_type):
-        """Test successful notification sending"""
-        # Setup mocks
-        mock_farm = Mock()
-        mock_farm.name = "Test Farm"
-        mock_get_farm.return_value = mock_farm
-        mock_get_type.return_value = {"notification_type_id": 1}
-        mock_get_state.return_value = {"notification_state_id": 2}
+    # Tests for _close_invitation function
+    @patch('use_cases.respond_invitation_use_case.enqueue_notification')
+    def test_close_invitation_reject_notification(self, mock_enqueue):
+        """Test a rejection queues the "rechazado" notification with the farm name given"""
+        self.mock_db.execute.return_value.one_or_none.return_value = self.sample_invitation
         
-        result = _send_response_notification("Test User", 10, 2, 1, 
-                                           NOTIFICATION_TYPE_ACCEPTED, "aceptado")
+        closed = asyncio.run(_close_invitation(self.sample_invitation, "Snapshot Farm", self.mock_user, False, self.mock_db))
         
-        assert result is None  # Success returns None
-        mock_send_notification.assert_called_once()
-
-    @patch('use_cases.respond_invitation_use_case.get_notification_type_by_name')
-    @patch('use_cases.respond_invitation_use_case.get_notification_state_by_name')
-    @patch('use_cases.respond_invitation_use_case.get_farm_by_id')
-    @patch('use_cases.respond_invitation_use_case.send_notification')
-    def test_send_response_notification_farm_not_found(self, mock_send_notification, mock_get_farm, 
-                                                       mock_get_state, mock_get_type):
-        """Test notification sending when farm is not found"""
-        mock_get_farm.return_value = None
+        assert closed is True
+        call_args = mock_enqueue.call_args.kwargs
+        assert call_args['notification_type'] == NOTIFICATION_TYPE_REJECTED
+        assert call_args['message'] == "El usuario Test User ha rechazado tu invitación a la finca Snapshot Farm."
+        self.mock_db.commit.assert_called_once()
+
+    @patch('use_cases.respond_invitation_use_case.enqueue_notification')
+    def test_close_invitation_notification_payload(self, mock_enqueue):
+        """Test the queued notification names its type and state; ids are resolved on delivery"""
+        self.mock_db.execute.return_value.one_or_none.return_value = self.sample_invitation
         
-        result = _send_response_notification("Test User", 999, 2, 1, 
-                                           NOTIFICATION_TYPE_ACCEPTED, "aceptado")
+        asyncio.run(_close_invitation(self.sample_invitation, "Test Farm", self.mock_user, True, self.mock_db))
         
-        assert result is not None
-        assert result.status_code == 404
+        call_args = mock_enqueue.call_args[1]
+        assert call_args['user_id'] == 2
+        assert call_args['invitation_id'] == 1
+        assert call_args['notification_type'] == NOTIFICATION_TYPE_ACCEPTED
+        assert call_args['notification_state'] == NOTIFICATION_STATE_RESPONDED
+        assert call_args['message'] == "El usuario Test User ha aceptado tu invitación a la finca Test Farm."
+        assert call_args['fcm_title'] == "Invitación aceptado"
 
     # Tests for respond_invitation function
-    @patch('use_cases.respond_invitation_use_case._validate_invitation')
+    @patch('use_cases.respond_invitation_use_case.notify_outbox')
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
     @patch('use_cases.respond_invitation_use_case._delete_invitation_notifications')
     @patch('use_cases.respond_invitation_use_case._create_user_role_farm_association')
-    @patch('use_cases.respond_invitation_use_case._send_response_notification')
-    def test_respond_invitation_accept_success(self, mock_send_notification, mock_create_association,
-                                             mock_delete_notifications, mock_validate):
+    @patch('use_cases.respond_invitation_use_case._close_invitation', return_value=True)
+    def test_respond_invitation_accept_success(self, mock_close, mock_create_association,
+                                             mock_delete_notifications, mock_read, mock_notify):
         """Test successful invitation acceptance"""
-        # Setup mocks
-        mock_validate.return_value = (self.sample_invitation, None)
+        mock_read.return_value = (self.sample_invitation, None)
         mock_create_association.return_value = None
-        mock_send_notification.return_value = None
         
-        result = respond_invitation(1, "accept", self.mock_user, self.mock_db)
+        result = asyncio.run(respond_invitation(1, "accept", self.mock_user, self.mock_db))
         
         assert result.status_code == 200
-        mock_validate.assert_called_once_with(1, self.mock_user, self.mock_db)
+        mock_read.assert_called_once_with(1, self.mock_user, self.mock_db)
+        mock_create_association.assert_called_once_with(1, 3, 10, "Operador de Campo")
+        mock_close.assert_called_once_with(self.sample_invitation, "Test Farm", self.mock_user, True, self.mock_db)
+        mock_notify.assert_called_once()
         mock_delete_notifications.assert_called_once_with(1)
-        mock_create_association.assert_called_once_with(1, 3, 10)
-        self.mock_db.delete.assert_called_once_with(self.sample_invitation)
-        self.mock_db.commit.assert_called_once()
-        mock_send_notification.assert_called_once()
 
-    @patch('use_cases.respond_invitation_use_case._validate_invitation')
+    @patch('use_cases.respond_invitation_use_case.notify_outbox')
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
     @patch('use_cases.respond_invitation_use_case._delete_invitation_notifications')
-    @patch('use_cases.respond_invitation_use_case._send_response_notification')
-    def test_respond_invitation_reject_success(self, mock_send_notification, 
-                                             mock_delete_notifications, mock_validate):
+    @patch('use_cases.respond_invitation_use_case._create_user_role_farm_association')
+    @patch('use_cases.respond_invitation_use_case._close_invitation', return_value=True)
+    def test_respond_invitation_reject_success(self, mock_close, mock_create_association,
+                                             mock_delete_notifications, mock_read, mock_notify):
         """Test successful invitation rejection"""
-        # Setup mocks
-        mock_validate.return_value = (self.sample_invitation, None)
-        mock_send_notification.return_value = None
+        mock_read.return_value = (self.sample_invitation, None)
         
-        result = respond_invitation(1, "reject", self.mock_user, self.mock_db)
+        result = asyncio.run(respond_invitation(1, "reject", self.mock_user, self.mock_db))
         
         assert result.status_code == 200
-        mock_validate.assert_called_once_with(1, self.mock_user, self.mock_db)
+        mock_create_association.assert_not_called()
+        mock_close.assert_called_once_with(self.sample_invitation, "Test Farm", self.mock_user, False, self.mock_db)
         mock_delete_notifications.assert_called_once_with(1)
-        self.mock_db.delete.assert_called_once_with(self.sample_invitation)
-        self.mock_db.commit.assert_called_once()
-        mock_send_notification.assert_called_once()
 
-    @patch('use_cases.respond_invitation_use_case._validate_invitation')
-    def test_respond_invitation_validation_error(self, mock_validate):
-        """Test invitation response when validation fails"""
-        mock_error_response = Mock()
-        mock_error_response.status_code = 404
-        mock_validate.return_value = (None, mock_error_response)
+    @patch('use_cases.respond_invitation_use_case.notify_outbox')
+    @patch('use_cases.respond_invitation_use_case.enqueue_notification')
+    @patch('use_cases.respond_invitation_use_case._delete_invitation_notifications')
+    @patch('use_cases.respond_invitation_use_case.run_in_threadpool')
+    def test_respond_invitation_reject_with_async_session(self, mock_threadpool, mock_delete_notifications,
+                                                          mock_enqueue, mock_notify):
+        """Test an AsyncSession is awaited directly instead of going through the thread pool"""
+        db = AsyncMock(spec=AsyncSession)
+        db.execute.return_value = Mock(one_or_none=Mock(return_value=self.sample_invitation))
         
-        result = respond_invitation(1, "accept", self.mock_user, self.mock_db)
+        result = asyncio.run(respond_invitation(1, "reject", self.mock_user, db))
         
-        assert result == mock_error_response
-        mock_validate.assert_called_once_with(1, self.mock_user, self.mock_db)
-
-    @patch('use_cases.respond_invitation_use_case._validate_invitation')
-    @patch('use_cases.respond_invitation_use_case._delete_invitation_notifications')
+        assert result.status_code == 200
+        # One read, then the deletes committed with the notification
+        assert db.execute.await_count == 3
+        db.commit.assert_awaited_once()
+        mock_enqueue.assert_called_once()
+        mock_threadpool.assert_not_called()
+
+    @patch('use_cases.respond_invitation_use_case.notify_outbox')
+    @patch('use_cases.respond_invitation_use_case.enqueue_notification')
+    @patch('use_cases.respond_invitation_use_case.delete_notifications_by_invitation_id_async')
+    @patch('use_cases.respond_invitation_use_case.create_user_role_async')
+    @patch('use_cases.respond_invitation_use_case.get_user_role_farm_state_by_name_async')
+    @patch('use_cases.respond_invitation_use_case.create_user_role_farm_async')
+    def test_respond_invitation_deletes_only_after_association(self, mock_create_urf, mock_get_state,
+                                                              mock_create_user_role, mock_delete_remote,
+                                                              mock_enqueue, mock_notify):
+        """Test the invitation is read, the association created, and only then deleted with its notification"""
+        events = []
+        self.mock_db.execute.side_effect = lambda stmt: events.append(
+            f"delete {stmt.table.name}" if stmt.is_delete else "read") or Mock(one_or_none=Mock(return_value=self.sample_invitation))
+        self.mock_db.rollback.side_effect = lambda: events.append("rollback")
+        self.mock_db.commit.side_effect = lambda: events.append("commit")
+        mock_create_user_role.side_effect = lambda *args: events.append("association") or {"user_role_id": 123}
+        mock_get_state.side_effect = lambda *args: events.append("association") or {"user_role_farm_state_id": 1}
+        mock_create_urf.side_effect = lambda *args: events.append("association") or {"status": "success"}
+        mock_enqueue.side_effect = lambda *args, **kwargs: events.append("enqueue")
+        mock_delete_remote.side_effect = lambda *args: events.append("remote delete") or {"deleted_count": 1}
+        
+        result = asyncio.run(respond_invitation(1, "accept", self.mock_user, self.mock_db))
+        
+        assert result.status_code == 200
+        assert events == [
+            "read", "rollback",
+            "association", "association", "association",
+            "delete invitations", "delete notification_outbox", "enqueue", "commit",
+            "remote delete"
+        ]
+        mock_notify.assert_called_once()
+
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
     @patch('use_cases.respond_invitation_use_case._create_user_role_farm_association')
-    def test_respond_invitation_accept_association_error(self, mock_create_association,
-                                                        mock_delete_notifications, mock_validate):
-        """Test invitation acceptance when association creation fails"""
-        mock_validate.return_value = (self.sample_invitation, None)
+    @patch('use_cases.respond_invitation_use_case._close_invitation')
+    def test_respond_invitation_accept_association_error(self, mock_close, mock_create_association, mock_read):
+        """Test a failed association leaves the invitation in place and queues nothing"""
+        mock_read.return_value = (self.sample_invitation, None)
         mock_error_response = Mock()
         mock_error_response.status_code = 500
         mock_create_association.return_value = mock_error_response
         
-        result = respond_invitation(1, "accept", self.mock_user, self.mock_db)
+        result = asyncio.run(respond_invitation(1, "accept", self.mock_user, self.mock_db))
         
         assert result == mock_error_response
-        mock_create_association.assert_called_once()
+        mock_close.assert_not_called()
+        self.mock_db.commit.assert_not_called()
 
-    @patch('use_cases.respond_invitation_use_case._validate_invitation')
-    @patch('use_cases.respond_invitation_use_case._delete_invitation_notifications')
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
     @patch('use_cases.respond_invitation_use_case._create_user_role_farm_association')
-    @patch('use_cases.respond_invitation_use_case._send_response_notification')
-    def test_respond_invitation_accept_notification_error(self, mock_send_notification, mock_create_association,
-                                                         mock_delete_notifications, mock_validate):
-        """Test invitation acceptance when notification sending fails"""
-        mock_validate.return_value = (self.sample_invitation, None)
-        mock_create_association.return_value = None
-        mock_error_response = Mock()
-        mock_error_response.status_code = 500
-        mock_send_notification.return_value = mock_error_response
+    @patch('use_cases.respond_invitation_use_case._close_invitation')
+    def test_respond_invitation_dependency_error_deletes_nothing(self, mock_close, mock_create_association, mock_read):
+        """Test an unavailable dependency during accept propagates with the invitation untouched"""
+        mock_read.return_value = (self.sample_invitation, None)
+        mock_create_association.side_effect = DependencyUnavailableError("users", "circuit breaker abierto")
         
-        result = respond_invitation(1, "accept", self.mock_user, self.mock_db)
+        with pytest.raises(DependencyUnavailableError):
+            asyncio.run(respond_invitation(1, "accept", self.mock_user, self.mock_db))
         
-        assert result == mock_error_response
-        mock_send_notification.assert_called_once()
+        mock_close.assert_not_called()
 
-    @patch('use_cases.respond_invitation_use_case._validate_invitation')
+    @patch('use_cases.respond_invitation_use_case.notify_outbox')
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
     @patch('use_cases.respond_invitation_use_case._delete_invitation_notifications')
-    @patch('use_cases.respond_invitation_use_case._send_response_notification')
-    def test_respond_invitation_reject_notification_error(self, mock_send_notification,
-                                                         mock_delete_notifications, mock_validate):
-        """Test invitation rejection when notification sending fails"""
-        mock_validate.return_value = (self.sample_invitation, None)
+    @patch('use_cases.respond_invitation_use_case._create_user_role_farm_association', return_value=None)
+    @patch('use_cases.respond_invitation_use_case._close_invitation', return_value=False)
+    def test_respond_invitation_answered_concurrently(self, mock_close, mock_create_association,
+                                                      mock_delete_notifications, mock_read, mock_notify):
+        """Test a response that finds the invitation already deleted reports 404 and sends nothing"""
+        mock_read.return_value = (self.sample_invitation, None)
+        
+        result = asyncio.run(respond_invitation(1, "accept", self.mock_user, self.mock_db))
+        
+        assert result.status_code == 404
+        mock_notify.assert_not_called()
+        mock_delete_notifications.assert_not_called()
+
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
+    def test_respond_invitation_validation_error(self, mock_read):
+        """Test invitation response when validation fails"""
         mock_error_response = Mock()
-        mock_error_response.status_code = 500
-        mock_send_notification.return_value = mock_error_response
+        mock_error_response.status_code = 404
+        mock_read.return_value = (None, mock_error_response)
         
-        result = respond_invitation(1, "reject", self.mock_user, self.mock_db)
+        result = asyncio.run(respond_invitation(1, "accept", self.mock_user, self.mock_db))
         
         assert result == mock_error_response
-        mock_send_notification.assert_called_once()
+        mock_read.assert_called_once_with(1, self.mock_user, self.mock_db)
+
+    @patch('use_cases.respond_invitation_use_case.notify_outbox')
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
+    @patch('use_cases.respond_invitation_use_case._delete_invitation_notifications')
+    @patch('use_cases.respond_invitation_use_case._close_invitation', return_value=True)
+    @patch('use_cases.respond_invitation_use_case.get_farm_by_id_async')
+    def test_respond_invitation_legacy_row_resolves_farm_name(self, mock_get_farm, mock_close,
+                                                             mock_delete_notifications, mock_read, mock_notify):
+        """Test a row without farm name snapshot asks the farms service before deleting anything"""
+        legacy = Mock(invitation_id=1, farm_id=10, inviter_user_id=2, farm_name=None)
+        mock_read.return_value = (legacy, None)
+        mock_get_farm.return_value = Mock()
+        mock_get_farm.return_value.name = "Legacy Farm"
+        
+        result = asyncio.run(respond_invitation(1, "reject", self.mock_user, self.mock_db))
+        
+        assert result.status_code == 200
+        mock_close.assert_called_once_with(legacy, "Legacy Farm", self.mock_user, False, self.mock_db)
+
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
+    @patch('use_cases.respond_invitation_use_case._close_invitation')
+    @patch('use_cases.respond_invitation_use_case.get_farm_by_id_async')
+    def test_respond_invitation_legacy_row_farm_not_found(self, mock_get_farm, mock_close, mock_read):
+        """Test a 404 for a missing farm leaves the invitation in place"""
+        mock_read.return_value = (Mock(invitation_id=1, farm_id=999, farm_name=None), None)
+        mock_get_farm.return_value = None
+        
+        result = asyncio.run(respond_invitation(1, "accept", self.mock_user, self.mock_db))
+        
+        assert result.status_code == 404
+        self.mock_db.commit.assert_not_called()
+        mock_close.assert_not_called()
 
-    @patch('use_cases.respond_invitation_use_case._validate_invitation')
-    def test_respond_invitation_invalid_action(self, mock_validate):
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
+    def test_respond_invitation_invalid_action(self, mock_read):
         """Test invitation response with invalid action"""
         # Setup validation to fail first (which is what actually happens)
         mock_error_response = Mock()
         mock_error_response.status_code = 403
-        mock_validate.return_value = (None, mock_error_response)
+        mock_read.return_value = (None, mock_error_response)
         
-        result = respond_invitation(1, "invalid_action", self.mock_user, self.mock_db)
+        result = asyncio.run(respond_invitation(1, "invalid_action", self.mock_user, self.mock_db))
         
         assert result.status_code == 403
 
-    @patch('use_cases.respond_invitation_use_case._validate_invitation')
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
     @patch('use_cases.respond_invitation_use_case._delete_invitation_notifications')
-    def test_respond_invitation_truly_invalid_action(self, mock_delete_notifications, mock_validate):
-        """Test invitation response with invalid action when validation succeeds"""
-        # Setup validation to succeed
-        mock_validate.return_value = (self.sample_invitation, None)
+    @patch('use_cases.respond_invitation_use_case._close_invitation')
+    def test_respond_invitation_truly_invalid_action(self, mock_close, mock_delete_notifications, mock_read):
+        """Test an invalid action is rejected before any remote call or deletion"""
+        mock_read.return_value = (self.sample_invitation, None)
         
-        result = respond_invitation(1, "invalid_action", self.mock_user, self.mock_db)
+        result = asyncio.run(respond_invitation(1, "invalid_action", self.mock_user, self.mock_db))
         
         assert result.status_code == 400
+        mock_close.assert_not_called()
+        mock_delete_notifications.assert_not_called()
 
-    @patch('use_cases.respond_invitation_use_case._validate_invitation')
-    @patch('use_cases.respond_invitation_use_case._delete_invitation_notifications')
-    @patch('use_cases.respond_invitation_use_case._create_user_role_farm_association')
-    @patch('use_cases.respond_invitation_use_case._send_response_notification')
-    def test_respond_invitation_empty_action(self, mock_send_notification, mock_create_association,
-                                           mock_delete_notifications, mock_validate):
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
+    def test_respond_invitation_empty_action(self, mock_read):
         """Test invitation response with empty action"""
-        # Setup validation to fail first (which is what actually happens)
         mock_error_response = Mock()
         mock_error_response.status_code = 403
-        mock_validate.return_value = (None, mock_error_response)
+        mock_read.return_value = (None, mock_error_response)
         
-        result = respond_invitation(1, "", self.mock_user, self.mock_db)
+        result = asyncio.run(respond_invitation(1, "", self.mock_user, self.mock_db))
         assert result.status_code == 403
 
-    @patch('use_cases.respond_invitation_use_case._validate_invitation')
+    @patch('use_cases.respond_invitation_use_case.notify_outbox')
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
     @patch('use_cases.respond_invitation_use_case._delete_invitation_notifications')
-    @patch('use_cases.respond_invitation_use_case._create_user_role_farm_association')
-    @patch('use_cases.respond_invitation_use_case._send_response_notification')
-    def test_respond_invitation_case_insensitive_actions(self, mock_send_notification, mock_create_association,
-                                                        mock_delete_notifications, mock_validate):
+    @patch('use_cases.respond_invitation_use_case._create_user_role_farm_association', return_value=None)
+    @patch('use_cases.respond_invitation_use_case._close_invitation', return_value=True)
+    def test_respond_invitation_case_insensitive_actions(self, mock_close, mock_create_association,
+                                                        mock_delete_notifications, mock_read, mock_notify):
         """Test that actions are case insensitive"""
-        mock_validate.return_value = (self.sample_invitation, None)
-        mock_create_association.return_value = None
-        mock_send_notification.return_value = None
+        mock_read.return_value = (self.sample_invitation, None)
         
         # Test uppercase ACCEPT
-        result = respond_invitation(1, "ACCEPT", self.mock_user, self.mock_db)
+        result = asyncio.run(respond_invitation(1, "ACCEPT", self.mock_user, self.mock_db))
         assert result.status_code == 200
         
-        # Reset mocks
-        self.mock_db.reset_mock()
-        mock_validate.return_value = (self.sample_invitation, None)
-        mock_send_notification.return_value = None
-        
         # Test mixed case Reject
-        result = respond_invitation(1, "Reject", self.mock_user, self.mock_db)
+        result = asyncio.run(respond_invitation(1, "Reject", self.mock_user, self.mock_db))
         assert result.status_code == 200
 
     # Additional edge case tests
-    @patch('use_cases.respond_invitation_use_case._validate_invitation')
-    @patch('use_cases.respond_invitation_use_case._delete_invitation_notifications')
-    @patch('use_cases.respond_invitation_use_case._create_user_role_farm_association')
-    @patch('use_cases.respond_invitation_use_case._send_response_notification')
-    def test_respond_invitation_whitespace_action(self, mock_send_notification, mock_create_association,
-                                                 mock_delete_notifications, mock_validate):
+    @patch('use_cases.respond_invitation_use_case._read_invitation')
+    def test_respond_invitation_whitespace_action(self, mock_read):
         """Test invitation response with whitespace in action"""
-        mock_validate.return_value = (self.sample_invitation, None)
-        mock_create_association.return_value = None
-        mock_send_notification.return_value = None
+        mock_read.return_value = (self.sample_invitation, None)
         
         # Test action with whitespace
-        result = respond_invitation(1, "  accept  ", self.mock_user, self.mock_db)
+        result = asyncio.run(respond_invitation(1, "  accept  ", self.mock_user, self.mock_db))
         assert result.status_code == 400  # Should fail because of leading/trailing spaces
 
-    @patch('use_cases.respond_invitation_use_case.get_user_role_farm_state_by_name')
-    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id')
-    @patch('use_cases.respond_invitation_use_case.create_user_role')
+    @patch('use_cases.respond_invitation_use_case.get_user_role_farm_state_by_name_async')
+    @patch('use_cases.respond_invitation_use_case.get_role_name_by_id_async')
+    @patch('use_cases.respond_invitation_use_case.create_user_role_async')
     def test_create_user_role_farm_association_state_missing_id(self, mock_create_user_role, 
                                                                mock_get_role_name, mock_get_state):
         """Test creation when state is found but missing user_role_farm_state_id"""
@@ -436,30 +565,7 @@ class TestRespondInvitationUseCase:
         mock_create_user_role.return_value = {"user_role_id": 123}
         mock_get_state.return_value = {"name": "Activo"}  # Missing user_role_farm_state_id
         
-        result = _create_user_role_farm_association(1, 3, 10)
+        result = asyncio.run(_create_user_role_farm_association(1, 3, 10))
         
         assert result is not None
         assert result.status_code == 500
-
-    @patch('use_cases.respond_invitation_use_case.get_notification_type_by_name')
-    @patch('use_cases.respond_invitation_use_case.get_notification_state_by_name')
-    @patch('use_cases.respond_invitation_use_case.get_farm_by_id')
-    @patch('use_cases.respond_invitation_use_case.send_notification')
-    def test_send_response_notification_with_none_values(self, mock_send_notification, mock_get_farm, 
-                                                        mock_get_state, mock_get_type):
-        """Test notification sending when some services return None"""
-        # Setup mocks
-        mock_farm = Mock()
-        mock_farm.name = "Test Farm"
-        mock_get_farm.return_value = mock_farm
-        mock_get_type.return_value = None  # Service returns None
-        mock_get_state.return_value = None  # Service returns None
-        
-        result = _send_response_notification("Test User", 10, 2, 1, 
-                                           NOTIFICATION_TYPE_ACCEPTED, "aceptado")
-        
-        assert result is None  # Should still work
-        # Verify send_notification was called with None values
-        call_args = mock_send_notification.call_args[1]
-        assert call_args['notification_type_id'] is None
-        assert call_args['notification_state_id'] is None 
\ No newline at end of file
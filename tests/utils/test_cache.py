@@ -0,0 +1,226 @@
+"""
+Test file for utils/cache.py
+
+Tests for the stale-while-revalidate reference cache.
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import Mock, AsyncMock, patch
+import pytest
+from utils.cache import ReferenceCache, TTLCache, CATALOG_KEY, MISSING, clear_caches
+from utils.deadline import DeadlineExceededError, remaining, request_deadline
+
+
+class TestReferenceCache:
+    """Tests for the synchronous path"""
+
+    def test_loads_once_and_serves_from_cache(self):
+        """A fresh entry is served without calling the loader again"""
+        loader = Mock(return_value={"activo": 1})
+        cache = ReferenceCache("test", loader, ttl=60)
+
+        assert cache.get() == {"activo": 1}
+        assert cache.get() == {"activo": 1}
+        loader.assert_called_once_with(CATALOG_KEY)
+
+    def test_expired_entry_is_reloaded(self):
+        """An expired entry triggers a blocking reload"""
+        loader = Mock(side_effect=[{"v": 1}, {"v": 2}])
+        cache = ReferenceCache("test", loader, ttl=60)
+
+        with patch('utils.cache.time.monotonic', return_value=1000.0):
+            cache.get()
+        with patch('utils.cache.time.monotonic', return_value=1061.0):
+            assert cache.get() == {"v": 2}
+
+    def test_serves_last_good_copy_when_reload_fails(self):
+        """If the downstream fails after expiry the stale copy is returned"""
+        loader = Mock(side_effect=[{"v": 1}, Exception("down")])
+        cache = ReferenceCache("test", loader, ttl=60)
+
+        with patch('utils.cache.time.monotonic', return_value=1000.0):
+            cache.get()
+        with patch('utils.cache.time.monotonic', return_value=1100.0):
+            assert cache.get() == {"v": 1}
+
+    def test_first_load_failure_is_raised(self):
+        """Without a previous copy the loader error propagates"""
+        cache = ReferenceCache("test", Mock(side_effect=Exception("down")), ttl=60)
+
+        with pytest.raises(Exception, match="down"):
+            cache.get()
+
+    def test_none_is_not_cached(self):
+        """A None result is returned but not stored"""
+        loader = Mock(return_value=None)
+        cache = ReferenceCache("test", loader, ttl=60)
+
+        assert cache.get("x") is None
+        assert cache.get("x") is None
+        assert loader.call_count == 2
+
+    def test_refresh_ahead_serves_current_value(self):
+        """Past the refresh point the current value is served and a background refresh runs"""
+        refreshed = threading.Event()
+
+        def loader(key):
+            if loader.calls:
+                refreshed.set()
+                return {"v": 2}
+            loader.calls += 1
+            return {"v": 1}
+        loader.calls = 0
+        cache = ReferenceCache("test", loader, ttl=10, refresh_ahead=0.5)
+
+        cache.get()
+        cache._entries[CATALOG_KEY].loaded_at = time.monotonic() - 6
+
+        assert cache.get() == {"v": 1}
+        assert refreshed.wait(timeout=2)
+
+    def test_concurrent_misses_load_once(self):
+        """Concurrent threads missing the same key share a single load"""
+        def slow_loader(key):
+            time.sleep(0.05)
+            return {"v": 1}
+        loader = Mock(side_effect=slow_loader)
+        cache = ReferenceCache("test", loader, ttl=60)
+
+        threads = [threading.Thread(target=cache.get) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        loader.assert_called_once()
+
+    def test_clear_caches_invalidates(self):
+        """clear_caches empties every registered cache"""
+        loader = Mock(return_value={"v": 1})
+        cache = ReferenceCache("test", loader, ttl=60)
+        cache.get()
+
+        clear_caches()
+        cache.get()
+
+        assert loader.call_count == 2
+
+
+class TestReferenceCacheAsync:
+    """Tests for the asynchronous path"""
+
+    def test_concurrent_misses_share_one_task(self):
+        """Concurrent coroutines missing the same key await one load"""
+        async def slow_loader(key):
+            await asyncio.sleep(0.01)
+            return {"v": 1}
+        async_loader = AsyncMock(side_effect=slow_loader)
+        cache = ReferenceCache("test", Mock(), async_loader=async_loader, ttl=60)
+
+        async def run():
+            return await asyncio.gather(*(cache.aget() for _ in range(10)))
+
+        results = asyncio.run(run())
+
+        assert all(r == {"v": 1} for r in results)
+        async_loader.assert_awaited_once()
+
+    def test_async_serves_stale_on_failure(self):
+        """The async path also falls back to the last good copy"""
+        async_loader = AsyncMock(side_effect=[{"v": 1}, Exception("down")])
+        cache = ReferenceCache("test", Mock(), async_loader=async_loader, ttl=60)
+
+        with patch('utils.cache.time.monotonic', return_value=1000.0):
+            asyncio.run(cache.aget())
+        with patch('utils.cache.time.monotonic', return_value=1100.0):
+            assert asyncio.run(cache.aget()) == {"v": 1}
+
+    def test_load_runs_outside_the_caller_deadline(self):
+        """A caller out of time gives up, but the shared load completes and is cached"""
+        seen = []
+
+        async def slow_loader(key):
+            seen.append(remaining())
+            await asyncio.sleep(0.05)
+            return {"v": 1}
+        async_loader = AsyncMock(side_effect=slow_loader)
+        cache = ReferenceCache("test", Mock(), async_loader=async_loader, ttl=60)
+
+        async def run():
+            with request_deadline(0.01):
+                with pytest.raises(DeadlineExceededError):
+                    await cache.aget()
+            return await cache.aget()
+
+        assert asyncio.run(run()) == {"v": 1}
+        assert seen == [None]
+        async_loader.assert_awaited_once()
+
+    def test_background_refresh_has_no_deadline(self):
+        """The refresh-ahead task does not inherit the deadline of the request that started it"""
+        seen = []
+
+        async def loader(key):
+            seen.append(remaining())
+            return {"v": len(seen)}
+        cache = ReferenceCache("test", Mock(), async_loader=AsyncMock(side_effect=loader), ttl=60, refresh_ahead=0.5)
+
+        async def run():
+            with patch('utils.cache.time.monotonic', return_value=1000.0):
+                await cache.aget()
+            with patch('utils.cache.time.monotonic', return_value=1040.0):
+                with request_deadline(5):
+                    assert await cache.aget() == {"v": 1}
+                await asyncio.sleep(0)
+
+        asyncio.run(run())
+
+        assert seen == [None, None]
+
+
+class TestTTLCache:
+    """Tests for the bounded TTL cache"""
+
+    def test_get_missing_returns_default(self):
+        cache = TTLCache("test", max_size=2, ttl=60)
+
+        assert cache.get("a") is MISSING
+        assert cache.get("a", None) is None
+
+    def test_set_and_get(self):
+        cache = TTLCache("test", max_size=2, ttl=60)
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+
+    def test_entries_expire(self):
+        cache = TTLCache("test", max_size=2, ttl=60)
+        with patch('utils.cache.time.monotonic', return_value=1000.0):
+            cache.set("a", 1)
+            cache.set("b", 2, ttl=5)
+        with patch('utils.cache.time.monotonic', return_value=1010.0):
+            assert cache.get("a") == 1
+            assert cache.get("b") is MISSING
+
+    def test_size_is_bounded_lru(self):
+        """The least recently used entry is evicted beyond max_size"""
+        cache = TTLCache("test", max_size=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert len(cache) == 2
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+
+    def test_pop_and_clear(self):
+        cache = TTLCache("test", max_size=2, ttl=60)
+        cache.set("a", 1)
+        cache.pop("a")
+        cache.set("b", 2)
+        clear_caches()
+
+        assert len(cache) == 0
@@ -0,0 +1,41 @@
+"""
+Test file for utils/concurrency.py
+
+Tests for gathering coroutines with a concurrency limit.
+"""
+
+import asyncio
+from utils.concurrency import gather_limited
+
+
+class TestGatherLimited:
+    """Tests for gather_limited"""
+
+    def test_never_runs_more_than_the_limit(self):
+        """At most `limit` calls are in flight, and results keep their order"""
+        active, peak = [0], [0]
+
+        async def call(i):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.001)
+            active[0] -= 1
+            return i
+
+        results = asyncio.run(gather_limited((lambda i=i: call(i) for i in range(10)), 4))
+
+        assert results == list(range(10))
+        assert peak[0] == 4
+
+    def test_exceptions_are_returned(self):
+        """A failed call does not stop the others"""
+        async def fail():
+            raise ValueError("boom")
+
+        async def ok():
+            return "ok"
+
+        results = asyncio.run(gather_limited([fail, ok], 1))
+
+        assert isinstance(results[0], ValueError)
+        assert results[1] == "ok"
@@ -0,0 +1,129 @@
+"""
+Test file for utils/db_pool.py
+
+Tests for the configurable connection pool and its saturation metrics.
+"""
+
+import threading
+from unittest.mock import Mock, patch
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.pool import NullPool
+from utils import db_pool
+from utils.db_pool import MeteredQueuePool, MeteredAsyncAdaptedQueuePool, engine_options, pool_stats
+
+
+def _pool(pool_size=1, max_overflow=0, timeout=1.0):
+    return MeteredQueuePool(Mock, pool_size=pool_size, max_overflow=max_overflow, timeout=timeout)
+
+
+class TestMeteredQueuePool:
+    """Tests for the checkout metrics"""
+
+    def test_checkouts_without_contention_do_not_wait(self):
+        """Checkouts that find a free connection are counted but not as waits"""
+        pool = _pool(pool_size=2)
+
+        first = pool.connect()
+        first.close()
+        pool.connect().close()
+
+        stats = pool_stats(pool)
+        assert stats["checkouts"] == 2
+        assert stats["waits"] == 0
+        assert stats["checked_out"] == 0
+        assert stats["overflow_checkouts"] == 0
+
+    def test_checkout_beyond_pool_size_uses_overflow(self):
+        """A connection opened above pool_size is reported as overflow"""
+        pool = _pool(pool_size=1, max_overflow=1)
+
+        first = pool.connect()
+        second = pool.connect()
+
+        stats = pool_stats(pool)
+        assert stats["checked_out"] == 2
+        assert stats["overflow"] == 1
+        assert stats["overflow_checkouts"] == 1
+        first.close()
+        second.close()
+
+    def test_saturated_pool_records_wait_time(self):
+        """A checkout that waits for a returned connection records the wait"""
+        pool = _pool(pool_size=1)
+        held = pool.connect()
+        threading.Timer(0.05, held.close).start()
+
+        pool.connect().close()
+
+        stats = pool_stats(pool)
+        assert stats["waits"] == 1
+        assert stats["wait_time_max_seconds"] >= 0.04
+        assert stats["wait_time_total_seconds"] == stats["wait_time_max_seconds"]
+
+    def test_checkout_timeout_is_counted(self):
+        """A checkout that gives up after pool_timeout counts as a timeout"""
+        pool = _pool(pool_size=1, timeout=0.01)
+        held = pool.connect()
+
+        with pytest.raises(exc.TimeoutError):
+            pool.connect()
+
+        stats = pool_stats(pool)
+        assert stats["timeouts"] == 1
+        assert stats["waits"] == 1
+        assert stats["checkouts"] == 1
+        held.close()
+
+    def test_metrics_survive_recreate(self):
+        """Disposing the engine recreates the pool without losing its counters"""
+        pool = _pool()
+        pool.connect().close()
+
+        recreated = pool.recreate()
+
+        assert recreated.metrics is pool.metrics
+        assert isinstance(recreated, MeteredQueuePool)
+
+    def test_unmetered_pool_reports_its_class(self):
+        """Pools without metrics (PgBouncer mode) only report their class"""
+        assert pool_stats(NullPool(Mock)) == {"pool": "NullPool"}
+
+
+class TestEngineOptions:
+    """Tests for the pool configuration"""
+
+    def test_pool_settings_come_from_environment(self):
+        """Sizes, timeouts, recycle and pre-ping are configurable"""
+        with patch.object(db_pool, "DB_POOL_SIZE", 20), \
+             patch.object(db_pool, "DB_MAX_OVERFLOW", 5), \
+             patch.object(db_pool, "DB_POOL_TIMEOUT", 2.5), \
+             patch.object(db_pool, "DB_POOL_RECYCLE", 1800), \
+             patch.object(db_pool, "DB_POOL_PRE_PING", False):
+            options = engine_options()
+
+        assert options == {
+            "poolclass": MeteredQueuePool,
+            "pool_size": 20,
+            "max_overflow": 5,
+            "pool_timeout": 2.5,
+            "pool_recycle": 1800,
+            "pool_pre_ping": False,
+        }
+
+    def test_async_engine_uses_async_pool(self):
+        """The asyncpg engine gets the asyncio-aware pool"""
+        assert engine_options(is_async=True)["poolclass"] is MeteredAsyncAdaptedQueuePool
+
+    def test_pgbouncer_mode_disables_pool_and_prepared_statements(self):
+        """Behind PgBouncer there is no local pool and asyncpg prepares nothing reusable"""
+        with patch.object(db_pool, "DB_PGBOUNCER_MODE", True):
+            sync_options = engine_options()
+            async_options = engine_options(is_async=True)
+
+        assert sync_options == {"poolclass": NullPool, "pool_pre_ping": False}
+        assert async_options["poolclass"] is NullPool
+        connect_args = async_options["connect_args"]
+        assert connect_args["statement_cache_size"] == 0
+        assert connect_args["prepared_statement_cache_size"] == 0
+        assert connect_args["prepared_statement_name_func"]() != connect_args["prepared_statement_name_func"]()
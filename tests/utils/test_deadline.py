@@ -0,0 +1,106 @@
+"""
+Test file for utils/deadline.py
+
+Tests for the per-request deadline shared by adapters and the database.
+"""
+
+import asyncio
+from unittest.mock import patch
+import pytest
+from utils.deadline import (
+    DeadlineExceededError,
+    request_deadline,
+    deadline_suspended,
+    remaining,
+    check_deadline,
+    clamp_timeouts,
+    statement_timeout_ms,
+    wait_within_deadline
+)
+
+
+class TestRequestDeadline:
+    """Tests for setting and reading the deadline"""
+
+    def test_no_deadline_outside_a_request(self):
+        """Without a deadline nothing is limited"""
+        assert remaining() is None
+        assert statement_timeout_ms() is None
+        assert clamp_timeouts({"read": 60.0}) == {"read": 60.0}
+        check_deadline()
+
+    def test_remaining_budget(self):
+        """The remaining time counts down from the budget"""
+        with patch('utils.deadline.time.monotonic', return_value=100.0):
+            with request_deadline(5):
+                with patch('utils.deadline.time.monotonic', return_value=102.0):
+                    assert remaining() == pytest.approx(3.0)
+                    assert statement_timeout_ms() == 3000
+
+        assert remaining() is None
+
+    def test_nested_deadline_never_extends(self):
+        """An inner deadline keeps the earlier of the two"""
+        with request_deadline(1):
+            with request_deadline(30):
+                assert remaining() <= 1
+
+    def test_suspended_deadline_allows_cleanup(self):
+        """Work inside deadline_suspended runs even after the budget is spent"""
+        with patch('utils.deadline.time.monotonic', return_value=0.0):
+            with request_deadline(1):
+                with patch('utils.deadline.time.monotonic', return_value=1.5):
+                    with deadline_suspended():
+                        assert statement_timeout_ms() is None
+                    with pytest.raises(DeadlineExceededError):
+                        check_deadline()
+
+    def test_clamp_timeouts_to_remaining(self):
+        """Per-phase timeouts are limited to the remaining budget"""
+        with patch('utils.deadline.time.monotonic', return_value=0.0):
+            with request_deadline(2):
+                clamped = clamp_timeouts({"connect": 5.0, "read": 1.0, "write": None, "pool": 60.0})
+
+        assert clamped == {"connect": 2.0, "read": 1.0, "write": 2.0, "pool": 2.0}
+
+    def test_spent_budget_raises(self):
+        """Once the budget is spent no more work is started"""
+        with patch('utils.deadline.time.monotonic', return_value=0.0):
+            with request_deadline(1):
+                with patch('utils.deadline.time.monotonic', return_value=1.5):
+                    with pytest.raises(DeadlineExceededError):
+                        clamp_timeouts({"read": 5.0})
+                    with pytest.raises(DeadlineExceededError):
+                        statement_timeout_ms()
+
+    def test_deadline_propagates_to_tasks(self):
+        """Tasks created during the request see its deadline"""
+        async def run():
+            with request_deadline(5):
+                return await asyncio.create_task(asyncio.sleep(0, result=remaining()))
+
+        assert 0 < asyncio.run(run()) <= 5
+
+    def test_wait_within_deadline_leaves_the_task_running(self):
+        """Running out of time stops the wait, not the shared task"""
+        async def run():
+            task = asyncio.create_task(asyncio.sleep(0.05, result="ok"))
+            with request_deadline(0.01):
+                with pytest.raises(DeadlineExceededError):
+                    await wait_within_deadline(task)
+            return await task
+
+        assert asyncio.run(run()) == "ok"
+
+    def test_wait_within_deadline_keeps_task_errors(self):
+        """A TimeoutError raised by the task itself is not reported as the deadline"""
+        async def fail():
+            raise asyncio.TimeoutError()
+
+        async def run():
+            task = asyncio.create_task(fail())
+            with request_deadline(5):
+                await wait_within_deadline(task)
+
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(run())
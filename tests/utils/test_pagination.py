@@ -0,0 +1,34 @@
+"""
+Test file for utils/pagination.py
+
+Tests for the opaque keyset cursors of the paginated listings.
+"""
+
+import base64
+from datetime import datetime, timezone
+import pytest
+from utils.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+
+class TestCursor:
+    """Tests for encoding and decoding cursors"""
+
+    def test_round_trip(self):
+        """A cursor decodes back to the position it was built from"""
+        date = datetime(2025, 3, 1, 10, 30, tzinfo=timezone.utc)
+
+        cursor = encode_cursor(date, 42)
+
+        assert decode_cursor(cursor) == (date, 42)
+        assert "=" not in cursor
+
+    @pytest.mark.parametrize("cursor", [
+        "not a cursor",
+        base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+        base64.urlsafe_b64encode(b'["2025-03-01T10:30:00", "42"]').decode(),
+        base64.urlsafe_b64encode(b'["yesterday", 42]').decode(),
+    ])
+    def test_malformed_cursor_is_rejected(self, cursor):
+        """Anything not produced by encode_cursor raises InvalidCursorError"""
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(cursor)
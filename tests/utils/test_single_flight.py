@@ -0,0 +1,255 @@
+"""
+Test file for utils/single_flight.py
+
+Tests for request coalescing of identical concurrent calls.
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from utils.deadline import DeadlineExceededError, remaining, request_deadline
+from utils.single_flight import SingleFlight, single_flight_stats
+
+
+class TestSingleFlightSync:
+    """Tests for thread callers"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Threads asking for the same key wait for the first call"""
+        flight = SingleFlight("test-sync")
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait(1)
+            return "farm"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do(1, fetch))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while flight.stats()["requests"] < 5:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["farm"] * 5
+        assert len(calls) == 1
+        assert flight.stats() == {"requests": 5, "executions": 1, "coalesced": 4, "in_flight": 0}
+
+    def test_exception_is_shared(self):
+        """Waiting callers receive the leader's exception"""
+        flight = SingleFlight("test-sync-error")
+        started = threading.Event()
+        release = threading.Event()
+
+        def fail():
+            started.set()
+            release.wait(1)
+            raise ValueError("down")
+
+        errors = []
+
+        def call():
+            try:
+                flight.do("k", fail)
+            except ValueError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(1)
+        follower = threading.Thread(target=call)
+        follower.start()
+        while flight.stats()["requests"] < 2:
+            time.sleep(0.001)
+        release.set()
+        leader.join()
+        follower.join()
+
+        assert len(errors) == 2
+
+    def test_results_are_not_cached(self):
+        """Sequential calls execute again"""
+        flight = SingleFlight("test-sequential")
+
+        flight.do(1, lambda: "a")
+        assert flight.do(1, lambda: "b") == "b"
+        assert flight.stats()["coalesced"] == 0
+
+    def test_different_keys_are_independent(self):
+        """Only identical keys are coalesced"""
+        flight = SingleFlight("test-keys")
+
+        assert flight.do((1, 2), lambda: "x") == "x"
+        assert flight.do((1, 3), lambda: "y") == "y"
+        assert flight.stats()["executions"] == 2
+
+    def test_shared_call_does_not_inherit_the_leader_deadline(self):
+        """A leader with little time left gives up without cutting the call short for the others"""
+        flight = SingleFlight("test-sync-deadline")
+        started = threading.Event()
+        seen = []
+
+        def fetch():
+            seen.append(remaining())
+            started.set()
+            time.sleep(0.05)
+            return "farm"
+
+        def leader():
+            with request_deadline(0.01):
+                with pytest.raises(DeadlineExceededError):
+                    flight.do(1, fetch)
+
+        first = threading.Thread(target=leader)
+        first.start()
+        started.wait(1)
+
+        assert flight.do(1, fetch) == "farm"
+        first.join()
+        assert seen == [None]
+        assert flight.stats()["executions"] == 1
+
+    def test_each_thread_applies_its_own_deadline(self):
+        """A follower with a shorter deadline gives up while the call goes on"""
+        flight = SingleFlight("test-sync-own-deadline")
+        started = threading.Event()
+        results = []
+
+        def fetch():
+            started.set()
+            time.sleep(0.05)
+            return "farm"
+
+        first = threading.Thread(target=lambda: results.append(flight.do(1, fetch)))
+        first.start()
+        started.wait(1)
+        with request_deadline(0.01):
+            with pytest.raises(DeadlineExceededError):
+                flight.do(1, fetch)
+        first.join()
+
+        assert results == ["farm"]
+
+
+class TestSingleFlightAsync:
+    """Tests for coroutine callers"""
+
+    def test_concurrent_coroutines_share_one_task(self):
+        """Coroutines with the same key await a single execution"""
+        flight = SingleFlight("test-async")
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "farm"
+
+        async def run():
+            return await asyncio.gather(*(flight.ado(1, fetch) for _ in range(10)))
+
+        assert asyncio.run(run()) == ["farm"] * 10
+        assert len(calls) == 1
+        assert flight.stats()["coalesced"] == 9
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        """The shared call survives while someone still waits for it"""
+        flight = SingleFlight("test-async-cancel")
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "ok"
+
+        async def run():
+            first = asyncio.create_task(flight.ado(1, fetch))
+            second = asyncio.create_task(flight.ado(1, fetch))
+            await asyncio.sleep(0)
+            first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return await second
+
+        assert asyncio.run(run()) == "ok"
+
+    def test_abandoned_call_is_cancelled(self):
+        """When every caller is cancelled the upstream call is cancelled too"""
+        flight = SingleFlight("test-async-abandoned")
+        cancelled = []
+
+        async def fetch():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def run():
+            caller = asyncio.create_task(flight.ado(1, fetch))
+            await asyncio.sleep(0)
+            caller.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await caller
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+
+        assert cancelled == [True]
+        assert flight.stats()["in_flight"] == 0
+
+    def test_shared_task_does_not_inherit_the_leader_deadline(self):
+        """A leader with little time left does not cut the call short for the others"""
+        flight = SingleFlight("test-async-deadline")
+        seen = []
+
+        async def fetch():
+            seen.append(remaining())
+            await asyncio.sleep(0.05)
+            return "farm"
+
+        async def leader():
+            with request_deadline(0.01):
+                return await flight.ado(1, fetch)
+
+        async def run():
+            first = asyncio.create_task(leader())
+            await asyncio.sleep(0)
+            second = asyncio.create_task(flight.ado(1, fetch))
+            with pytest.raises(DeadlineExceededError):
+                await first
+            return await second
+
+        assert asyncio.run(run()) == "farm"
+        assert seen == [None]
+        assert flight.stats()["executions"] == 1
+
+    def test_each_caller_applies_its_own_deadline(self):
+        """A follower with a shorter deadline gives up without cancelling the call"""
+        flight = SingleFlight("test-async-own-deadline")
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "farm"
+
+        async def follower():
+            with request_deadline(0.01):
+                return await flight.ado(1, fetch)
+
+        async def run():
+            first = asyncio.create_task(flight.ado(1, fetch))
+            await asyncio.sleep(0)
+            with pytest.raises(DeadlineExceededError):
+                await follower()
+            return await first
+
+        assert asyncio.run(run()) == "farm"
+
+    def test_stats_are_registered_by_name(self):
+        """Every group shows up in the global counters"""
+        flight = SingleFlight("test-registered")
+        flight.do(1, lambda: None)
+
+        assert single_flight_stats()["test-registered"]["requests"] == 1
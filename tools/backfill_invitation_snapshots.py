@@ -0,0 +1,88 @@
+"""
+Completa `farm_name` y `suggested_role_name` en las invitaciones creadas antes
+de que existieran (migración 002), consultando los servicios de fincas y usuarios.
+
+    uv run python -m tools.backfill_invitation_snapshots --batch-size 500
+
+Es idempotente: solo toca filas con alguno de los dos campos vacío.
+"""
+import argparse
+import logging
+from typing import Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from adapters.farm_client import get_farm_by_id
+from adapters.user_client import get_role_name_by_id
+from models.models import Invitations
+
+logger = logging.getLogger(__name__)
+
+
+def _complete_snapshot(invitation: Invitations, farm_names: dict) -> bool:
+    """Llena los campos vacíos de la invitación; True si quedaron los dos completos."""
+    if invitation.farm_name is None:
+        if invitation.farm_id not in farm_names:
+            farm = get_farm_by_id(invitation.farm_id)
+            farm_names[invitation.farm_id] = farm.name if farm is not None else None
+        invitation.farm_name = farm_names[invitation.farm_id]
+    if invitation.suggested_role_name is None:
+        invitation.suggested_role_name = get_role_name_by_id(invitation.suggested_role_id)
+    return invitation.farm_name is not None and invitation.suggested_role_name is not None
+
+
+def backfill_invitation_snapshots(db: Session, batch_size: int = 500) -> Tuple[int, int]:
+    """
+    Recorre las invitaciones incompletas por lotes (en orden de invitation_id)
+    y hace commit de cada lote. Las que no se pudieron completar quedan para
+    la siguiente ejecución.
+
+    Returns:
+        tuple: (invitaciones completadas, invitaciones que siguen incompletas).
+    """
+    farm_names = {}
+    updated = 0
+    unresolved = 0
+    last_id = 0
+    while True:
+        batch = (
+            db.query(Invitations)
+            .filter(
+                Invitations.invitation_id > last_id,
+                or_(Invitations.farm_name.is_(None), Invitations.suggested_role_name.is_(None))
+            )
+            .order_by(Invitations.invitation_id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return updated, unresolved
+
+        for invitation in batch:
+            if _complete_snapshot(invitation, farm_names):
+                updated += 1
+            else:
+                unresolved += 1
+                logger.warning(f"No se pudo completar la invitación {invitation.invitation_id}")
+        db.commit()
+        last_id = batch[-1].invitation_id
+        logger.info(f"Invitaciones revisadas hasta la {last_id} ({updated} completadas, {unresolved} sin completar)")
+
+
+if __name__ == "__main__":
+    from dataBase import SessionLocal, init_db, primary_reads
+    from utils.logger import setup_logger
+
+    setup_logger()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500, help="Invitaciones por transacción")
+    args = parser.parse_args()
+
+    init_db()
+    session = SessionLocal()
+    # Lee y escribe las mismas filas: la réplica podría ir atrasada
+    try:
+        with primary_reads():
+            updated, unresolved = backfill_invitation_snapshots(session, args.batch_size)
+    finally:
+        session.close()
+    print(f"{updated} invitaciones completadas, {unresolved} sin completar")
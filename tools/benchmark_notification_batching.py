@@ -0,0 +1,76 @@
+"""
+Compara el envío de notificaciones una por una con el envío por lotes contra
+el servicio falso (`tools.notification_service_stub`) u otro servicio real.
+
+    uv run uvicorn tools.notification_service_stub:app --port 8001
+    NOTIFICATIONS_SERVICE_URL=http://localhost:8001 uv run python -m tools.benchmark_notification_batching --count 2000
+
+Para medir con más envíos simultáneos, sube también el bulkhead del servicio
+(HTTP_NOTIFICATIONS_BULKHEAD_MAX_CONCURRENT) por encima de --concurrency.
+"""
+import argparse
+import asyncio
+import time
+from adapters.http_clients import get_async_http_client, aclose_http_clients, NOTIFICATIONS_SERVICE
+from adapters.notification_batcher import NotificationBatcher
+from adapters.notification_client import send_notification_async, NOTIFICATIONS_SERVICE_URL
+
+
+def _notification(i: int) -> dict:
+    return {
+        "message": f"Notificación de prueba {i}",
+        "user_id": i,
+        "notification_type_id": 1,
+        "invitation_id": i,
+        "notification_state_id": 1,
+    }
+
+
+async def _reset_stats():
+    await get_async_http_client(NOTIFICATIONS_SERVICE).delete(f"{NOTIFICATIONS_SERVICE_URL}/stats")
+
+
+async def _stats() -> dict:
+    resp = await get_async_http_client(NOTIFICATIONS_SERVICE).get(f"{NOTIFICATIONS_SERVICE_URL}/stats")
+    return resp.json()
+
+
+async def _run(label: str, count: int, concurrency: int, send):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await send(**_notification(i))
+
+    await _reset_stats()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(count)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    errors = sum(isinstance(result, BaseException) for result in results)
+    stats = await _stats()
+    print(
+        f"{label:<10} {count} notificaciones en {elapsed:.2f}s "
+        f"({count / elapsed:.0f}/s), peticiones: {stats['requests']}, errores: {errors}"
+    )
+
+
+async def main(count: int, concurrency: int, batch_size: int, max_wait: float):
+    try:
+        await _run("una a una", count, concurrency, send_notification_async)
+        batcher = NotificationBatcher(max_batch_size=batch_size, max_wait=max_wait)
+        await _run("por lotes", count, concurrency, batcher.send)
+        await batcher.aclose()
+    finally:
+        await aclose_http_clients()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000, help="Notificaciones a enviar en cada modo")
+    # Por debajo del bulkhead de notificaciones (HTTP_BULKHEAD_MAX_CONCURRENT=50): por
+    # encima, el modo una a una mediría rechazos del bulkhead y no rendimiento
+    parser.add_argument("--concurrency", type=int, default=40, help="Envíos simultáneos")
+    parser.add_argument("--batch-size", type=int, default=100, help="Tamaño máximo de lote")
+    parser.add_argument("--max-wait", type=float, default=0.05, help="Espera máxima para completar un lote (s)")
+    args = parser.parse_args()
+    asyncio.run(main(args.count, args.concurrency, args.batch_size, args.max_wait))
@@ -0,0 +1,39 @@
+"""
+Exporta invitaciones como NDJSON o CSV para reportes y conciliación, leyendo
+desde un cursor del servidor: la memoria no crece con el número de filas.
+
+    uv run python -m tools.export_invitations --format csv --farm-id 10 > invitaciones.csv
+    uv run python -m tools.export_invitations --inviter-id 3 --from 2025-01-01 --output inv.ndjson
+
+Sin filtros exporta todas las invitaciones.
+"""
+import argparse
+import sys
+from datetime import datetime
+from use_cases.export_invitations_use_case import EXPORT_MEDIA_TYPES, export_statement, stream_export
+
+
+if __name__ == "__main__":
+    from dataBase import SessionLocal, init_db
+    from utils.logger import setup_logger
+
+    setup_logger()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=sorted(EXPORT_MEDIA_TYPES), default="ndjson", help="Formato de salida")
+    parser.add_argument("--farm-id", type=int, help="Solo las invitaciones de esta finca")
+    parser.add_argument("--inviter-id", type=int, help="Solo las enviadas por este usuario")
+    parser.add_argument("--from", dest="date_from", type=datetime.fromisoformat, help="Desde esta fecha ISO (inclusive)")
+    parser.add_argument("--to", dest="date_to", type=datetime.fromisoformat, help="Hasta esta fecha ISO (exclusiva)")
+    parser.add_argument("--output", help="Archivo de salida; por defecto la salida estándar")
+    args = parser.parse_args()
+
+    stmt = export_statement(args.farm_id, args.inviter_id, args.date_from, args.date_to)
+    init_db()
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        with SessionLocal() as session:
+            for chunk in stream_export(stmt, args.format, session):
+                output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
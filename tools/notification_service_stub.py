@@ -0,0 +1,109 @@
+"""
+Servicio de notificaciones falso para probar y medir el envío por lotes.
+
+Expone los endpoints que usa `adapters.notification_client`, simula latencia
+por petición y cuenta las peticiones recibidas (GET /stats, DELETE /stats).
+
+    uv run uvicorn tools.notification_service_stub:app --port 8001
+
+Variables de entorno:
+    STUB_LATENCY: segundos de espera por petición (por defecto 0.02).
+    STUB_BULK_ENABLED: "false" para responder 404 al endpoint masivo.
+"""
+import asyncio
+import os
+from typing import Any, Dict
+from fastapi import FastAPI, HTTPException
+
+NOTIFICATION_STATES = [
+    {"notification_state_id": 1, "name": "Pendiente"},
+    {"notification_state_id": 2, "name": "Respondida"},
+]
+NOTIFICATION_TYPES = [
+    {"notification_type_id": 1, "name": "Invitation"},
+    {"notification_type_id": 2, "name": "Invitation_Accepted"},
+    {"notification_type_id": 3, "name": "Invitation_Rejected"},
+]
+
+
+def create_app(latency: float = 0.0, bulk_enabled: bool = True) -> FastAPI:
+    """
+    Crea una instancia del servicio falso con su propio estado.
+
+    Args:
+        latency (float): Espera simulada por petición, en segundos.
+        bulk_enabled (bool): Si expone POST /send-notifications/bulk y el borrado masivo.
+    """
+    stub = FastAPI(title="Notification service stub")
+    stub.state.sent = []
+    stub.state.requests = {"single": 0, "bulk": 0, "delete": 0, "bulk_delete": 0, "catalog": 0}
+
+    async def simulate_latency():
+        if latency:
+            await asyncio.sleep(latency)
+
+    @stub.get("/notification-states")
+    async def notification_states():
+        stub.state.requests["catalog"] += 1
+        return NOTIFICATION_STATES
+
+    @stub.get("/notification-types")
+    async def notification_types():
+        stub.state.requests["catalog"] += 1
+        return NOTIFICATION_TYPES
+
+    @stub.post("/send-notification")
+    async def send_notification(notification: Dict[str, Any]):
+        stub.state.requests["single"] += 1
+        await simulate_latency()
+        stub.state.sent.append(notification)
+        return {"status": "success", "sent": 1}
+
+    if bulk_enabled:
+        @stub.post("/send-notifications/bulk")
+        async def send_notifications_bulk(body: Dict[str, Any]):
+            notifications = body.get("notifications")
+            if not isinstance(notifications, list):
+                raise HTTPException(status_code=422, detail="notifications debe ser una lista")
+            stub.state.requests["bulk"] += 1
+            await simulate_latency()
+            stub.state.sent.extend(notifications)
+            return {"status": "success", "sent": len(notifications)}
+
+        @stub.post("/notifications/by-invitation/bulk-delete")
+        async def delete_notifications_bulk(body: Dict[str, Any]):
+            invitation_ids = body.get("invitation_ids")
+            if not isinstance(invitation_ids, list):
+                raise HTTPException(status_code=422, detail="invitation_ids debe ser una lista")
+            stub.state.requests["bulk_delete"] += 1
+            await simulate_latency()
+            before = len(stub.state.sent)
+            stub.state.sent = [n for n in stub.state.sent if n.get("invitation_id") not in invitation_ids]
+            return {"deleted_count": before - len(stub.state.sent)}
+
+    @stub.delete("/notifications/by-invitation/{invitation_id}")
+    async def delete_notifications(invitation_id: int):
+        stub.state.requests["delete"] += 1
+        await simulate_latency()
+        before = len(stub.state.sent)
+        stub.state.sent = [n for n in stub.state.sent if n.get("invitation_id") != invitation_id]
+        return {"deleted_count": before - len(stub.state.sent)}
+
+    @stub.get("/stats")
+    async def stats():
+        return {"requests": stub.state.requests, "sent": len(stub.state.sent)}
+
+    @stub.delete("/stats")
+    async def reset_stats():
+        stub.state.sent = []
+        for name in stub.state.requests:
+            stub.state.requests[name] = 0
+        return {"status": "success"}
+
+    return stub
+
+
+app = create_app(
+    latency=float(os.getenv("STUB_LATENCY", "0.02")),
+    bulk_enabled=os.getenv("STUB_BULK_ENABLED", "true").lower() in ("1", "true", "yes"),
+)
@@ -0,0 +1,35 @@
+from utils.response import create_response
+import asyncio
+
+
+async def cancel_pending(lookups):
+    """Cancel lookups that are still running and wait for them to finish."""
+    tasks = list(lookups.values())
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+    # Also retrieves exceptions of lookups nobody awaited
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def validate_farm_and_user_access(lookups):
+    """
+    Validate farm exists and user has access to it.
+
+    `lookups` holds the tasks "farm", "urf_active_state" and "urf" started by
+    the calling use case.
+    """
+    farm = await lookups["farm"]
+    if farm is None:
+        return None, create_response("error", "Finca no encontrada", status_code=404)
+
+    urf_active_state = await lookups["urf_active_state"]
+    if not urf_active_state or not urf_active_state.get("user_role_farm_state_id"):
+        return None, create_response("error", "No se pudo obtener el estado 'Activo' para UserRoleFarm", status_code=500)
+    
+    urf_active_state_id = urf_active_state["user_role_farm_state_id"]
+    urf = await lookups["urf"]
+    if not urf or getattr(urf, "user_role_farm_state_id", None) != urf_active_state_id:
+        return None, create_response("error", "No tienes acceso a esta finca", status_code=403)
+
+    return {"farm": farm, "urf": urf, "urf_active_state_id": urf_active_state_id}, None
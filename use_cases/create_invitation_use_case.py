@@ -1,10 +1,19 @@
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from utils.response import create_response
 from datetime import datetime
-from adapters.farm_client import get_farm_by_id, get_user_role_farm, get_user_role_farm_state_by_name
-from adapters.user_client import get_role_name_by_id, get_role_permissions_for_user_role, user_verification_by_email
-from adapters.notification_client import get_notification_state_by_name, get_notification_type_by_name, send_notification, delete_notifications_by_invitation_id
+from adapters.farm_client import get_farm_by_id_async, get_user_role_farm_async, get_user_role_farm_state_by_name_async
+from adapters.user_client import get_role_name_by_id_async, get_role_permissions_for_user_role_async, user_verification_by_email_async
+from adapters.notification_outbox import enqueue_notification, notify_outbox
+from adapters.resilience import DependencyUnavailableError
+from utils.deadline import DeadlineExceededError
+from use_cases.access import cancel_pending, validate_farm_and_user_access
 from models.models import Invitations
+import asyncio
+from typing import Union
 import pytz
 import logging
 
@@ -20,30 +29,40 @@ bogota_tz = pytz.timezone("America/Bogota")
 
 logger = logging.getLogger(__name__)
 
-def _validate_farm_and_user_access(invitation_data, user):
-    """Validate farm exists and user has access to it."""
-    farm = get_farm_by_id(invitation_data.farm_id)
-    if farm is None:
-        return None, create_response("error", "Finca no encontrada", status_code=404)
-
-    urf_active_state = get_user_role_farm_state_by_name(STATE_ACTIVE)
-    if not urf_active_state or not urf_active_state.get("user_role_farm_state_id"):
-        return None, create_response("error", "No se pudo obtener el estado 'Activo' para UserRoleFarm", status_code=500)
-    
-    urf_active_state_id = urf_active_state["user_role_farm_state_id"]
-    urf = get_user_role_farm(user.user_id, invitation_data.farm_id)
-    if not urf or getattr(urf, "user_role_farm_state_id", None) != urf_active_state_id:
-        return None, create_response("error", "No tienes acceso a esta finca", status_code=403)
-
-    return {"farm": farm, "urf": urf, "urf_active_state_id": urf_active_state_id}, None
-
-def _validate_role_permissions(invitation_data, urf):
+def _start_lookups(invitation_data, user):
+    """Start every remote lookup at once; dependent lookups chain on their parent task."""
+    urf = asyncio.create_task(get_user_role_farm_async(user.user_id, invitation_data.farm_id))
+    invited_user = asyncio.create_task(user_verification_by_email_async(invitation_data.email))
+
+    async def inviter_permissions():
+        inviter_urf = await urf
+        if not inviter_urf:
+            return frozenset()
+        return await get_role_permissions_for_user_role_async(inviter_urf.user_role_id)
+
+    async def invited_urf():
+        invited = await invited_user
+        if not invited:
+            return None
+        return await get_user_role_farm_async(invited.user_id, invitation_data.farm_id)
+
+    return {
+        "farm": asyncio.create_task(get_farm_by_id_async(invitation_data.farm_id)),
+        "urf_active_state": asyncio.create_task(get_user_role_farm_state_by_name_async(STATE_ACTIVE)),
+        "urf": urf,
+        "suggested_role_name": asyncio.create_task(get_role_name_by_id_async(invitation_data.suggested_role_id)),
+        "inviter_permissions": asyncio.create_task(inviter_permissions()),
+        "invited_user": invited_user,
+        "invited_urf": asyncio.create_task(invited_urf()),
+    }
+
+async def _validate_role_permissions(lookups):
     """Validate suggested role and user permissions."""
-    suggested_role_name = get_role_name_by_id(invitation_data.suggested_role_id)
+    suggested_role_name = await lookups["suggested_role_name"]
     if not suggested_role_name:
         return None, create_response("error", "El rol sugerido no es válido", status_code=400)
 
-    inviter_permissions = get_role_permissions_for_user_role(urf.user_role_id)
+    inviter_permissions = await lookups["inviter_permissions"]
     
     if suggested_role_name == ROLE_ADMIN_FARM and "add_administrator_farm" not in inviter_permissions:
         return None, create_response("error", "No tienes permiso para invitar a un Administrador de Finca", status_code=403)
@@ -54,104 +73,139 @@ def _validate_role_permissions(invitation_data, urf):
 
     return suggested_role_name, None
 
-def _validate_invited_user(invitation_data, urf_active_state_id):
+async def _validate_invited_user(lookups, urf_active_state_id):
     """Validate invited user exists and is not already associated with the farm."""
-    invited_user = user_verification_by_email(invitation_data.email)
+    invited_user = await lookups["invited_user"]
     if not invited_user:
         return None, create_response("error", "El usuario no está registrado", status_code=404)
 
-    urf_invited = get_user_role_farm(invited_user.user_id, invitation_data.farm_id)
+    urf_invited = await lookups["invited_urf"]
     if urf_invited and getattr(urf_invited, "user_role_farm_state_id", None) == urf_active_state_id:
         return None, create_response("error", "El usuario ya está asociado a la finca con un estado activo", status_code=400)
 
     return invited_user, None
 
-def _handle_invitation_creation_or_update(invitation_data, user, invited_user, db):
-    """Create new invitation or update existing one."""
-    existing_invitation = db.query(Invitations).filter(
-        Invitations.invited_user_id == invited_user.user_id,
-        Invitations.farm_id == invitation_data.farm_id
-    ).first()
-
-    if existing_invitation:
-        existing_invitation.invitation_date = datetime.now(bogota_tz)
-        existing_invitation.suggested_role_id = invitation_data.suggested_role_id
-        existing_invitation.inviter_user_id = user.user_id
-        db.commit()
-        db.refresh(existing_invitation)
-        logger.info(f"Invitación existente actualizada: {existing_invitation.invitation_id}")
-        
-        try:
-            delete_notifications_by_invitation_id(existing_invitation.invitation_id)
-            logger.info(f"Notificaciones de invitación anteriores eliminadas para la invitación actualizada {existing_invitation.invitation_id}")
-        except Exception as e:
-            logger.error(f"Error eliminando notificaciones anteriores para la invitación {existing_invitation.invitation_id}: {str(e)}")
-        
-        return existing_invitation
-    else:
-        new_invitation = Invitations(
-            invited_user_id=invited_user.user_id,
-            suggested_role_id=invitation_data.suggested_role_id,
-            farm_id=invitation_data.farm_id,
-            inviter_user_id=user.user_id,
-            invitation_date=datetime.now(bogota_tz)
-        )
-        db.add(new_invitation)
-        db.commit()
-        db.refresh(new_invitation)
-        logger.info(f"Nueva invitación creada: {new_invitation.invitation_id}")
-        return new_invitation
-
-def _send_invitation_notification(invitation, invited_user, suggested_role_name, farm):
-    """Send notification to invited user."""
-    notification_pending_state = get_notification_state_by_name(NOTIFICATION_STATE_PENDING)
-    if not notification_pending_state:
-        logger.error(f"El estado '{NOTIFICATION_STATE_PENDING}' no fue encontrado para 'Notifications'")
-        return create_response("error", f"El estado '{NOTIFICATION_STATE_PENDING}' no fue encontrado para 'Notifications'", status_code=400)
-
-    invitation_notification_type = get_notification_type_by_name(NOTIFICATION_TYPE_INVITATION)
-    if not invitation_notification_type:
-        logger.error(f"No se encontró el tipo de notificación '{NOTIFICATION_TYPE_INVITATION}'")
-        return create_response("error", f"No se encontró el tipo de notificación '{NOTIFICATION_TYPE_INVITATION}'", status_code=400)
-
-    send_notification(
-        message=f"Has sido invitado como {suggested_role_name} a la finca {farm.name}",
+def _enqueue_invitation_notification(db, invitation, invited_user, suggested_role_name, farm, updated):
+    """Queue the notification for the invited user in the invitation's transaction."""
+    message = f"Has sido invitado como {suggested_role_name} a la finca {farm.name}"
+    enqueue_notification(
+        db,
+        message=message,
         user_id=invited_user.user_id,
-        notification_type_id=invitation_notification_type["notification_type_id"],
         invitation_id=invitation.invitation_id,
-        notification_state_id=notification_pending_state["notification_state_id"],
+        notification_type=NOTIFICATION_TYPE_INVITATION,
+        notification_state=NOTIFICATION_STATE_PENDING,
         fcm_title="Nueva Invitación",
-        fcm_body=f"Has sido invitado como {suggested_role_name} a la finca {farm.name}"
+        fcm_body=message,
+        # An updated invitation replaces the notifications sent for it before
+        replace_existing=updated
     )
-    return None
 
-def create_invitation(invitation_data, user, db: Session):
-    # Validate farm and user access
-    farm_data, error = _validate_farm_and_user_access(invitation_data, user)
-    if error:
-        return error
-
-    # Validate role permissions
-    suggested_role_name, error = _validate_role_permissions(invitation_data, farm_data["urf"])
-    if error:
-        return error
+def _upsert_invitation_statement(invitation_data, user, invited_user, suggested_role_name, farm):
+    """
+    INSERT ... ON CONFLICT (invited_user_id, farm_id) DO UPDATE ... RETURNING.
+    `inserted` is true when the row is new: a freshly inserted tuple has xmax = 0.
+    """
+    values = {
+        "invited_user_id": invited_user.user_id,
+        "suggested_role_id": invitation_data.suggested_role_id,
+        "farm_id": invitation_data.farm_id,
+        "inviter_user_id": user.user_id,
+        "invitation_date": datetime.now(bogota_tz),
+        "farm_name": farm.name,
+        "suggested_role_name": suggested_role_name,
+    }
+    stmt = pg_insert(Invitations).values(**values)
+    return stmt.on_conflict_do_update(
+        index_elements=[Invitations.invited_user_id, Invitations.farm_id],
+        set_={
+            "invitation_date": stmt.excluded.invitation_date,
+            "suggested_role_id": stmt.excluded.suggested_role_id,
+            "inviter_user_id": stmt.excluded.inviter_user_id,
+            "farm_name": stmt.excluded.farm_name,
+            "suggested_role_name": stmt.excluded.suggested_role_name,
+        }
+    ).returning(Invitations.invitation_id, literal_column("xmax = 0").label("inserted"))
+
+def _save_invitation(invitation_data, user, invited_user, db, suggested_role_name, farm):
+    """
+    Create new invitation or update existing one in a single upsert, queueing
+    its notification in the same transaction. Returns (invitation, updated),
+    where invitation is the RETURNING row.
+    """
+    stmt = _upsert_invitation_statement(invitation_data, user, invited_user, suggested_role_name, farm)
+    invitation = db.execute(stmt).one()
+    updated = not invitation.inserted
+    _enqueue_invitation_notification(db, invitation, invited_user, suggested_role_name, farm, updated)
+    db.commit()
+    if updated:
+        logger.info(f"Invitación existente actualizada: {invitation.invitation_id}")
+    else:
+        logger.info(f"Nueva invitación creada: {invitation.invitation_id}")
+    return invitation, updated
+
+async def _save_invitation_async(invitation_data, user, invited_user, db: AsyncSession, suggested_role_name, farm):
+    """Async version of _save_invitation for an AsyncSession."""
+    stmt = _upsert_invitation_statement(invitation_data, user, invited_user, suggested_role_name, farm)
+    invitation = (await db.execute(stmt)).one()
+    updated = not invitation.inserted
+    _enqueue_invitation_notification(db, invitation, invited_user, suggested_role_name, farm, updated)
+    await db.commit()
+    if updated:
+        logger.info(f"Invitación existente actualizada: {invitation.invitation_id}")
+    else:
+        logger.info(f"Nueva invitación creada: {invitation.invitation_id}")
+    return invitation, updated
+
+async def _handle_invitation_creation_or_update(invitation_data, user, invited_user, db, suggested_role_name, farm):
+    """Create new invitation or update existing one; its notification is delivered by the outbox dispatcher."""
+    if isinstance(db, AsyncSession):
+        invitation, _updated = await _save_invitation_async(
+            invitation_data, user, invited_user, db, suggested_role_name, farm
+        )
+    else:
+        # The blocking session work runs in the thread pool so the event loop stays free
+        invitation, _updated = await run_in_threadpool(
+            _save_invitation, invitation_data, user, invited_user, db, suggested_role_name, farm
+        )
+    notify_outbox()
+    return invitation
 
-    # Validate invited user
-    invited_user, error = _validate_invited_user(invitation_data, farm_data["urf_active_state_id"])
-    if error:
-        return error
+async def create_invitation(invitation_data, user, db: Union[Session, AsyncSession]):
+    # Independent lookups run concurrently; the validations consume them in
+    # priority order, so the first failing check still decides the response.
+    lookups = _start_lookups(invitation_data, user)
+    try:
+        # Validate farm and user access
+        farm_data, error = await validate_farm_and_user_access(lookups)
+        if error:
+            return error
+
+        # Validate role permissions
+        suggested_role_name, error = await _validate_role_permissions(lookups)
+        if error:
+            return error
+
+        # Validate invited user
+        invited_user, error = await _validate_invited_user(lookups, farm_data["urf_active_state_id"])
+        if error:
+            return error
+    finally:
+        # Lookups still running after a failed validation are no longer needed
+        await cancel_pending(lookups)
 
     # Handle invitation creation or update
     try:
-        new_invitation = _handle_invitation_creation_or_update(invitation_data, user, invited_user, db)
-
-        # Send notification
-        notification_error = _send_invitation_notification(new_invitation, invited_user, suggested_role_name, farm_data["farm"])
-        if notification_error:
-            return notification_error
-
+        new_invitation = await _handle_invitation_creation_or_update(
+            invitation_data, user, invited_user, db, suggested_role_name, farm_data["farm"]
+        )
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
     except Exception as e:
-        db.rollback()
+        if isinstance(db, AsyncSession):
+            await db.rollback()
+        else:
+            await run_in_threadpool(db.rollback)
         logger.error(f"Error creando la invitación: {str(e)}")
         return create_response("error", f"Error creando la invitación: {str(e)}", status_code=500)
 
@@ -0,0 +1,146 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Iterator, Optional
+from models.models import Invitations
+from use_cases.list_invitations_use_case import _LISTED_COLUMNS, _validate_farm_listing_access
+import csv
+import io
+import os
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Filas que trae cada viaje al cursor del servidor; la memoria no depende del total exportado
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+_CSV_HEADER = [column.key for column in _LISTED_COLUMNS]
+
+
+def export_statement(
+    farm_id: Optional[int] = None,
+    inviter_user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+):
+    """
+    Core select of the exported columns, in invitation_id order.
+    `date_from` is inclusive and `date_to` exclusive.
+    """
+    stmt = select(*_LISTED_COLUMNS)
+    if farm_id is not None:
+        stmt = stmt.where(Invitations.farm_id == farm_id)
+    if inviter_user_id is not None:
+        stmt = stmt.where(Invitations.inviter_user_id == inviter_user_id)
+    if date_from is not None:
+        stmt = stmt.where(Invitations.invitation_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Invitations.invitation_date < date_to)
+    # yield_per turns on stream_results: psycopg2 and asyncpg read through a server-side cursor
+    return stmt.order_by(Invitations.invitation_id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+
+
+def _ndjson_chunk(rows: Iterable) -> bytes:
+    return b"".join(orjson.dumps(dict(row._mapping)) + b"\n" for row in rows)
+
+
+def _csv_chunk(rows: Iterable, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(_CSV_HEADER)
+    for row in rows:
+        writer.writerow(value.isoformat() if isinstance(value, datetime) else value for value in row)
+    return buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSerializer:
+    """Turns each partition of rows into one chunk of output in `fmt`."""
+
+    def __init__(self, fmt: str):
+        if fmt not in EXPORT_MEDIA_TYPES:
+            raise ValueError(f"Formato de exportación no soportado: {fmt}")
+        self.fmt = fmt
+        self._header_pending = fmt == "csv"
+
+    def header(self) -> bytes:
+        """The CSV header when no partition came back; nothing for NDJSON."""
+        return self.chunk([]) if self._header_pending else b""
+
+    def chunk(self, rows) -> bytes:
+        if self.fmt == "ndjson":
+            return _ndjson_chunk(rows)
+        header, self._header_pending = self._header_pending, False
+        return _csv_chunk(rows, header=header)
+
+
+def stream_export(stmt, fmt: str, db: Session) -> Iterator[bytes]:
+    """
+    Serialize the rows of `stmt` chunk by chunk. Only one partition of
+    EXPORT_CHUNK_SIZE rows is held in memory at a time.
+    """
+    serializer = _ChunkSerializer(fmt)
+    for partition in db.execute(stmt).partitions():
+        yield serializer.chunk(partition)
+    yield serializer.header()
+
+
+async def stream_export_async(stmt, fmt: str, db: AsyncSession) -> AsyncIterator[bytes]:
+    """Async version of stream_export for an AsyncSession."""
+    serializer = _ChunkSerializer(fmt)
+    result = await db.stream(stmt)
+    async for partition in result.partitions():
+        yield serializer.chunk(partition)
+    yield serializer.header()
+
+
+def _stream_with_own_session(stmt, fmt: str, session_factory):
+    """
+    The body is sent after the endpoint returns and its dependencies are
+    closed, so the stream opens (and closes) a session of its own.
+    """
+    if isinstance(session_factory, async_sessionmaker):
+        async def body():
+            async with session_factory() as db:
+                async for chunk in stream_export_async(stmt, fmt, db):
+                    yield chunk
+        return body()
+
+    def body():
+        with session_factory() as db:
+            yield from stream_export(stmt, fmt, db)
+    return body()
+
+
+async def export_invitations(
+    farm_id: int,
+    user,
+    fmt: str,
+    session_factory,
+    inviter_user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+):
+    """
+    Stream every invitation of a farm matching the filters as NDJSON or CSV.
+    Same access rule as the farm listing.
+    """
+    error = await _validate_farm_listing_access(farm_id, user)
+    if error:
+        return error
+
+    stmt = export_statement(farm_id, inviter_user_id, date_from, date_to)
+    logger.info(f"Exportando invitaciones de la finca {farm_id} en {fmt}")
+    return StreamingResponse(
+        _stream_with_own_session(stmt, fmt, session_factory),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="invitations_farm_{farm_id}.{fmt}"'}
+    )
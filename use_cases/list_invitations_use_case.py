@@ -0,0 +1,142 @@
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, Union
+from models.models import Invitations
+from adapters.farm_client import get_farm_by_id_async, get_user_role_farm_async, get_user_role_farm_state_by_name_async
+from adapters.user_client import get_role_permissions_for_user_role_async
+from use_cases.access import cancel_pending, validate_farm_and_user_access
+from utils.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from utils.response import create_response
+import asyncio
+import logging
+
+from utils.constants import STATE_ACTIVE
+
+logger = logging.getLogger(__name__)
+
+# Quien puede invitar a la finca puede ver sus invitaciones pendientes
+_FARM_LISTING_PERMISSIONS = frozenset({"add_administrator_farm", "add_operator_farm"})
+
+# Columns returned by the listings; read as plain rows, not ORM objects
+_LISTED_COLUMNS = (
+    Invitations.invitation_id,
+    Invitations.invited_user_id,
+    Invitations.inviter_user_id,
+    Invitations.farm_id,
+    Invitations.farm_name,
+    Invitations.suggested_role_id,
+    Invitations.suggested_role_name,
+    Invitations.invitation_date,
+)
+
+
+def _page_statement(scope, cursor: Optional[str], limit: int):
+    """
+    One keyset page, newest first: ORDER BY invitation_date DESC, invitation_id
+    so the scan follows the (scope, invitation_date DESC, invitation_id) index
+    and never skips rows, however deep the page.
+    Fetches one extra row to know whether there is a next page.
+    """
+    stmt = select(*_LISTED_COLUMNS).where(scope)
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            Invitations.invitation_date <= after_date,
+            or_(
+                Invitations.invitation_date < after_date,
+                and_(Invitations.invitation_date == after_date, Invitations.invitation_id > after_id)
+            )
+        )
+    return stmt.order_by(Invitations.invitation_date.desc(), Invitations.invitation_id).limit(limit + 1)
+
+
+def _fetch_page(stmt, db: Session):
+    rows = db.execute(stmt).all()
+    # Read-only: end the transaction now so the connection goes back to the pool
+    db.rollback()
+    return rows
+
+
+async def _fetch_page_async(stmt, db: AsyncSession):
+    rows = (await db.execute(stmt)).all()
+    await db.rollback()
+    return rows
+
+
+def _page_payload(rows, limit: int):
+    """Rows of the page and the cursor of the next one (None on the last page)."""
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last.invitation_date, last.invitation_id)
+    return {"invitations": [dict(row._mapping) for row in page], "next_cursor": next_cursor}
+
+
+async def _list_page(scope, cursor: Optional[str], limit: int, db: Union[Session, AsyncSession]):
+    """Run one page query with either session type; returns (payload, error_response)."""
+    try:
+        stmt = _page_statement(scope, cursor, limit)
+    except InvalidCursorError:
+        return None, create_response("error", "El cursor de paginación no es válido", status_code=400)
+
+    if isinstance(db, AsyncSession):
+        rows = await _fetch_page_async(stmt, db)
+    else:
+        rows = await run_in_threadpool(_fetch_page, stmt, db)
+    return _page_payload(rows, limit), None
+
+
+async def list_received_invitations(user, cursor: Optional[str], limit: int, db: Union[Session, AsyncSession]):
+    """Pending invitations sent to `user`, newest first, one keyset page at a time."""
+    payload, error = await _list_page(Invitations.invited_user_id == user.user_id, cursor, limit, db)
+    if error:
+        return error
+    return create_response("success", "Invitaciones recibidas", payload)
+
+
+def _start_farm_access_lookups(farm_id: int, user):
+    """The lookups validate_farm_and_user_access consumes, plus the user's permissions."""
+    urf = asyncio.create_task(get_user_role_farm_async(user.user_id, farm_id))
+
+    async def permissions():
+        user_urf = await urf
+        if not user_urf:
+            return frozenset()
+        return await get_role_permissions_for_user_role_async(user_urf.user_role_id)
+
+    return {
+        "farm": asyncio.create_task(get_farm_by_id_async(farm_id)),
+        "urf_active_state": asyncio.create_task(get_user_role_farm_state_by_name_async(STATE_ACTIVE)),
+        "urf": urf,
+        "permissions": asyncio.create_task(permissions()),
+    }
+
+
+async def _validate_farm_listing_access(farm_id: int, user):
+    """Same access check as creating an invitation; only members who can invite may list."""
+    lookups = _start_farm_access_lookups(farm_id, user)
+    try:
+        _, error = await validate_farm_and_user_access(lookups)
+        if error:
+            return error
+
+        if not _FARM_LISTING_PERMISSIONS & await lookups["permissions"]:
+            return create_response("error", "No tienes permiso para ver las invitaciones de esta finca", status_code=403)
+        return None
+    finally:
+        await cancel_pending(lookups)
+
+
+async def list_farm_invitations(farm_id: int, user, cursor: Optional[str], limit: int, db: Union[Session, AsyncSession]):
+    """Pending invitations of a farm for its administrators, newest first, one keyset page at a time."""
+    error = await _validate_farm_listing_access(farm_id, user)
+    if error:
+        return error
+
+    payload, error = await _list_page(Invitations.farm_id == farm_id, cursor, limit, db)
+    if error:
+        return error
+    return create_response("success", "Invitaciones pendientes de la finca", payload)
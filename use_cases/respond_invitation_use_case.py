@@ -1,15 +1,17 @@
 from utils.response import create_response
-from models.models import Invitations
+from models.models import Invitations, NotificationOutbox
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
+from starlette.concurrency import run_in_threadpool
 # Adapters para microservicios
-from adapters.farm_client import get_farm_by_id, create_user_role_farm, get_user_role_farm_state_by_name
-from adapters.user_client import get_role_name_by_id, create_user_role
-from adapters.notification_client import (
-    get_notification_state_by_name,
-    get_notification_type_by_name,
-    send_notification,
-    delete_notifications_by_invitation_id
-)
+from adapters.farm_client import get_farm_by_id_async, create_user_role_farm_async, get_user_role_farm_state_by_name_async
+from adapters.user_client import get_role_name_by_id_async, create_user_role_async
+from adapters.notification_client import delete_notifications_by_invitation_id_async
+from adapters.notification_outbox import PENDING, enqueue_notification, notify_outbox
+from adapters.resilience import DependencyUnavailableError
+from utils.deadline import DeadlineExceededError
 import pytz
 import logging
 
@@ -24,23 +26,108 @@ logger = logging.getLogger(__name__)
 
 bogota_tz = pytz.timezone("America/Bogota")
 
+_INVITATION_COLUMNS = (
+    Invitations.invitation_id,
+    Invitations.invited_user_id,
+    Invitations.invitation_date,
+    Invitations.farm_id,
+    Invitations.inviter_user_id,
+    Invitations.suggested_role_id,
+    Invitations.farm_name,
+    Invitations.suggested_role_name
+)
+
+
+def _read_statement(invitation_id: int):
+    return select(*_INVITATION_COLUMNS).where(Invitations.invitation_id == invitation_id)
+
+
+def _claim_statement(invitation_id: int, user_id: int):
+    """DELETE ... WHERE invitation_id AND invited_user_id RETURNING the whole row."""
+    return (
+        delete(Invitations)
+        .where(Invitations.invitation_id == invitation_id, Invitations.invited_user_id == user_id)
+        .returning(*_INVITATION_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
 
-def _validate_invitation(invitation_id: int, user, db: Session):
-    """Validate invitation exists and user has permission to respond."""
-    invitation = db.query(Invitations).filter(Invitations.invitation_id == invitation_id).first()
-    if not invitation:
-        return None, create_response("error", "Invitación no encontrada", status_code=404)
-    
-    if user.user_id != invitation.invited_user_id:
-        return None, create_response("error", "No tienes permiso para responder esta invitación", status_code=403)
-    
-    return invitation, None
 
+def _drop_pending_statement(invitation_id: int):
+    """DELETE the outbox rows of the invitation that the dispatcher has not sent yet."""
+    return (
+        delete(NotificationOutbox)
+        .where(
+            NotificationOutbox.status == PENDING,
+            NotificationOutbox.payload["invitation_id"].as_integer() == invitation_id
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _access_error(invitation, user):
+    """404 when the invitation does not exist, 403 when it belongs to someone else."""
+    if invitation is None:
+        return create_response("error", "Invitación no encontrada", status_code=404)
+    if invitation.invited_user_id != user.user_id:
+        return create_response("error", "No tienes permiso para responder esta invitación", status_code=403)
+    return None
 
-def _delete_invitation_notifications(invitation_id: int):
+
+def _read_invitation(invitation_id: int, user, db: Session):
+    """
+    Read the invitation in a short transaction, ended before any remote call.
+    Nothing is deleted here: the invitation stays in place until the response
+    is committed by _close_invitation.
+    """
+    invitation = db.execute(_read_statement(invitation_id)).one_or_none()
+    db.rollback()
+    error = _access_error(invitation, user)
+    return (None, error) if error else (invitation, None)
+
+
+async def _read_invitation_async(invitation_id: int, user, db: AsyncSession):
+    """Async version of _read_invitation for an AsyncSession."""
+    invitation = (await db.execute(_read_statement(invitation_id))).one_or_none()
+    await db.rollback()
+    error = _access_error(invitation, user)
+    return (None, error) if error else (invitation, None)
+
+
+def _commit_response(invitation_id: int, user_id: int, notification, db: Session) -> bool:
+    """
+    Delete the invitation if it is still there, drop its pending "Has sido
+    invitado" outbox row and queue the inviter's notification, in one commit.
+    A concurrent response that got there first leaves nothing to delete; then
+    nothing is queued.
+
+    Returns:
+        bool: True if this response deleted the invitation.
+    """
+    if db.execute(_claim_statement(invitation_id, user_id)).one_or_none() is None:
+        db.rollback()
+        return False
+    # En la misma transacción: el despachador no enviará "Has sido invitado" de una invitación respondida
+    db.execute(_drop_pending_statement(invitation_id))
+    enqueue_notification(db, **notification)
+    db.commit()
+    return True
+
+
+async def _commit_response_async(invitation_id: int, user_id: int, notification, db: AsyncSession) -> bool:
+    """Async version of _commit_response for an AsyncSession."""
+    if (await db.execute(_claim_statement(invitation_id, user_id))).one_or_none() is None:
+        await db.rollback()
+        return False
+    await db.execute(_drop_pending_statement(invitation_id))
+    enqueue_notification(db, **notification)
+    await db.commit()
+    return True
+
+
+async def _delete_invitation_notifications(invitation_id: int):
     """Delete all invitation-related notifications."""
     try:
-        delete_response = delete_notifications_by_invitation_id(invitation_id)
+        delete_response = await delete_notifications_by_invitation_id_async(invitation_id)
         if delete_response and delete_response.get("deleted_count", 0) > 0:
             logger.info(f"Notificaciones de invitación eliminadas para la invitación {invitation_id}.")
         else:
@@ -49,110 +136,124 @@ def _delete_invitation_notifications(invitation_id: int):
         logger.error(f"Error eliminando notificaciones de invitación para la invitación {invitation_id}: {str(e)}")
 
 
-def _create_user_role_farm_association(user_id: int, suggested_role_id: int, farm_id: int):
-    """Create user-role-farm association."""
-    suggested_role_name = get_role_name_by_id(suggested_role_id)
+async def _create_user_role_farm_association(user_id: int, suggested_role_id: int, farm_id: int,
+                                             suggested_role_name: Optional[str] = None):
+    """Create user-role-farm association, using the invitation's role name snapshot when it has one."""
+    if not suggested_role_name:
+        suggested_role_name = await get_role_name_by_id_async(suggested_role_id)
     if not suggested_role_name:
         return create_response("error", "El rol sugerido no es válido", status_code=400)
     
     try:
         # Create user_role
-        user_role_response = create_user_role(user_id, suggested_role_name)
+        user_role_response = await create_user_role_async(user_id, suggested_role_name)
         user_role_id = user_role_response.get("user_role_id")
         if not user_role_id:
             return create_response("error", "No se pudo obtener el user_role_id", status_code=500)
 
         # Get active state for UserRoleFarm
-        urf_active_state = get_user_role_farm_state_by_name(STATE_ACTIVE)
+        urf_active_state = await get_user_role_farm_state_by_name_async(STATE_ACTIVE)
         if not urf_active_state or not urf_active_state.get("user_role_farm_state_id"):
             return create_response("error", "No se pudo obtener el estado 'Activo' para UserRoleFarm", status_code=500)
         
         urf_active_state_id = urf_active_state["user_role_farm_state_id"]
 
         # Create UserRoleFarm association
-        urf_response = create_user_role_farm(user_role_id, farm_id, urf_active_state_id)
+        urf_response = await create_user_role_farm_async(user_role_id, farm_id, urf_active_state_id)
         if not urf_response or urf_response.get("status") != "success":
             return create_response("error", f"No se pudo asociar el usuario a la finca: {urf_response}", status_code=500)
         
         return None
+    except (DependencyUnavailableError, DeadlineExceededError):
+        raise
     except Exception as e:
         return create_response("error", f"No se pudo asociar el usuario a la finca: {str(e)}", status_code=500)
 
 
-def _send_response_notification(user_name: str, farm_id: int, inviter_user_id: int, invitation_id: int, 
-                               notification_type_name: str, action_verb: str):
-    """Send notification to inviter about invitation response."""
-    notification_type = get_notification_type_by_name(notification_type_name)
-    responded_state = get_notification_state_by_name(NOTIFICATION_STATE_RESPONDED)
-    
-    farm = get_farm_by_id(farm_id)
-    if farm is None:
-        return create_response("error", "Finca no encontrada", status_code=404)
-    
-    notification_message = f"El usuario {user_name} ha {action_verb} tu invitación a la finca {farm.name}."
-    
-    send_notification(
-        message=notification_message,
-        user_id=inviter_user_id,
-        notification_type_id=notification_type["notification_type_id"] if notification_type else None,
-        invitation_id=invitation_id,
-        notification_state_id=responded_state["notification_state_id"] if responded_state else None,
-        fcm_title=f"Invitación {action_verb}",
-        fcm_body=notification_message,
+def _response_notification(user_name: str, farm_name: str, inviter_user_id: int, invitation_id: int,
+                           notification_type_name: str, action_verb: str):
+    """Build the outbox notification telling the inviter about the response."""
+    notification_message = f"El usuario {user_name} ha {action_verb} tu invitación a la finca {farm_name}."
+    return {
+        "message": notification_message,
+        "user_id": inviter_user_id,
+        "invitation_id": invitation_id,
+        "notification_type": notification_type_name,
+        "notification_state": NOTIFICATION_STATE_RESPONDED,
+        "fcm_title": f"Invitación {action_verb}",
+        "fcm_body": notification_message,
+    }
+
+
+async def _resolve_farm_name(farm_id: int, farm_name: Optional[str]) -> Optional[str]:
+    """Farm name snapshot of the invitation; rows created before the snapshot ask the farms service."""
+    if farm_name:
+        return farm_name
+    farm = await get_farm_by_id_async(farm_id)
+    return farm.name if farm is not None else None
+
+
+async def _close_invitation(invitation, farm_name: str, user, accepted: bool,
+                            db: Union[Session, AsyncSession]) -> bool:
+    """
+    Delete the invitation together with the inviter's notification. For an
+    accepted invitation this runs only after the association exists.
+
+    Returns:
+        bool: False if the invitation was already answered by a concurrent request.
+    """
+    if accepted:
+        notification_type_name, action_verb = NOTIFICATION_TYPE_ACCEPTED, "aceptado"
+    else:
+        notification_type_name, action_verb = NOTIFICATION_TYPE_REJECTED, "rechazado"
+    notification = _response_notification(
+        user.name, farm_name, invitation.inviter_user_id, invitation.invitation_id,
+        notification_type_name, action_verb
     )
-    return None
+    if isinstance(db, AsyncSession):
+        return await _commit_response_async(invitation.invitation_id, user.user_id, notification, db)
+    return await run_in_threadpool(_commit_response, invitation.invitation_id, user.user_id, notification, db)
+
 
+async def _read(invitation_id: int, user, db: Union[Session, AsyncSession]):
+    if isinstance(db, AsyncSession):
+        return await _read_invitation_async(invitation_id, user, db)
+    return await run_in_threadpool(_read_invitation, invitation_id, user, db)
 
-def respond_invitation(invitation_id: int, action: str, user, db: Session):
-    # Validate invitation and permissions
-    invitation, error_response = _validate_invitation(invitation_id, user, db)
+
+async def respond_invitation(invitation_id: int, action: str, user, db: Union[Session, AsyncSession]):
+    invitation, error_response = await _read(invitation_id, user, db)
     if error_response:
         return error_response
 
-    # Save invitation data for notifications
-    farm_id = invitation.farm_id
-    inviter_user_id = invitation.inviter_user_id
-    suggested_role_id = invitation.suggested_role_id
+    if action.lower() not in ("accept", "reject"):
+        return create_response("error", "Acción inválida. Debes usar 'accept' o 'reject'", status_code=400)
 
-    # Delete invitation notifications
-    _delete_invitation_notifications(invitation_id)
+    # Rows created before the snapshot ask the farms service; no transaction is open meanwhile
+    farm_name = await _resolve_farm_name(invitation.farm_id, invitation.farm_name)
+    if farm_name is None:
+        return create_response("error", "Finca no encontrada", status_code=404)
 
-    # Handle accept action
-    if action.lower() == "accept":
-        # Create user-role-farm association
-        association_error = _create_user_role_farm_association(user.user_id, suggested_role_id, farm_id)
+    accepted = action.lower() == "accept"
+    if accepted:
+        # The invitation is only deleted once the user belongs to the farm
+        association_error = await _create_user_role_farm_association(
+            user.user_id, invitation.suggested_role_id, invitation.farm_id, invitation.suggested_role_name
+        )
         if association_error:
             return association_error
 
-        # Delete invitation and notify
-        db.delete(invitation)
-        db.commit()
-        logger.info(f"Invitación {invitation_id} eliminada después de ser aceptada")
+    if not await _close_invitation(invitation, farm_name, user, accepted, db):
+        if accepted:
+            logger.warning(f"La invitación {invitation_id} ya había sido respondida; la asociación ya existía o quedó duplicada")
+        return create_response("error", "Invitación no encontrada", status_code=404)
+    notify_outbox()
 
-        notification_error = _send_response_notification(
-            user.name, farm_id, inviter_user_id, invitation_id, 
-            NOTIFICATION_TYPE_ACCEPTED, "aceptado"
-        )
-        if notification_error:
-            return notification_error
+    # Delete invitation notifications
+    await _delete_invitation_notifications(invitation_id)
 
+    if accepted:
+        logger.info(f"Invitación {invitation_id} eliminada después de ser aceptada")
         return create_response("success", "Has aceptado la invitación exitosamente", status_code=200)
-
-    # Handle reject action
-    elif action.lower() == "reject":
-        # Delete invitation and notify
-        db.delete(invitation)
-        db.commit()
-        logger.info(f"Invitación {invitation_id} eliminada después de ser rechazada")
-
-        notification_error = _send_response_notification(
-            user.name, farm_id, inviter_user_id, invitation_id, 
-            NOTIFICATION_TYPE_REJECTED, "rechazado"
-        )
-        if notification_error:
-            return notification_error
-
-        return create_response("success", "Has rechazado la invitación exitosamente", status_code=200)
-
-    else:
-        return create_response("error", "Acción inválida. Debes usar 'accept' o 'reject'", status_code=400)
+    logger.info(f"Invitación {invitation_id} eliminada después de ser rechazada")
+    return create_response("success", "Has rechazado la invitación exitosamente", status_code=200)
@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from dotenv import load_dotenv
+from utils.deadline import deadline_suspended, wait_within_deadline
+
+load_dotenv(override=True, encoding="utf-8")
+
+logger = logging.getLogger(__name__)
+
+# Tiempo de vida (segundos) de los catálogos de referencia y fracción del TTL
+# a partir de la cual se refrescan en segundo plano.
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+REFERENCE_CACHE_REFRESH_AHEAD = float(os.getenv("REFERENCE_CACHE_REFRESH_AHEAD", "0.8"))
+
+CATALOG_KEY = "*"
+
+_caches = weakref.WeakSet()
+
+
+def clear_caches():
+    """Vacía todas las cachés en proceso (útil en pruebas y tras cambios de catálogo)."""
+    for cache in list(_caches):
+        cache.invalidate()
+
+
+@dataclass
+class _Entry:
+    value: Any
+    loaded_at: float
+
+
+class ReferenceCache:
+    """
+    Caché en proceso para catálogos de referencia (estados, tipos) con
+    refresco anticipado en segundo plano (stale-while-revalidate).
+
+    - Una entrada fresca se sirve directamente.
+    - Pasado `ttl * refresh_ahead` se sigue sirviendo la copia actual y se
+      lanza un único refresco en segundo plano.
+    - Pasado `ttl` la recarga es bloqueante; si falla se sirve la última copia buena.
+    - Solo un hilo (o una tarea por event loop) carga cada clave a la vez.
+
+    Los loaders reciben la clave y deben lanzar una excepción si el servicio
+    remoto falla; un resultado `None` no se almacena.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[Hashable], Any],
+        async_loader: Optional[Callable[[Hashable], Awaitable[Any]]] = None,
+        ttl: float = REFERENCE_CACHE_TTL,
+        refresh_ahead: float = REFERENCE_CACHE_REFRESH_AHEAD,
+    ):
+        self.name = name
+        self._loader = loader
+        self._async_loader = async_loader
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._refreshing: set = set()
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        _caches.add(self)
+
+    def _age(self, entry: _Entry) -> float:
+        return time.monotonic() - entry.loaded_at
+
+    def _needs_refresh(self, entry: _Entry) -> bool:
+        return self._age(entry) >= self.ttl * self.refresh_ahead
+
+    def _is_expired(self, entry: _Entry) -> bool:
+        return self._age(entry) >= self.ttl
+
+    def _store(self, key: Hashable, value: Any):
+        if value is not None:
+            self._entries[key] = _Entry(value, time.monotonic())
+        return value
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    # --- Ruta síncrona ---
+
+    def _load(self, key: Hashable, stale: Optional[_Entry]):
+        try:
+            return self._store(key, self._loader(key))
+        except Exception as e:
+            if stale is None:
+                raise
+            logger.warning(f"Caché '{self.name}': error recargando '{key}' ({e}); se sirve la última copia válida")
+            return stale.value
+
+    def _refresh_in_background(self, key: Hashable):
+        try:
+            self._store(key, self._loader(key))
+        except Exception as e:
+            logger.warning(f"Caché '{self.name}': falló el refresco en segundo plano de '{key}': {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key: Hashable):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh_in_background, args=(key,), daemon=True).start()
+
+    def get(self, key: Hashable = CATALOG_KEY):
+        """
+        Retorna el valor de la clave, cargándolo o refrescándolo según su antigüedad.
+
+        Args:
+            key (Hashable): Clave a consultar (por defecto, el catálogo completo).
+
+        Returns:
+            Any: Valor almacenado o recién cargado.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and not self._is_expired(entry):
+            if self._needs_refresh(entry):
+                self._schedule_refresh(key)
+            return entry.value
+
+        with self._key_lock(key):
+            # Otro hilo pudo haber cargado la clave mientras esperábamos el lock
+            current = self._entries.get(key)
+            if current is not None and not self._is_expired(current):
+                return current.value
+            return self._load(key, current)
+
+    # --- Ruta asíncrona ---
+
+    async def _aload(self, key: Hashable, stale: Optional[_Entry]):
+        try:
+            return self._store(key, await self._async_loader(key))
+        except Exception as e:
+            if stale is None:
+                raise
+            logger.warning(f"Caché '{self.name}': error recargando '{key}' ({e}); se sirve la última copia válida")
+            return stale.value
+
+    def _inflight_task(self, key: Hashable, coro_factory) -> asyncio.Task:
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get(key)
+        if task is None or task.done() or task.get_loop() is not loop:
+            # La carga la comparten varios llamadores: no hereda el deadline de quien la inicia
+            with deadline_suspended():
+                task = loop.create_task(coro_factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget_task(key, done))
+        return task
+
+    def _forget_task(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    async def aget(self, key: Hashable = CATALOG_KEY):
+        """
+        Versión asíncrona de `get`. Las cargas concurrentes de una misma clave
+        comparten una sola tarea, que corre sin deadline; cada llamador la
+        espera como mucho su propio tiempo restante.
+        """
+        if self._async_loader is None:
+            raise RuntimeError(f"La caché '{self.name}' no tiene loader asíncrono")
+
+        entry = self._entries.get(key)
+        if entry is not None and not self._is_expired(entry):
+            if self._needs_refresh(entry):
+                # Con copia previa `_aload` nunca lanza: el refresco puede quedar sin esperar
+                self._inflight_task(key, lambda: self._aload(key, entry))
+            return entry.value
+
+        task = self._inflight_task(key, lambda: self._aload(key, entry))
+        return await wait_within_deadline(task)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """
+        Descarta una clave, o todo el contenido de la caché si no se indica clave.
+        """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Caché LRU acotada con expiración por entrada, segura entre hilos.
+
+    Al superar `max_size` se descarta la entrada usada hace más tiempo, de modo
+    que la memoria queda acotada sin importar cuántas claves distintas lleguen.
+    """
+
+    def __init__(self, name: str, max_size: int, ttl: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """
+        Retorna el valor vigente de la clave, o `default` si no existe o expiró.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Almacena un valor con el TTL indicado (o el de la caché) y aplica el límite de tamaño.
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        """Elimina una clave si existe."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Descarta una clave, o todo el contenido si no se indica clave."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,24 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, List
+
+
+async def gather_limited(factories: Iterable[Callable[[], Awaitable[Any]]], limit: int) -> List[Any]:
+    """
+    Como `asyncio.gather(..., return_exceptions=True)`, pero con a lo sumo
+    `limit` llamadas en curso a la vez. Cada corrutina se crea al obtener su
+    turno, así que las que esperan no ocupan un puesto del bulkhead.
+
+    Args:
+        factories (Iterable): Funciones sin argumentos que crean cada corrutina.
+        limit (int): Máximo de llamadas simultáneas.
+
+    Returns:
+        list: Resultado o excepción de cada llamada, en el mismo orden.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(factory):
+        async with semaphore:
+            return await factory()
+
+    return await asyncio.gather(*(run(factory) for factory in factories), return_exceptions=True)
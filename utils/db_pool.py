@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict
+from dotenv import load_dotenv
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+load_dotenv(override=True, encoding="utf-8")
+
+# Pool de conexiones a PostgreSQL; los valores por defecto son los de SQLAlchemy.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Segundos tras los que una conexión se reemplaza; -1 la conserva indefinidamente
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+# Un SELECT 1 antes de cada checkout; con DB_POOL_RECYCLE suele bastar sin él
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Detrás de PgBouncer (modo transacción) el pool lo lleva PgBouncer: sin pool
+# propio y sin prepared statements del lado del servidor.
+DB_PGBOUNCER_MODE = os.getenv("DB_PGBOUNCER_MODE", "false").lower() in ("1", "true", "yes")
+
+
+class PoolMetrics:
+    """Contadores de los checkouts de un pool; sobreviven a que el pool se recree."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+
+    def record(self, waited: bool, elapsed: float, overflow: bool, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            if waited:
+                self.waits += 1
+                self.wait_time_total += elapsed
+                self.wait_time_max = max(self.wait_time_max, elapsed)
+            if overflow:
+                self.overflow_checkouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_time_total_seconds": round(self.wait_time_total, 6),
+                "wait_time_max_seconds": round(self.wait_time_max, 6),
+                "overflow_checkouts": self.overflow_checkouts,
+                "timeouts": self.timeouts,
+            }
+
+
+class _MeteredPool:
+    """
+    Mide cada checkout del pool. Un checkout espera cuando no hay conexiones
+    libres y el overflow ya está agotado; usa overflow cuando el pool tuvo que
+    abrir una conexión por encima de pool_size.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        # overflow() cuenta desde -pool_size: es positivo solo por encima de pool_size
+        overflow_before = self.overflow()
+        saturated = self.checkedin() == 0 and self._max_overflow > -1 and overflow_before >= self._max_overflow
+        start = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            # También cuenta la espera de un checkout que agotó pool_timeout
+            self.metrics.record(saturated, time.monotonic() - start, False, timed_out=True)
+            raise
+        self.metrics.record(saturated, time.monotonic() - start, self.overflow() > max(overflow_before, 0))
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class MeteredQueuePool(_MeteredPool, QueuePool):
+    pass
+
+
+class MeteredAsyncAdaptedQueuePool(_MeteredPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def _unique_statement_name() -> str:
+    return f"__asyncpg_{uuid.uuid4()}__"
+
+
+def engine_options(is_async: bool = False) -> Dict[str, Any]:
+    """
+    Argumentos del pool para create_engine / create_async_engine según el entorno.
+
+    Args:
+        is_async (bool): El engine usa asyncpg.
+
+    Returns:
+        dict: poolclass, tamaños, timeouts, pre-ping y connect_args.
+    """
+    if DB_PGBOUNCER_MODE:
+        options: Dict[str, Any] = {"poolclass": NullPool, "pool_pre_ping": False}
+        if is_async:
+            # asyncpg prepara cada consulta; PgBouncer puede mandar la siguiente a otro backend
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": _unique_statement_name,
+            }
+        return options
+
+    return {
+        "poolclass": MeteredAsyncAdaptedQueuePool if is_async else MeteredQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def pool_stats(pool) -> Dict[str, Any]:
+    """
+    Estado del pool de un engine para monitoreo.
+
+    Returns:
+        dict: Conexiones en uso y libres, overflow y los contadores de checkouts.
+    """
+    if not isinstance(pool, _MeteredPool):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        **pool.metrics.snapshot(),
+    }
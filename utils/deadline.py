@@ -0,0 +1,127 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv(override=True, encoding="utf-8")
+
+# Presupuesto total (segundos) de cada solicitud: llamadas remotas y consultas
+# SQL comparten este tiempo en lugar de tener cada una su propio timeout fijo.
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "15"))
+
+# Instante (time.monotonic) en que vence la solicitud en curso, o None si no hay deadline
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceededError(Exception):
+    """Se lanza cuando el presupuesto de tiempo de la solicitud se agotó."""
+    pass
+
+
+@contextmanager
+def request_deadline(seconds: float = REQUEST_DEADLINE_SECONDS):
+    """
+    Fija el deadline de la solicitud en curso. Un deadline anidado nunca
+    extiende al exterior: se usa el más cercano de los dos.
+
+    Args:
+        seconds (float): Presupuesto de tiempo a partir de ahora.
+    """
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def deadline_suspended():
+    """
+    Quita el deadline mientras dura el bloque, para trabajo que debe terminar
+    aunque la solicitud ya no tenga tiempo (p. ej. deshacer un cambio).
+    """
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Returns:
+        float: Segundos que quedan del presupuesto, o None si no hay deadline.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+async def wait_within_deadline(future: asyncio.Future):
+    """
+    Espera un resultado compartido (una tarea que otros también esperan) como
+    mucho el tiempo que le queda a esta solicitud. Al vencer lanza
+    DeadlineExceededError sin cancelar la tarea.
+
+    Args:
+        future (asyncio.Future): Tarea compartida, creada fuera del deadline.
+
+    Returns:
+        Any: Resultado de la tarea.
+    """
+    left = remaining()
+    if left is None:
+        return await asyncio.shield(future)
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout=max(0.0, left))
+    except asyncio.TimeoutError:
+        if future.done() and not future.cancelled():
+            # El TimeoutError es de la propia tarea, no del deadline
+            return future.result()
+        raise DeadlineExceededError("El tiempo de la solicitud se agotó")
+
+
+def check_deadline():
+    """Lanza DeadlineExceededError si el presupuesto de la solicitud ya se agotó."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceededError("El tiempo de la solicitud se agotó")
+
+
+def clamp_timeouts(timeouts: Dict[str, Optional[float]]) -> Dict[str, Optional[float]]:
+    """
+    Limita cada timeout de httpx (connect, read, write, pool) al tiempo restante.
+
+    Args:
+        timeouts (dict): Timeouts de la petición (extensión "timeout" de httpx).
+
+    Returns:
+        dict: Timeouts ajustados; sin cambios si no hay deadline.
+    """
+    left = remaining()
+    if left is None:
+        return timeouts
+    check_deadline()
+    return {name: left if value is None else min(value, left) for name, value in timeouts.items()}
+
+
+def statement_timeout_ms() -> Optional[int]:
+    """
+    Tiempo restante expresado como `statement_timeout` de PostgreSQL.
+
+    Returns:
+        int: Milisegundos (al menos 1), o None si no hay deadline.
+    """
+    left = remaining()
+    if left is None:
+        return None
+    check_deadline()
+    return max(1, int(left * 1000))
@@ -0,0 +1,41 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Tuple
+
+# Tamaño de página de los listados: por defecto y máximo que acepta la API
+PAGE_SIZE_DEFAULT = 20
+PAGE_SIZE_MAX = 100
+
+
+class InvalidCursorError(ValueError):
+    """El cursor de paginación no es uno emitido por este servicio."""
+    pass
+
+
+def encode_cursor(invitation_date: datetime, invitation_id: int) -> str:
+    """
+    Cursor opaco con la posición (invitation_date, invitation_id) de la última
+    fila de la página; el cliente lo devuelve tal cual para pedir la siguiente.
+    """
+    raw = json.dumps([invitation_date.isoformat(), invitation_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Returns:
+        tuple: (invitation_date, invitation_id) de la última fila ya entregada.
+
+    Raises:
+        InvalidCursorError: Si el cursor está mal formado.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date_value, invitation_id = json.loads(raw)
+        if not isinstance(invitation_id, int):
+            raise ValueError("invitation_id")
+        return datetime.fromisoformat(date_value), invitation_id
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Cursor inválido: {cursor}") from e
@@ -89,4 +89,37 @@ def session_token_invalid_response() -> ORJSONResponse:
         message="Credenciales expiradas, cerrando sesión.",
         data={},
         status_code=401
-    )
\ No newline at end of file
+    )
+
+def dependency_unavailable_response(service: str) -> ORJSONResponse:
+    """
+    Crea una respuesta para cuando un servicio remoto no está disponible
+    (circuit breaker abierto o demasiadas llamadas concurrentes).
+
+    Args:
+        service (str): Nombre del servicio remoto no disponible.
+
+    Returns:
+        JSONResponse: Respuesta 503 que indica qué dependencia falló.
+    """
+    return create_response(
+        status="error",
+        message="Un servicio del que depende esta operación no está disponible. Intenta de nuevo más tarde.",
+        data={"dependency": service},
+        status_code=503
+    )
+
+
+def deadline_exceeded_response() -> ORJSONResponse:
+    """
+    Crea una respuesta para cuando se agotó el tiempo asignado a la solicitud.
+
+    Returns:
+        JSONResponse: Respuesta 504 en formato JSON.
+    """
+    return create_response(
+        status="error",
+        message="La solicitud tardó demasiado en completarse. Intenta de nuevo más tarde.",
+        data={},
+        status_code=504
+    )
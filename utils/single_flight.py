@@ -0,0 +1,162 @@
+import asyncio
+import contextvars
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from utils.deadline import DeadlineExceededError, deadline_suspended, remaining, wait_within_deadline
+
+_groups = weakref.WeakSet()
+
+
+def single_flight_stats() -> Dict[str, Dict[str, int]]:
+    """Retorna los contadores de todos los grupos single-flight, por nombre."""
+    return {group.name: group.stats() for group in list(_groups)}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _AsyncCall:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas idénticas concurrentes: mientras una llamada con cierta
+    clave está en curso, las demás con la misma clave esperan y comparten su
+    resultado (o su excepción) en lugar de repetir la petición remota.
+
+    `do` sirve a hilos (p. ej. el thread pool) y `ado` a corrutinas; cada ruta
+    agrupa por separado. No guarda resultados: al terminar la llamada, la
+    siguiente con la misma clave vuelve a ejecutarse.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Hashable, _AsyncCall] = {}
+        self.requests = 0
+        self.executions = 0
+        self.coalesced = 0
+        _groups.add(self)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            dict: Llamadas recibidas, ejecutadas y agrupadas (coalesced).
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls) + len(self._tasks),
+            }
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Ejecuta `fn` o, si ya hay una llamada en curso con la misma clave,
+        espera su resultado.
+
+        La llamada compartida corre sin el deadline de quien la inicia (en un
+        hilo propio si ese llamador tiene deadline); cada llamador la espera
+        como mucho su propio tiempo restante.
+
+        Args:
+            key (Hashable): Identifica llamadas equivalentes.
+            fn (Callable): Función sin argumentos que hace la petición.
+
+        Returns:
+            Any: Resultado de la llamada compartida.
+        """
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            if remaining() is None:
+                self._run(key, call, fn)
+            else:
+                context = contextvars.copy_context()
+                threading.Thread(
+                    target=context.run, args=(self._run, key, call, fn),
+                    name=f"single-flight-{self.name}", daemon=True
+                ).start()
+
+        left = remaining()
+        if not call.done.wait(None if left is None else max(0.0, left)):
+            raise DeadlineExceededError("El tiempo de la solicitud se agotó")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _run(self, key: Hashable, call: _Call, fn: Callable[[], Any]):
+        try:
+            with deadline_suspended():
+                call.result = fn()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    async def ado(self, key: Hashable, coro_factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Versión asíncrona de `do`: las corrutinas del mismo event loop con la
+        misma clave comparten una sola tarea. Cancelar a un llamador no afecta
+        a los demás; la petición compartida solo se cancela cuando ya nadie la espera.
+
+        La tarea compartida corre sin el deadline de quien la inicia; cada
+        llamador la espera como mucho su propio tiempo restante.
+
+        Args:
+            key (Hashable): Identifica llamadas equivalentes.
+            coro_factory (Callable): Crea la corrutina que hace la petición.
+
+        Returns:
+            Any: Resultado de la llamada compartida.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.requests += 1
+            call = self._tasks.get(key)
+            if call is None or call.task.done() or call.task.get_loop() is not loop:
+                with deadline_suspended():
+                    call = self._tasks[key] = _AsyncCall(loop.create_task(coro_factory()))
+                call.task.add_done_callback(lambda done: self._forget_task(key, done))
+                self.executions += 1
+            else:
+                self.coalesced += 1
+            call.waiters += 1
+
+        try:
+            return await wait_within_deadline(call.task)
+        finally:
+            with self._lock:
+                call.waiters -= 1
+                abandoned = call.waiters == 0
+            if abandoned and not call.task.done():
+                call.task.cancel()
+
+    def _forget_task(self, key: Hashable, task: asyncio.Task):
+        with self._lock:
+            call = self._tasks.get(key)
+            if call is not None and call.task is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            # Evita el aviso de excepción no recuperada si todos los llamadores se cancelaron
+            task.exception()